@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+OUTCOMES = ['home', 'draw', 'away']
+PROB_COLS = ['home_win', 'draw', 'away_win']              # Model probabilities (predictions table names)
+ODDS_COLS = ['home_odds', 'draw_odds', 'away_odds']       # Prices the bets are placed at
+CLOSING_COLS = ['home_closing_prob', 'draw_closing_prob', 'away_closing_prob']  # No-vig closing consensus
+
+# probs/odds/closing: (n, 3) in OUTCOMES order (closing NaN where there is no later closing line);
+# result: (n,) outcome index; day: (n,) day index, ascending
+Bets = namedtuple("Bets", ["probs", "odds", "closing", "result", "day", "dates"])
+
+def prepare_bets(df):
+    """
+    Arrays for run() from a frame with date, home_goals, away_goals, PROB_COLS and ODDS_COLS
+    (CLOSING_COLS optional). Matches without a result, probabilities or a full 1X2 price are dropped.
+    """
+    cols = ['date', 'home_goals', 'away_goals'] + PROB_COLS + ODDS_COLS
+    df = df.dropna(subset=cols).sort_values('date', kind='stable')
+    hg = df['home_goals'].to_numpy(dtype=float)
+    ag = df['away_goals'].to_numpy(dtype=float)
+    result = np.where(hg > ag, 0, np.where(hg == ag, 1, 2))
+    closing = (df[CLOSING_COLS].to_numpy(dtype=float) if set(CLOSING_COLS) <= set(df.columns)
+               else np.full((len(df), 3), np.nan))
+    day, dates = pd.factorize(pd.to_datetime(df['date']).dt.normalize(), sort=True)
+    return Bets(df[PROB_COLS].to_numpy(dtype=float), df[ODDS_COLS].to_numpy(dtype=float), closing,
+                result, day, dates)
+
+def strategy_grid(thresholds=np.round(np.arange(0, 0.301, 0.01), 2),
+                  kelly_fractions=(0.1, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.75, 0.9, 1.0),
+                  flat_stakes=(0.01, 0.02, 0.05), max_odds=(3.0, 5.0, 10.0, np.inf)):
+    """
+    Every combination of staking rule and filters. `size` is the share of the starting bankroll per
+    bet for flat staking and the Kelly multiplier for Kelly (1.0 = full Kelly, 0.5 = half Kelly).
+    A bet is placed on the best-EV outcome priced at most `max_odds` when its EV exceeds `threshold`.
+    """
+    sizing = [('flat', s) for s in flat_stakes] + [('kelly', k) for k in kelly_fractions]
+    index = pd.MultiIndex.from_product([range(len(sizing)), thresholds, max_odds], names=['sizing', 'threshold', 'max_odds'])
+    grid = index.to_frame(index=False)
+    grid.insert(0, 'staking', [sizing[i][0] for i in grid['sizing']])
+    grid.insert(1, 'size', [sizing[i][1] for i in grid['sizing']])
+    return grid.drop(columns='sizing')
+
+def _selection(bets, max_odds):
+    """Per match: the best-EV outcome priced at most max_odds, its EV, price, win flag and CLV."""
+    ev = bets.probs * bets.odds - 1
+    ev = np.where(bets.odds <= max_odds, ev, -np.inf)
+    pick = np.argmax(ev, axis=1)
+    rows = np.arange(len(pick))
+    odds = bets.odds[rows, pick]
+    # CLV against the no-vig closing consensus: > 0 means we beat the closing line
+    return ev[rows, pick], odds, bets.result == pick, odds * bets.closing[rows, pick] - 1
+
+def _simulate(bets, ev, odds, won, clv, thresholds, kelly, size, bankroll, keep_paths=False):
+    """
+    Runs S strategies at once over (S, n) arrays. Bets on the same day are sized from the
+    bankroll at the start of that day; a bankroll that hits zero stops betting.
+    """
+    placed = np.isfinite(ev)[None, :] & (ev[None, :] > thresholds[:, None])
+    edge = np.maximum(ev / (odds - 1), 0)                       # Full Kelly fraction for the pick
+    fraction = np.where(kelly[:, None], size[:, None] * edge[None, :], size[:, None]) * placed
+    ret = np.where(won, odds - 1, -1.0)
+
+    starts = np.flatnonzero(np.r_[True, bets.day[1:] != bets.day[:-1]])
+    day_fraction = np.add.reduceat(fraction, starts, axis=1)
+    day_return = np.add.reduceat(fraction * ret[None, :], starts, axis=1)
+
+    # Kelly compounds (bankroll x growth); flat stakes are fixed amounts of the starting bankroll
+    growth = np.maximum(1 + day_return, 0)
+    compound = bankroll * np.cumprod(growth, axis=1)
+    additive = bankroll * (1 + np.cumsum(day_return, axis=1))
+    path = np.where(kelly[:, None], compound, additive)
+    alive = np.minimum.accumulate(path > 0, axis=1)
+    path = np.where(alive, path, 0.0)
+    before = np.hstack([np.full((len(path), 1), float(bankroll)), path[:, :-1]])
+    staked = (np.where(kelly[:, None], before, bankroll) * day_fraction * (before > 0)).sum(axis=1)
+    placed &= (before > 0)[:, bets.day]  # No bets once the bankroll is gone
+
+    final = path[:, -1]
+    peak = np.maximum.accumulate(np.hstack([before[:, :1], path]), axis=1)
+    drawdown = (1 - np.hstack([before[:, :1], path]) / peak).max(axis=1)
+    n_bets = placed.sum(axis=1)
+    priced = placed & np.isfinite(clv)[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = {
+            'bets': n_bets,
+            'hit_rate': (placed & won[None, :]).sum(axis=1) / n_bets,
+            'avg_odds': (placed * odds[None, :]).sum(axis=1) / n_bets,
+            'staked': staked,
+            'profit': final - bankroll,
+            'roi': (final - bankroll) / staked,
+            'final_bankroll': final,
+            'max_drawdown': drawdown,
+            'clv': np.where(priced, clv[None, :], 0).sum(axis=1) / priced.sum(axis=1),
+            'beat_close': (priced & (clv[None, :] > 0)).sum(axis=1) / priced.sum(axis=1),
+        }
+    return stats, (path if keep_paths else None)
+
+def run(bets, grid=None, bankroll=1.0, chunk=256):
+    """
+    Backtests every strategy in `grid` (see strategy_grid) over the same bets. Returns the grid
+    with bets, hit_rate, avg_odds, staked, profit, roi, final_bankroll, max_drawdown, clv and
+    beat_close (share of bets priced better than the closing line) per strategy.
+    """
+    if not len(bets.result):
+        raise ValueError("No matches with a result, probabilities and odds to backtest.")
+    grid = strategy_grid() if grid is None else grid.reset_index(drop=True)
+    out = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for max_odds, group in grid.groupby('max_odds', sort=False):
+            selection = _selection(bets, max_odds)
+            for begin in range(0, len(group), chunk):
+                part = group.iloc[begin:begin + chunk]
+                stats, _ = _simulate(bets, *selection, part['threshold'].to_numpy(dtype=float),
+                                     (part['staking'] == 'kelly').to_numpy(), part['size'].to_numpy(dtype=float), bankroll)
+                out.append(pd.DataFrame(stats, index=part.index))
+    return grid.join(pd.concat(out))
+
+def bankroll_paths(bets, strategies, bankroll=1.0):
+    """End-of-day bankroll for each strategy (rows of a strategy_grid frame), indexed by date."""
+    if not len(bets.result):
+        raise ValueError("No matches with a result, probabilities and odds to backtest.")
+    strategies = strategies.reset_index(drop=True)
+    paths = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, s in strategies.iterrows():
+            _, path = _simulate(bets, *_selection(bets, s['max_odds']), np.array([s['threshold']], dtype=float),
+                                np.array([s['staking'] == 'kelly']), np.array([s['size']], dtype=float),
+                                bankroll, keep_paths=True)
+            paths[f"{s['staking']} {s['size']:g} >{s['threshold']:g} <={s['max_odds']:g}"] = path[0]
+    return pd.DataFrame(paths, index=bets.dates)
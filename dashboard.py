@@ -4,8 +4,17 @@ import plotly.graph_objects as go
 import xgboost as xgb
 from sqlalchemy import create_engine, text
 import numpy as np
+import os
+import requests
 import odds_integration
 import config
+from team_resolver import TeamResolver
+import pyarrow as pa
+import dashboard_snapshot
+import model_registry
+import season_sim
+from season_sim import season_of
+from markets import MARKETS, GOALS_FEATURES
 from streamlit_extras.metric_cards import style_metric_cards
 
 # --- CONFIGURATION ---
@@ -20,112 +29,60 @@ st.markdown('<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs
 load_css("styles.css")
 
 DB_CONNECTION = config.DB_CONNECTION
+SQUAD_STATS_TTL = int(os.getenv("SQUAD_STATS_TTL_S", 3600))
+SIM_SEASONS = int(os.getenv("SIM_SEASONS", 100000))
+# With BRAIN_URL set, live odds are read from the prediction API's odds cache, so only one
+# process spends the Odds API quota. Without it the dashboard fetches them itself.
+BRAIN_URL = os.getenv("BRAIN_URL")
 
 # --- CACHED FUNCTIONS ---
 @st.cache_resource
 def get_db_engine():
     return create_engine(DB_CONNECTION)
 
-@st.cache_data
-def load_data(league="EPL"):
-    """Loads all match data and calculates current stats."""
-    engine = get_db_engine()
-    
-    # 1. Load History
-    query = """
-    SELECT 
-        m.date, m.match_id, m.home_team_id, m.away_team_id,
-        m.home_goals, m.away_goals,
-        s.home_xg, s.away_xg,
-        s.home_ppda, s.away_ppda,
-        s.home_deep, s.away_deep,
-        t_home.name as home_name, t_away.name as away_name
-    FROM matches m
-    JOIN match_stats s ON m.match_id = s.match_id
-    JOIN teams t_home ON m.home_team_id = t_home.team_id
-    JOIN teams t_away ON m.away_team_id = t_away.team_id
-    WHERE m.league = :league
-    ORDER BY m.date ASC;
+@st.cache_resource
+def get_team_resolver():
+    with get_db_engine().connect() as conn:
+        return TeamResolver.from_db(conn)
+
+def get_odds_cache(api_key):
+    """Live odds for every league, refetched lazily once stale (one lookup per rerun)."""
+    with st.spinner("Fetching live odds..."):
+        return odds_integration.shared_cache(api_key, get_team_resolver())
+
+def lookup_odds(api_key, home_team, away_team):
+    """(odds row or None, age in s, API requests left) from the API (BRAIN_URL) or the local odds cache."""
+    if BRAIN_URL:
+        response = requests.get(f"{BRAIN_URL}/odds", params={'home': home_team, 'away': away_team}, timeout=5)
+        response.raise_for_status()
+        found = response.json()
+        return found['odds'], found['age_s'], found['requests_left']
+
+    odds_cache = get_odds_cache(api_key)
+    resolver = get_team_resolver()
+    match_odds = odds_cache.lookup(home_team, away_team)
+    if resolver.learned:
+        with get_db_engine().connect() as conn:
+            resolver.save_aliases(conn, source='odds')
+            conn.commit()
+    return match_odds, odds_cache.age(), odds_cache.quota.get('remaining')
+
+@st.cache_data(max_entries=6)
+def load_data(league="EPL", version=None):
     """
-    df = pd.read_sql(text(query), engine, params={"league": league})
-    
-    # 2. Calculate Elo
-    current_elo = {}
-    elo_history = []
-    K_FACTOR = config.ELO_K_FACTOR
-    
-    for index, row in df.iterrows():
-        h = row['home_name']
-        a = row['away_name']
-        date = row['date']
-        
-        h_rating = current_elo.get(h, 1500)
-        a_rating = current_elo.get(a, 1500)
-        
-        # Outcome
-        if row['home_goals'] > row['away_goals']: actual = 1.0
-        elif row['home_goals'] == row['away_goals']: actual = 0.5
-        else: actual = 0.0
-        
-        expected_h = 1 / (1 + 10 ** ((a_rating - h_rating) / 400))
-        
-        new_h = h_rating + K_FACTOR * (actual - expected_h)
-        new_a = a_rating + K_FACTOR * ((1 - actual) - (1 - expected_h))
-        
-        current_elo[h] = new_h
-        current_elo[a] = new_a
-        
-        elo_history.append({'date': date, 'team': h, 'elo': new_h})
-        elo_history.append({'date': date, 'team': a, 'elo': new_a})
-
-    # 3. Calculate Rolling Tactical Stats (Last 5)
-    # We need to restructure to a long format (team, date, stats) to use rolling
-    
-    # Prepare Home Rows
-    h_df = df[['date', 'home_name', 'home_xg', 'home_ppda', 'home_deep', 'home_goals', 'away_goals']].rename(
-        columns={'home_name': 'team', 'home_xg': 'xg', 'home_ppda': 'ppda', 'home_deep': 'deep', 'home_goals': 'goals_scored', 'away_goals': 'goals_conceded'}
-    )
-    h_df['is_home'] = True
-    
-    # Prepare Away Rows
-    a_df = df[['date', 'away_name', 'away_xg', 'away_ppda', 'away_deep', 'away_goals', 'home_goals']].rename(
-        columns={'away_name': 'team', 'away_xg': 'xg', 'away_ppda': 'ppda', 'away_deep': 'deep', 'away_goals': 'goals_scored', 'home_goals': 'goals_conceded'}
-    )
-    a_df['is_home'] = False
-    
-    # Combine and Sort
-    all_stats = pd.concat([h_df, a_df]).sort_values(['team', 'date'])
-    
-    # Fill NaNs with means before rolling (crucial for stability)
-    for col in ['xg', 'ppda', 'deep']:
-        all_stats[col] = all_stats[col].fillna(all_stats[col].mean())
+    Match history, current Elo, last-5 form and Elo history for a league. Reads the published
+    snapshot when there is one (milliseconds), otherwise computes it from the database.
+    `version` is part of the cache key, so a new snapshot is picked up on the next rerun.
+    """
+    if version:
+        try:
+            return dashboard_snapshot.load(league, version)
+        except (OSError, pa.ArrowInvalid) as e:
+            st.warning(f"⚠️ Snapshot {version} unreadable ({e}). Computing live.")
 
-    # Calculate Rolling 5
-    stats_dict = {}
-    for team in all_stats['team'].unique():
-        team_data = all_stats[all_stats['team'] == team].copy()
-        
-        # Rolling averages
-        team_data['roll_xg'] = team_data['xg'].rolling(5, min_periods=1).mean()
-        team_data['roll_ppda'] = team_data['ppda'].rolling(5, min_periods=1).mean()
-        team_data['roll_deep'] = team_data['deep'].rolling(5, min_periods=1).mean()
-        team_data['roll_goals_scored'] = team_data['goals_scored'].rolling(5, min_periods=1).mean()
-        team_data['roll_goals_conceded'] = team_data['goals_conceded'].rolling(5, min_periods=1).mean()
-        
-        # Get the LATEST stats (tail 1)
-        if not team_data.empty:
-            latest = team_data.iloc[-1]
-            stats_dict[team] = {
-                'xg_5': latest['roll_xg'],
-                'ppda_5': latest['roll_ppda'],
-                'deep_5': latest['roll_deep'],
-                'goals_scored_5': latest['roll_goals_scored'],
-                'goals_conceded_5': latest['roll_goals_conceded']
-            }
-        else:
-            stats_dict[team] = {'xg_5': 0, 'ppda_5': 0, 'deep_5': 0, 'goals_scored_5': 0, 'goals_conceded_5': 0}
-        
-    return df, current_elo, stats_dict, pd.DataFrame(elo_history)
+    df = dashboard_snapshot.load_matches(get_db_engine(), league)
+    current_elo, stats_dict, elo_history = dashboard_snapshot.compute_league(df, config.ELO_K_FACTOR)
+    return df, current_elo, stats_dict, elo_history
 
 @st.cache_resource
 def load_model():
@@ -137,138 +94,100 @@ def load_model():
         return None
     return model
 
-def get_last_5_matches(team_name, full_df):
-    """Extracts the last 5 matches for a specific team."""
-    team_matches = full_df[(full_df['home_name'] == team_name) | (full_df['away_name'] == team_name)].copy()
-    team_matches = team_matches.sort_values('date', ascending=False).head(5)
-    
-    display_data = []
-    for _, row in team_matches.iterrows():
-        if row['home_name'] == team_name:
-            opponent = row['away_name']
-            location = "(H)"
-            goals_for = row['home_goals']
-            goals_against = row['away_goals']
-            xg_for = row['home_xg']
-            xg_against = row['away_xg']
-        else:
-            opponent = row['home_name']
-            location = "(A)"
-            goals_for = row['away_goals']
-            goals_against = row['home_goals']
-            xg_for = row['away_xg']
-            xg_against = row['home_xg']
-            
-        if goals_for > goals_against: result = "W"
-        elif goals_for == goals_against: result = "D"
-        else: result = "L"
-        
-        display_data.append({
-            "Date": row['date'],
-            "Opponent": f"{opponent} {location}",
-            "Result": f"{result} {goals_for}-{goals_against}",
-            "xG": f"{xg_for:.2f} - {xg_against:.2f}"
-        })
-    
-    return pd.DataFrame(display_data)
-
-def get_h2h_matches(team1, team2, full_df):
-    """Extracts head-to-head matches."""
-    h2h = full_df[
-        ((full_df['home_name'] == team1) & (full_df['away_name'] == team2)) |
-        ((full_df['home_name'] == team2) & (full_df['away_name'] == team1))
-    ].copy()
-    
-    h2h = h2h.sort_values('date', ascending=False)
-    
-    display_data = []
-    for _, row in h2h.iterrows():
-        if row['home_name'] == team1:
-            home = team1
-            away = team2
-            score = f"{row['home_goals']} - {row['away_goals']}"
-        else:
-            home = team2
-            away = team1
-            score = f"{row['home_goals']} - {row['away_goals']}"
-            
-        display_data.append({
-            "Date": row['date'],
-            "Home": home,
-            "Score": score,
-            "Away": away,
-            "xG": f"{row['home_xg']:.2f} - {row['away_xg']:.2f}"
-        })
-        
-    return pd.DataFrame(display_data)
-
-def get_league_table(full_df):
-    """Calculates the league table for the CURRENT SEASON."""
-    # Ensure date is datetime
-    full_df = full_df.copy()
-    full_df['date'] = pd.to_datetime(full_df['date'])
-    
-    # Determine Current Season Start
-    if full_df.empty: return pd.DataFrame()
-    
-    max_date = full_df['date'].max()
-    # If we are in the second half of the year (Aug+), season started this year.
-    # If we are in the first half (Jan-May), season started last year.
-    # Using July 1st as a safe cutoff.
-    if max_date.month >= 7: 
-        season_start = pd.Timestamp(year=max_date.year, month=7, day=1)
-    else:
-        season_start = pd.Timestamp(year=max_date.year - 1, month=7, day=1)
-        
-    # Filter for current season
-    season_df = full_df[full_df['date'] >= season_start]
-    
-    table = {}
-    
-    for _, row in season_df.iterrows():
-        home = row['home_name']
-        away = row['away_name']
-        h_goals = row['home_goals']
-        a_goals = row['away_goals']
-        
-        if home not in table: table[home] = {'P': 0, 'W': 0, 'D': 0, 'L': 0, 'GF': 0, 'GA': 0, 'Pts': 0}
-        if away not in table: table[away] = {'P': 0, 'W': 0, 'D': 0, 'L': 0, 'GF': 0, 'GA': 0, 'Pts': 0}
-        
-        # Update Home
-        table[home]['P'] += 1
-        table[home]['GF'] += h_goals
-        table[home]['GA'] += a_goals
-        
-        # Update Away
-        table[away]['P'] += 1
-        table[away]['GF'] += a_goals
-        table[away]['GA'] += h_goals
-        
-        # Result
-        if h_goals > a_goals:
-            table[home]['W'] += 1
-            table[home]['Pts'] += 3
-            table[away]['L'] += 1
-        elif h_goals == a_goals:
-            table[home]['D'] += 1
-            table[home]['Pts'] += 1
-            table[away]['D'] += 1
-            table[away]['Pts'] += 1
-        else:
-            table[away]['W'] += 1
-            table[away]['Pts'] += 3
-            table[home]['L'] += 1
-            
-    # Convert to DataFrame
-    if not table: return pd.DataFrame()
-    
-    df_table = pd.DataFrame.from_dict(table, orient='index')
-    df_table['GD'] = df_table['GF'] - df_table['GA']
+def team_results(full_df):
+    """
+    One row per team per match (newest first): opponent, venue, goals, xG, result and points.
+    Built once per data version; home/away rows are interleaved so teams keep the order in
+    which they first appear.
+    """
+    n = len(full_df)
+    home, away = full_df['home_name'].to_numpy(), full_df['away_name'].to_numpy()
+    h_goals, a_goals = full_df['home_goals'].to_numpy(), full_df['away_goals'].to_numpy()
+    h_xg, a_xg = full_df['home_xg'].to_numpy(), full_df['away_xg'].to_numpy()
+    both = lambda h, a: np.column_stack([h, a]).ravel()
+
+    long = pd.DataFrame({
+        'row': np.repeat(np.arange(n), 2),
+        'date': np.repeat(full_df['date'].to_numpy(), 2),
+        'team': both(home, away),
+        'opponent': both(away, home),
+        'is_home': np.tile([True, False], n),
+        'gf': both(h_goals, a_goals),
+        'ga': both(a_goals, h_goals),
+        'xg_for': both(h_xg, a_xg),
+        'xg_against': both(a_xg, h_xg),
+    })
+    long['result'] = np.select([long['gf'] > long['ga'], long['gf'] == long['ga']], ['W', 'D'], 'L')
+    long['pts'] = np.select([long['result'] == 'W', long['result'] == 'D'], [3, 1], 0)
+    long['season'] = season_of(long['date'])
+
+    # Display columns, formatted once so lookups only slice rows
+    long['opponent_label'] = long['opponent'] + np.where(long['is_home'], " (H)", " (A)")
+    long['result_label'] = [f"{r} {f}-{a}" for r, f, a in zip(long['result'], long['gf'], long['ga'])]
+    long['xg_label'] = [f"{f:.2f} - {a:.2f}" for f, a in zip(long['xg_for'], long['xg_against'])]
+    long['home'] = np.repeat(home, 2)
+    long['away'] = np.repeat(away, 2)
+    long['score'] = np.repeat([f"{h} - {a}" for h, a in zip(h_goals, a_goals)], 2)
+    long['match_xg'] = np.repeat([f"{h:.2f} - {a:.2f}" for h, a in zip(h_xg, a_xg)], 2)
+    return long
+
+@st.cache_data(max_entries=6)
+def load_team_views(league, version=None):
+    """
+    Long per-team results (newest first), each team's row positions in it, and the display
+    tables for form and head-to-head, aligned with those positions.
+    """
+    full_df = load_data(league, version)[0]
+    long = team_results(full_df)
+    newest_first = np.lexsort((-long['row'].to_numpy(), -pd.to_datetime(long['date']).to_numpy().astype('int64')))
+    long = long.iloc[newest_first].reset_index(drop=True)
+    index = {team: rows for team, rows in long.groupby('team', sort=False).indices.items()}
+    form = long[['date', 'opponent_label', 'result_label', 'xg_label']].set_axis(["Date", "Opponent", "Result", "xG"], axis=1)
+    h2h = long[['date', 'home', 'score', 'away', 'match_xg']].set_axis(["Date", "Home", "Score", "Away", "xG"], axis=1)
+    return long, index, form, h2h
+
+def get_last_5_matches(team_name, views):
+    """The last 5 matches for a specific team (index lookup, no scan)."""
+    long, index, form, _ = views
+    return form.iloc[index.get(team_name, [])[:5]]
+
+def get_h2h_matches(team1, team2, views):
+    """Head-to-head matches, newest first (from team1's rows)."""
+    long, index, _, h2h = views
+    rows = index.get(team1, np.array([], dtype=int))
+    return h2h.iloc[rows[long['opponent'].to_numpy()[rows] == team2]]
+
+@st.cache_data(max_entries=24)
+def get_league_table(league, version=None, season=None):
+    """League table for a season (default: the latest one), cached per season and data version."""
+    long = load_team_views(league, version)[0]
+    if long.empty: return pd.DataFrame()
+    season = long['season'].max() if season is None else season
+    season_rows = long[long['season'] == season]
+    if season_rows.empty: return pd.DataFrame()
+
+    # Chronological order, so ties keep the order in which teams first appear
+    season_rows = season_rows.sort_values('row', kind='stable')
+    table = season_rows.assign(
+        W=season_rows['result'] == 'W', D=season_rows['result'] == 'D', L=season_rows['result'] == 'L'
+    ).groupby('team', sort=False).agg(
+        P=('row', 'size'), W=('W', 'sum'), D=('D', 'sum'), L=('L', 'sum'),
+        GF=('gf', 'sum'), GA=('ga', 'sum'), Pts=('pts', 'sum')
+    )
+    table.index.name = None
+    table['GD'] = table['GF'] - table['GA']
     
     # Sort
-    df_table = df_table.sort_values(by=['Pts', 'GD', 'GF'], ascending=False)
-    
-    return df_table
+    return table.sort_values(by=['Pts', 'GD', 'GF'], ascending=False)
+
+@st.cache_data(ttl=SQUAD_STATS_TTL)
+def load_remaining_fixtures(league, season):
+    return season_sim.load_remaining(get_db_engine(), league, season)
+
+@st.cache_data(max_entries=6, show_spinner="🎲 Simulating the rest of the season...")
+def get_season_projection(league, version, fixtures, n_sims=SIM_SEASONS):
+    """Monte Carlo of the remaining fixtures, cached per data version and fixture list (in-process, ~2s)."""
+    return season_sim.project_season(load_data(league, version)[0], fixtures, n_sims, workers=1)
 
 def get_top_players(league="EPL", limit=10):
     """Fetches top scorers for the current season."""
@@ -300,7 +219,11 @@ with st.sidebar:
     
     # Use config key as default if available
     default_key = config.ODDS_API_KEY if config.ODDS_API_KEY else ""
-    odds_api_key = st.text_input("Odds API Key", type="password", value=default_key, help="Get free key at the-odds-api.com")
+    if BRAIN_URL:
+        odds_api_key = ""
+        st.caption(f"Live odds from the prediction API ({BRAIN_URL})")
+    else:
+        odds_api_key = st.text_input("Odds API Key", type="password", value=default_key, help="Get free key at the-odds-api.com")
     
     if st.button("🔄 Clear Cache"):
         st.cache_data.clear()
@@ -310,43 +233,71 @@ with st.sidebar:
 # League Selector (Main Page)
 selected_league = st.selectbox("Select League", ["EPL", "La_Liga", "Bundesliga"])
 
-# Load Data
-df, elo_dict, form_dict, elo_hist_df = load_data(selected_league)
+# Load Data (the manifest is re-read every run, so a newer snapshot replaces the cached one)
+snapshot = dashboard_snapshot.read_manifest(selected_league)
+data_version = snapshot['version'] if snapshot else None
+df, elo_dict, form_dict, elo_hist_df = load_data(selected_league, data_version)
+with st.sidebar:
+    if snapshot:
+        st.caption(f"📸 Snapshot {snapshot['version']} · built {snapshot['built_at'][:16].replace('T', ' ')} UTC")
+    else:
+        st.caption("🐢 No snapshot yet: computed live. Run `python3 scripts/feature_engineering_v5.py` to publish one.")
 
 if df.empty:
     st.warning(f"⚠️ No match data found for **{selected_league}**. Please run `python3 scripts/etl_pipeline.py` to fetch data.")
     st.stop()
 
 @st.cache_resource
-def load_model():
+def load_model(version=None):
+    """1X2 classifier, loaded once per published model version."""
     model = xgb.XGBClassifier()
     # Try loading V5, fallback to V4
-    model.load_model(config.MODEL_FILE)
+    model.load_model(model_registry.model_path(config.MODEL_FILE))
     return model
 
-def get_squad_stats(team_name):
-    engine = get_db_engine()
-    # Need to map name to ID first
-    # Or just join on name if unique enough, but ID is safer.
-    # Let's assume teams table has the name.
+@st.cache_resource
+def load_goals_models(version=None):
+    """Over 2.5 and BTTS classifiers, loaded once per published model version (None when unavailable)."""
+    models = {}
+    for market in ('over_2_5', 'btts'):
+        try:
+            model = xgb.XGBClassifier()
+            model.load_model(model_registry.model_path(MARKETS[market][0]))
+            models[market] = model
+        except Exception:
+            models[market] = None
+    return models
+
+@st.cache_data(ttl=SQUAD_STATS_TTL, max_entries=6)
+def load_squad_stats(league, version=None):
+    """
+    Season squad metrics for every team of a league in one grouped query:
+    {team name: (avg xg_chain, avg xg_buildup)}. `version` (the league snapshot) drops the
+    entry when the nightly pipeline publishes new data; the TTL bounds staleness otherwise.
+    """
     query = """
-    SELECT AVG(s.xg_chain) as avg_xg_chain, 
+    SELECT t.name,
+           AVG(s.xg_chain) as avg_xg_chain,
            AVG(s.xg_buildup) as avg_xg_buildup
     FROM player_season_stats s
     JOIN players p ON s.player_id = p.player_id
     JOIN teams t ON p.team_id = t.team_id
-    WHERE s.season = '2025' AND t.name = :name
+    WHERE s.season = '2025'
+      AND t.team_id IN (SELECT home_team_id FROM matches WHERE league = :league
+                        UNION SELECT away_team_id FROM matches WHERE league = :league)
+    GROUP BY t.name
     """
     try:
-        df = pd.read_sql(text(query), engine, params={"name": team_name})
-        if not df.empty and df.iloc[0]['avg_xg_chain'] is not None:
-            return df.iloc[0]['avg_xg_chain'], df.iloc[0]['avg_xg_buildup']
-    except Exception as e:
-        # st.error(e)
-        pass
-    return 0.0, 0.0
+        df = pd.read_sql(text(query), get_db_engine(), params={"league": league})
+    except Exception:
+        return {}
+    df = df[df['avg_xg_chain'].notna()]
+    return {name: (chain, buildup) for name, chain, buildup in df[['name', 'avg_xg_chain', 'avg_xg_buildup']].itertuples(index=False)}
 
-model = load_model()
+model_version = model_registry.current_version()
+squad_stats = load_squad_stats(selected_league, data_version)
+model = load_model(model_version)
+goals_models = load_goals_models(model_version)
 
 # Style Cards
 style_metric_cards(border_left_color="#1E88E5", background_color="#1E1E1E", border_size_px=1, border_color="#333")
@@ -376,21 +327,27 @@ with st.container():
         
         # Live Odds Logic
         def_h, def_d, def_a = 2.00, 3.50, 3.80
-        if odds_api_key:
-            with st.spinner("Fetching live odds..."):
-                sport_key = "soccer_epl"
-                if selected_league == "La_Liga": sport_key = "soccer_spain_la_liga"
-                elif selected_league == "Bundesliga": sport_key = "soccer_germany_bundesliga"
-                
-                odds_df = odds_integration.fetch_live_odds(odds_api_key, sport_key)
-                match_odds = odds_integration.map_teams(home_team, away_team, odds_df)
+        if BRAIN_URL or odds_api_key:
+            try:
+                match_odds, age, quota = lookup_odds(odds_api_key, home_team, away_team)
+            except requests.exceptions.RequestException as e:
+                st.warning(f"⚠️ Live odds unavailable: {e}")
+            else:
                 if match_odds is not None:
                     def_h = match_odds['home_odd']
                     def_d = match_odds['draw_odd']
                     def_a = match_odds['away_odd']
-                    st.success(f"✅ Live Odds: {match_odds['bookmaker']}")
+                    st.success(f"✅ Best prices across {match_odds['bookmakers']} bookmakers: "
+                               f"{match_odds['home_odd']:.2f} ({match_odds['home_bookmaker']}) · "
+                               f"{match_odds['draw_odd']:.2f} ({match_odds['draw_bookmaker']}) · "
+                               f"{match_odds['away_odd']:.2f} ({match_odds['away_bookmaker']})")
+                    if 'home_prob' in match_odds:
+                        st.caption(f"Market (no vig): Home {match_odds['home_prob']:.0%} · Draw {match_odds['draw_prob']:.0%} · "
+                                   f"Away {match_odds['away_prob']:.0%}")
                 else:
                     st.warning("Match not found in live odds.")
+                st.caption(f"Odds updated {'never' if age is None else f'{age / 60:.0f} min ago'}"
+                           + (f" · {quota} API requests left" if quota is not None else ""))
 
         oc1, oc2, oc3 = st.columns(3)
         with oc1: odds_home = st.number_input("Home Odds", value=float(def_h), step=0.01)
@@ -408,9 +365,9 @@ elif model is not None:
     h_stats = form_dict.get(home_team, {'xg_5': 1.0, 'ppda_5': 10.0, 'deep_5': 5.0})
     a_stats = form_dict.get(away_team, {'xg_5': 1.0, 'ppda_5': 10.0, 'deep_5': 5.0})
     
-    # Fetch V5 Squad Stats
-    h_xgc, h_xgb = get_squad_stats(home_team)
-    a_xgc, a_xgb = get_squad_stats(away_team)
+    # V5 Squad Stats (one cached query for the whole league)
+    h_xgc, h_xgb = squad_stats.get(home_team, (0.0, 0.0))
+    a_xgc, a_xgb = squad_stats.get(away_team, (0.0, 0.0))
     
     # Input Vector (MUST MATCH train_model_v5.py)
     # features = ['elo_diff', 'home_ppda_5', 'away_ppda_5', 'home_deep_5', 'away_deep_5', 'home_xg_5', 'away_xg_5', 'home_squad_xg_chain', 'home_squad_xg_buildup', 'away_squad_xg_chain', 'away_squad_xg_buildup']
@@ -490,27 +447,17 @@ elif model is not None:
     input_goals['away_goals_conceded_5'] = a_stats['goals_conceded_5']
     
     # Reorder columns to match training
-    cols_goals = [
-        'elo_diff', 'home_ppda_5', 'away_ppda_5', 'home_deep_5', 'away_deep_5',
-        'home_xg_5', 'away_xg_5', 'home_goals_scored_5', 'home_goals_conceded_5',
-        'away_goals_scored_5', 'away_goals_conceded_5',
-        'home_squad_xg_chain', 'home_squad_xg_buildup', 'away_squad_xg_chain', 'away_squad_xg_buildup'
-    ]
-    input_goals = input_goals[cols_goals]
+    input_goals = input_goals[GOALS_FEATURES]
     
-    # Load Models
+    # Cached models: a missing or failing market falls back to 50%
     try:
-        model_ou = xgb.XGBClassifier()
-        model_ou.load_model("football_v5_over_2_5.json")
-        prob_over = model_ou.predict_proba(input_goals)[0][1]
-    except:
+        prob_over = goals_models['over_2_5'].predict_proba(input_goals)[0][1]
+    except Exception:
         prob_over = 0.5
         
     try:
-        model_btts = xgb.XGBClassifier()
-        model_btts.load_model("football_v5_btts.json")
-        prob_btts = model_btts.predict_proba(input_goals)[0][1]
-    except:
+        prob_btts = goals_models['btts'].predict_proba(input_goals)[0][1]
+    except Exception:
         prob_btts = 0.5
 
     # --- MAIN DISPLAY ---
@@ -688,7 +635,7 @@ elif model is not None:
     with st.expander("📊 Model Insights (Feature Importance)"):
         st.write("These features drive the model's predictions:")
         try:
-            imp_df = pd.read_json(config.FEATURE_IMPORTANCE_FILE)
+            imp_df = pd.read_json(model_registry.model_path(config.FEATURE_IMPORTANCE_FILE))
             st.bar_chart(imp_df.set_index("Feature"))
             st.caption("xGBuildup and xGChain are new metrics representing the squad's playmaking quality.")
         except:
@@ -697,26 +644,49 @@ elif model is not None:
     st.divider()
 
     # --- HISTORICAL DATA ---
+    team_views = load_team_views(selected_league, data_version)
     st.subheader("📅 Recent Match History")
     c1, c2 = st.columns(2)
     with c1:
         st.markdown(f"**{home_team} Form**")
-        st.dataframe(get_last_5_matches(home_team, df), use_container_width=True, hide_index=True)
+        st.dataframe(get_last_5_matches(home_team, team_views), use_container_width=True, hide_index=True)
     with c2:
         st.markdown(f"**{away_team} Form**")
-        st.dataframe(get_last_5_matches(away_team, df), use_container_width=True, hide_index=True)
+        st.dataframe(get_last_5_matches(away_team, team_views), use_container_width=True, hide_index=True)
         
     st.subheader("⚔️ Head-to-Head")
-    st.dataframe(get_h2h_matches(home_team, away_team, df), use_container_width=True, hide_index=True)
+    st.dataframe(get_h2h_matches(home_team, away_team, team_views), use_container_width=True, hide_index=True)
 
     st.divider()
 
     # --- LEAGUE & PLAYERS ---
-    tab_league, tab_players = st.tabs(["🏆 League Standings", "🏃 Top Players"])
+    tab_league, tab_projection, tab_players = st.tabs(["🏆 League Standings", "🔮 Season Projection", "🏃 Top Players"])
     
     with tab_league:
-        st.dataframe(get_league_table(df), use_container_width=True)
+        seasons = sorted(set(team_views[0]['season']), reverse=True)
+        season = st.selectbox("Season", seasons, format_func=lambda y: f"{y}/{str(y + 1)[-2:]}") if len(seasons) > 1 else None
+        st.dataframe(get_league_table(selected_league, data_version, season), use_container_width=True)
         
+    with tab_projection:
+        current_season = int(season_of([pd.Timestamp.today()])[0])
+        projection = get_season_projection(selected_league, data_version, load_remaining_fixtures(selected_league, current_season))
+        if projection is None:
+            st.info("No remaining fixtures for this season. Run `python3 scripts/etl_pipeline.py` to fetch the schedule.")
+        else:
+            summary, _, points_dist = projection
+            st.caption(f"{SIM_SEASONS:,} simulated seasons · Poisson scorelines from each side's recent xG for and against")
+            st.dataframe(summary.style.format({'xPts': '{:.1f}', 'Title': '{:.1%}', f'Top {season_sim.TOP}': '{:.1%}',
+                                               'Relegation': '{:.1%}'}), use_container_width=True)
+            dist_team = st.selectbox("Points distribution", list(summary.index),
+                                     index=list(summary.index).index(home_team) if home_team in summary.index else 0)
+            dist = points_dist.loc[dist_team]
+            dist = dist[dist > 0]
+            fig_pts = go.Figure(go.Bar(x=dist.index, y=dist.values, marker_color='#4ade80'))
+            fig_pts.update_layout(xaxis_title="Final points", yaxis_title="Probability", yaxis_tickformat='.0%',
+                                  height=300, margin=dict(l=20, r=20, t=20, b=20),
+                                  paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color='white'))
+            st.plotly_chart(fig_pts, use_container_width=True)
+
     with tab_players:
         top_players = get_top_players(selected_league, 15)
         if not top_players.empty:
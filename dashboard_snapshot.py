@@ -0,0 +1,169 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+from elo import compute_elo
+from rolling import rolling_features
+from utils import logger
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# snapshots/<league>/<version>/<table>.arrow plus snapshots/<league>/manifest.json naming the
+# current version. The dashboard loads the Arrow IPC files instead of recomputing.
+SNAPSHOT_DIR = os.getenv("DASHBOARD_SNAPSHOT_DIR", os.path.join(ROOT_DIR, "snapshots"))
+MANIFEST = "manifest.json"
+TABLES = ('matches', 'elo', 'form', 'elo_history')
+FORM_COLS = ['xg', 'ppda', 'deep', 'goals_scored', 'goals_conceded']
+KEEP_VERSIONS = 2
+
+MATCHES_QUERY = """
+SELECT
+    m.date, m.match_id, m.home_team_id, m.away_team_id,
+    m.home_goals, m.away_goals,
+    s.home_xg, s.away_xg,
+    s.home_ppda, s.away_ppda,
+    s.home_deep, s.away_deep,
+    t_home.name as home_name, t_away.name as away_name
+FROM matches m
+JOIN match_stats s ON m.match_id = s.match_id
+JOIN teams t_home ON m.home_team_id = t_home.team_id
+JOIN teams t_away ON m.away_team_id = t_away.team_id
+WHERE m.league = :league
+ORDER BY m.date ASC;
+"""
+
+def load_matches(engine, league):
+    """A league's played matches with stats and team names, oldest first."""
+    return pd.read_sql(text(MATCHES_QUERY), engine, params={"league": league})
+
+def compute_league(df, k):
+    """Current Elo, last-5 form per team and the Elo history from a league's matches."""
+    elo = compute_elo(df['home_name'], df['away_name'], df['home_goals'], df['away_goals'], k=k)
+    current_elo = elo.ratings
+    elo_history = pd.DataFrame({
+        'date': np.repeat(df['date'].values, 2),
+        'team': np.column_stack([df['home_name'], df['away_name']]).ravel(),
+        'elo': np.column_stack([elo.post_home, elo.post_away]).ravel()
+    })
+
+    # Long format (team, date, stats) for rolling
+    h_df = df[['date', 'home_name', 'home_xg', 'home_ppda', 'home_deep', 'home_goals', 'away_goals']].rename(
+        columns={'home_name': 'team', 'home_xg': 'xg', 'home_ppda': 'ppda', 'home_deep': 'deep', 'home_goals': 'goals_scored', 'away_goals': 'goals_conceded'}
+    )
+    a_df = df[['date', 'away_name', 'away_xg', 'away_ppda', 'away_deep', 'away_goals', 'home_goals']].rename(
+        columns={'away_name': 'team', 'away_xg': 'xg', 'away_ppda': 'ppda', 'away_deep': 'deep', 'away_goals': 'goals_scored', 'home_goals': 'goals_conceded'}
+    )
+    all_stats = pd.concat([h_df, a_df]).sort_values(['team', 'date'])
+
+    # Fill NaNs with means before rolling (crucial for stability)
+    for col in ['xg', 'ppda', 'deep']:
+        all_stats[col] = all_stats[col].fillna(all_stats[col].mean())
+
+    # Rolling 5 (one grouped pass), then keep each team's latest row
+    rolled = rolling_features(all_stats, 'team', FORM_COLS, windows=(5,))
+    rolled['team'] = all_stats['team'].to_numpy()
+    stats_dict = rolled.groupby('team').tail(1).set_index('team').to_dict('index')
+    return current_elo, stats_dict, elo_history
+
+def league_dir(league):
+    return os.path.join(SNAPSHOT_DIR, league)
+
+def read_manifest(league):
+    """The current snapshot's manifest (version, built_at, rows), or None. Cheap enough for every rerun."""
+    try:
+        with open(os.path.join(league_dir(league), MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def content_version(df):
+    """Version derived from the match rows, so it only changes when the data does."""
+    digest = hashlib.md5(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:10]
+    last = str(df['date'].max()) if not df.empty else "empty"
+    return f"{last}-{digest}"
+
+def write_table(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def read_table(path):
+    # The Arrow read is zero-copy over the memory map; to_pandas() then copies every column
+    # once (the dashboard uses them all and st.cache_data pickles the result anyway)
+    return pa.ipc.open_file(pa.memory_map(path)).read_all().to_pandas()
+
+def publish(engine, league, k):
+    """
+    Builds a league's snapshot and points the manifest at it. Skipped when the matches are
+    unchanged. Files are written into a hidden staging directory and renamed into place,
+    and the manifest is swapped atomically, so readers never see a partial snapshot.
+    Returns the current version.
+    """
+    df = load_matches(engine, league)
+    version = content_version(df)
+    current = read_manifest(league)
+    if current and current['version'] == version and os.path.isdir(os.path.join(league_dir(league), version)):
+        return version
+
+    current_elo, stats_dict, elo_history = compute_league(df, k)
+    directory = league_dir(league)
+    target = os.path.join(directory, version)
+    if not os.path.isdir(target):  # Content seen before (e.g. after a rollback) is reused as is
+        tables = {
+            'matches': df,
+            'elo': pd.DataFrame({'team': list(current_elo), 'elo': list(current_elo.values())}),
+            'form': pd.DataFrame.from_dict(stats_dict, orient='index', columns=[f"{c}_5" for c in FORM_COLS])
+                      .rename_axis('team').reset_index(),
+            'elo_history': elo_history,
+        }
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=directory, prefix=".staging-")
+        try:
+            for name, table in tables.items():
+                write_table(table, os.path.join(staging, f"{name}.arrow"))
+            os.chmod(staging, 0o755)
+            os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    manifest = {
+        'league': league, 'version': version, 'built_at': datetime.utcnow().isoformat(),
+        'rows': len(df), 'teams': len(current_elo), 'tables': list(TABLES),
+    }
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".manifest-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+    # Old versions go once they are out of the window (open mappings stay valid after unlink)
+    versions = sorted((v for v in os.listdir(directory) if not v.startswith('.') and v != MANIFEST),
+                      key=lambda v: os.path.getmtime(os.path.join(directory, v)))
+    for old in versions[:-KEEP_VERSIONS]:
+        if old != version:
+            shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+    logger.info(f"📸 {league} snapshot {version} ({len(df)} matches)")
+    return version
+
+def publish_all(engine, k):
+    """Publishes a snapshot for every league in the database. Returns {league: version}."""
+    with engine.connect() as conn:
+        leagues = [row[0] for row in conn.execute(text("SELECT DISTINCT league FROM matches WHERE league IS NOT NULL"))]
+    return {league: publish(engine, league, k) for league in sorted(leagues)}
+
+def load(league, version):
+    """Reads a snapshot. Returns (matches, current Elo dict, form dict, Elo history) like load_data."""
+    directory = os.path.join(league_dir(league), version)
+    tables = {name: read_table(os.path.join(directory, f"{name}.arrow")) for name in TABLES}
+    current_elo = dict(zip(tables['elo']['team'], tables['elo']['elo']))
+    stats_dict = tables['form'].set_index('team').to_dict('index')
+    return tables['matches'], current_elo, stats_dict, tables['elo_history']
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+INITIAL_RATING = 1500.0
+
+EloResult = namedtuple("EloResult", ["pre_home", "pre_away", "post_home", "post_away", "ratings"])
+
+def _elo_loop(home_idx, away_idx, actual, ratings, k, pre_home, pre_away, post_home, post_away):
+    """Sequential Elo update over integer-encoded teams (works on lists or NumPy arrays)."""
+    for i in range(len(home_idx)):
+        h = home_idx[i]
+        a = away_idx[i]
+        hr = ratings[h]
+        ar = ratings[a]
+        pre_home[i] = hr
+        pre_away[i] = ar
+
+        exp = 1 / (1 + 10 ** ((ar - hr) / 400))
+        ratings[h] = hr + k * (actual[i] - exp)
+        ratings[a] = ar + k * ((1 - actual[i]) - (1 - exp))
+        post_home[i] = ratings[h]
+        post_away[i] = ratings[a]
+
+_elo_loop_jit = None
+
+def _get_jit_loop():
+    """
+    numba-compiled loop, or None when numba is not installed. Compiling costs more than
+    the plain loop saves below ~100k matches, so callers opt in with use_jit=True.
+    """
+    global _elo_loop_jit
+    if _elo_loop_jit is None:
+        try:
+            from numba import njit
+        except ImportError:
+            return None
+        _elo_loop_jit = njit(cache=True)(_elo_loop)
+    return _elo_loop_jit
+
+def encode_teams(home_teams, away_teams):
+    """Integer-encodes both team columns with one shared code table. Returns (home_idx, away_idx, teams)."""
+    home = np.asarray(home_teams)
+    codes, teams = pd.factorize(np.concatenate([home, np.asarray(away_teams)]))
+    return codes[:len(home)], codes[len(home):], teams
+
+def match_outcomes(home_goals, away_goals):
+    """1.0 home win, 0.5 draw, 0.0 away win (missing scores count as away wins, as before)."""
+    hg = np.asarray(home_goals, dtype=float)
+    ag = np.asarray(away_goals, dtype=float)
+    return np.where(hg > ag, 1.0, np.where(hg == ag, 0.5, 0.0))
+
+def compute_elo(home_teams, away_teams, home_goals, away_goals, k=20, initial=INITIAL_RATING,
+                start_ratings=None, use_jit=False):
+    """
+    Runs Elo over matches sorted by date.
+    Teams can be ids or names. Teams found in start_ratings ({team: rating}) resume from that
+    rating, the rest start at `initial`. Returns pre-match and post-match ratings for every
+    match (arrays aligned with the input) plus the final {team: rating} table.
+    """
+    home_idx, away_idx, teams = encode_teams(home_teams, away_teams)
+    actual = match_outcomes(home_goals, away_goals)
+    n = len(home_idx)
+    start = [float((start_ratings or {}).get(t, initial)) for t in teams.tolist()]
+
+    jit_loop = _get_jit_loop() if use_jit else None
+    if jit_loop is not None:
+        ratings = np.array(start, dtype=float)
+        out = [np.empty(n) for _ in range(4)]
+        jit_loop(home_idx, away_idx, actual, ratings, float(k), *out)
+    else:
+        # Python lists beat NumPy scalar indexing inside an interpreted loop
+        ratings = start
+        out = [[0.0] * n for _ in range(4)]
+        _elo_loop(home_idx.tolist(), away_idx.tolist(), actual.tolist(), ratings, k, *out)
+
+    pre_home, pre_away, post_home, post_away = (np.asarray(o, dtype=float) for o in out)
+    final = dict(zip(teams.tolist(), np.asarray(ratings, dtype=float).tolist()))
+    return EloResult(pre_home, pre_away, post_home, post_away, final)
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import requests
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from requests.structures import CaseInsensitiveDict
+
+# --- CONFIGURATION ---
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache"))
+ENABLED = os.getenv("HTTP_CACHE_ENABLED", "1") != "0"
+# Offline replay: serve every request from the cache (ignoring TTLs) and never touch the network
+OFFLINE = os.getenv("HTTP_CACHE_OFFLINE", "0") == "1"
+
+# (URL regex, TTL in seconds). First match wins; URLs without a rule are never cached.
+# None = never expires, 0 = always revalidate (the body is still kept for offline replay).
+TTL_RULES = [
+    (r"understat\.com/(league|team)/[^/]+/20(1[89]|2[0-4])$", None), # Closed seasons never change
+    (r"understat\.com/", 6 * 3600),                                 # Current season
+]
+
+# Query parameters dropped from cache keys and stored URLs (compared case-insensitively)
+CREDENTIAL_PARAMS = {'apikey', 'api_key', 'key', 'token', 'access_token'}
+# Response headers not replayed from the cache (bodies are stored decoded; cookies are not kept)
+UNSTORED_HEADERS = {'set-cookie', 'content-encoding', 'transfer-encoding', 'content-length'}
+
+_lock = threading.Lock()
+
+class CacheMissError(Exception):
+    """Raised in offline mode when a URL has never been cached."""
+
+def set_offline(enabled=True):
+    global OFFLINE
+    OFFLINE = enabled
+
+def add_ttl_rule(pattern, ttl):
+    """Adds a rule that takes precedence over the existing ones."""
+    TTL_RULES.insert(0, (pattern, ttl))
+
+def cacheable(url):
+    """True when a TTL rule covers the URL."""
+    return any(re.search(pattern, url) for pattern, _ in TTL_RULES)
+
+def ttl_for(url):
+    for pattern, ttl in TTL_RULES:
+        if re.search(pattern, url):
+            return ttl
+    return 0
+
+def strip_credentials(url):
+    """The URL without credential query parameters (see CREDENTIAL_PARAMS)."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in CREDENTIAL_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def cache_key(url, params=None):
+    """Returns (full_url, key) for a GET request, both without credential query parameters."""
+    full_url = strip_credentials(requests.Request('GET', url, params=params).prepare().url)
+    return full_url, hashlib.sha256(full_url.encode()).hexdigest()
+
+def _stored_headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() not in UNSTORED_HEADERS}
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, "entries", key[:2], f"{key}.json")
+
+def _body_path(body_hash):
+    return os.path.join(CACHE_DIR, "bodies", body_hash[:2], body_hash)
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def lookup(key):
+    """Returns the cached entry for a key (or None)."""
+    try:
+        with open(_entry_path(key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_fresh(entry):
+    ttl = ttl_for(entry['url'])
+    if ttl is None:
+        return True
+    return time.time() - entry['stored_at'] < ttl
+
+def conditional_headers(entry):
+    """Validators to send so the host can answer 304 Not Modified."""
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def store(key, url, response):
+    """Stores a 200 response. Bodies are content-addressed, so identical pages share one file."""
+    body = response.content
+    body_hash = hashlib.sha256(body).hexdigest()
+    entry = {
+        'url': url,
+        'body_hash': body_hash,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'content_type': response.headers.get('Content-Type'),
+        'headers': _stored_headers(response.headers),
+        'encoding': response.encoding,
+        'stored_at': time.time()
+    }
+    with _lock:
+        if not os.path.exists(_body_path(body_hash)):
+            _atomic_write(_body_path(body_hash), body)
+        _atomic_write(_entry_path(key), json.dumps(entry).encode())
+    return entry
+
+def touch(key, entry, headers=None):
+    """Marks an entry as revalidated (after a 304), keeping any newer headers the 304 carried."""
+    entry['stored_at'] = time.time()
+    if headers:
+        entry['headers'] = {**entry.get('headers', {}), **_stored_headers(headers)}
+    with _lock:
+        _atomic_write(_entry_path(key), json.dumps(entry).encode())
+
+def to_response(entry):
+    """Rebuilds a requests.Response from a cache entry."""
+    with open(_body_path(entry['body_hash']), "rb") as f:
+        body = f.read()
+    response = requests.Response()
+    response._content = body
+    response.status_code = 200
+    response.url = entry['url']
+    response.encoding = entry.get('encoding')
+    stored = entry.get('headers') or {'Content-Type': entry.get('content_type') or ''}
+    response.headers = CaseInsensitiveDict({**stored, 'X-Cache': 'HIT'})
+    return response
@@ -0,0 +1,125 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from utils import logger
+from tree_predictor import TreeEnsemble
+
+# Single source of truth for what each V5 model is trained on and served with
+MATCH_FEATURES = [
+    'elo_diff',
+    'home_ppda_5', 'away_ppda_5',
+    'home_deep_5', 'away_deep_5',
+    'home_xg_5', 'away_xg_5',
+    'home_squad_xg_chain', 'home_squad_xg_buildup',
+    'away_squad_xg_chain', 'away_squad_xg_buildup'
+]
+GOALS_FEATURES = MATCH_FEATURES[:7] + [
+    'home_goals_scored_5', 'home_goals_conceded_5',
+    'away_goals_scored_5', 'away_goals_conceded_5'
+] + MATCH_FEATURES[7:]
+
+# market -> (model file, features, output names). 1X2 outputs follow class order (away, draw, home).
+MARKETS = {
+    '1x2': ("football_v5.json", MATCH_FEATURES, ['away_win', 'draw', 'home_win']),
+    'over_2_5': ("football_v5_over_2_5.json", GOALS_FEATURES, ['over_2_5']),
+    'btts': ("football_v5_btts.json", GOALS_FEATURES, ['btts']),
+}
+
+# Every column any market needs, in a stable order
+ALL_FEATURES = list(dict.fromkeys(f for _, features, _ in MARKETS.values() for f in features))
+
+def prepare_features(df, features=ALL_FEATURES):
+    """Numeric feature matrix with the training-time cleaning (missing rolling/squad stats -> 0)."""
+    try:
+        values = np.array(df[features].to_numpy(dtype=float))  # Fast path: already numeric (or None)
+    except (TypeError, ValueError):
+        values = df[features].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    fill = np.array([c != 'elo_diff' for c in features])
+    values[np.isnan(values) & fill] = 0
+    return pd.DataFrame(values, columns=features, index=df.index)
+
+def file_digest(path):
+    """Short content hash of a model file: the same booster gets the same version on every host and copy."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:10]
+
+class MarketModels:
+    """
+    Every market booster, loaded once. Each model's stored feature names must match the
+    declared schema, otherwise that market is disabled instead of scoring shifted columns.
+    backend: 'xgboost' (Booster.inplace_predict), 'numpy' (array-based TreeEnsemble) or
+    'compiled' (TreeEnsemble with the numba walker). The tree walkers win on small requests,
+    so batches above SMALL_BATCH rows still go to XGBoost. Every path returns identical
+    probabilities.
+    """
+    BACKENDS = ('xgboost', 'numpy', 'compiled')
+    SMALL_BATCH = 64
+
+    def __init__(self, model_dir=".", backend="xgboost"):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Use one of {self.BACKENDS}.")
+        self.model_dir = model_dir
+        self.backend = backend
+        self.boosters = {}   # market -> Booster
+        self.scorers = {}    # market -> predict(X) for the chosen backend
+        self.columns = {}    # market -> column positions in ALL_FEATURES
+        self.versions = {}   # market -> "file@content hash"
+        self.errors = {}     # market -> why it is not served
+        for market, (file_name, features, _) in MARKETS.items():
+            self._load(market, os.path.join(model_dir, file_name), features)
+
+    def _load(self, market, path, features):
+        if not os.path.exists(path):
+            self.errors[market] = f"missing {path}"
+            return
+        booster = xgb.Booster()
+        try:
+            booster.load_model(path)
+        except Exception as e:
+            self.errors[market] = f"corrupt: {e}"
+            return
+        stored = booster.feature_names
+        if stored is not None and list(stored) != features:
+            self.errors[market] = f"schema mismatch: model has {list(stored)}, serving {features}"
+        elif stored is None and booster.num_features() != len(features):
+            self.errors[market] = f"schema mismatch: model has {booster.num_features()} features, serving {len(features)}"
+        if market in self.errors:
+            logger.error(f"❌ {market}: {self.errors[market]}")
+            return
+        self.boosters[market] = booster
+        if self.backend == 'xgboost':
+            self.scorers[market] = booster.inplace_predict
+        else:
+            trees = TreeEnsemble.from_json(path, use_jit=self.backend == 'compiled')
+            self.scorers[market] = lambda X, trees=trees, booster=booster: (
+                trees.predict(X) if len(X) <= self.SMALL_BATCH else booster.inplace_predict(X)
+            )
+        self.columns[market] = [ALL_FEATURES.index(f) for f in features]
+        self.versions[market] = f"{os.path.basename(path)}@{file_digest(path)}"
+
+    @property
+    def version(self):
+        return "+".join(self.versions[m] for m in MARKETS if m in self.versions) or None
+
+    def status(self):
+        return {m: ('ok' if m in self.boosters else self.errors.get(m)) for m in MARKETS}
+
+    def predict(self, X):
+        """
+        Scores a prepared ALL_FEATURES matrix for every loaded market in one pass.
+        Returns {output name: probability array}.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = {}
+        for market, scorer in self.scorers.items():
+            names = MARKETS[market][2]
+            probs = scorer(X[:, self.columns[market]])
+            probs = probs.reshape(len(X), -1)
+            for j, name in enumerate(names):
+                out[name] = probs[:, j]
+        return out
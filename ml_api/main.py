@@ -1,79 +1,441 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import xgboost as xgb
+from typing import List, Optional
 import pandas as pd
+import asyncio
+import time
+import threading
 import os
 import sys
-from sqlalchemy import create_engine
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 
 # --- PATH CONFIGURATION (The Fix) ---
 # Get the absolute path of the folder where THIS script lives (ml_api)
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 # Go up one level to the project root
 ROOT_DIR = os.path.dirname(CURRENT_DIR)
-# Construct the absolute path to the model
-MODEL_PATH = os.path.join(ROOT_DIR, "football_v5.json")
 
-# Add root to sys.path so we can import config.py
+# Add root to sys.path so we can import config.py and the shared modules
 sys.path.append(ROOT_DIR)
 
 try:
-    from config import DB_CONNECTION
+    from config import DB_CONNECTION, ODDS_API_KEY
 except ImportError:
     # Fallback if config is missing
     DB_CONNECTION = os.getenv("DATABASE_URL")
+    ODDS_API_KEY = os.getenv("ODDS_API_KEY")
+# API_DB_URL points the API alone at another database (e.g. the load-test stand-in)
+DB_CONNECTION = os.getenv("API_DB_URL", DB_CONNECTION)
 
-app = FastAPI(title="Football Oracle Brain")
+from ttl_cache import TTLCache
+from single_flight import SingleFlight
+from markets import MarketModels, ALL_FEATURES, prepare_features
+import model_registry
+import odds_integration
+from team_resolver import TeamResolver
 
-# Load Model
-model = xgb.XGBClassifier()
+# Fixtures with no stored prediction for the serving model (e.g. right after a version swap)
+# are scored from the same live features scripts/predict_fixtures.py uses
+sys.path.append(os.path.join(ROOT_DIR, 'scripts'))
+try:
+    from feature_engineering_v5 import fixture_features
+except ImportError as e:
+    fixture_features = None
+    print(f"⚠️ Live fixture features OFFLINE: {e}")
+
+def async_url(url):
+    """Same database through its asyncio driver (asyncpg for Postgres, aiosqlite for SQLite)."""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite')
+    if 'sslmode' in url.query:  # libpq spelling -> asyncpg's
+        url = url.difference_update_query(['sslmode']).update_query_dict({'ssl': url.query['sslmode']})
+    return url.set(drivername='postgresql+asyncpg')
+
+# One bounded async pool for the whole process: requests beyond pool size + overflow wait
+# (up to DB_POOL_TIMEOUT s) instead of opening more connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+engine = None
+
+def get_engine():
+    """The shared pool, created on first use so the app starts (and / answers) without a database."""
+    global engine
+    if engine is None:
+        if not DB_CONNECTION:
+            raise HTTPException(status_code=503, detail="No database configured. Set DB_CONNECTION in config.py (or DATABASE_URL / API_DB_URL).")
+        engine = create_async_engine(async_url(DB_CONNECTION), pool_size=DB_POOL_SIZE, max_overflow=DB_POOL_OVERFLOW,
+                                     pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    return engine
+
+if not DB_CONNECTION:
+    print("⚠️ No database configured (DB_CONNECTION). Predictions and odds are OFFLINE.")
+
+# Inference is CPU-bound, so it runs on a dedicated pool sized to the cores, off the event loop
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", os.cpu_count() or 1))
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+# Columns for every market (1X2, Over 2.5, BTTS), assembled once per request
+FEATURES = ALL_FEATURES
+MAX_BATCH = 1000
+STORED_OUTPUTS = ['home_win', 'draw', 'away_win', 'over_2_5', 'btts']
+
+# In-process caches. Entries are dropped when the feature job bumps the table's version
+# stamp (feature_store_meta.updated_at), checked at most every VERSION_CHECK_INTERVAL s.
+CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", 50000))
+CACHE_TTL = float(os.getenv("API_CACHE_TTL", 3600))
+VERSION_CHECK_INTERVAL = float(os.getenv("FEATURE_VERSION_CHECK_S", 5))
+
+feature_cache = TTLCache(CACHE_SIZE, CACHE_TTL)     # match_id -> feature values (FEATURES order)
+prediction_cache = TTLCache(CACHE_SIZE, CACHE_TTL)  # (match_id, model version) -> prediction
+upcoming_cache = TTLCache(1, 60)                    # 'ids' -> upcoming match_ids
+feature_version = {'stamp': None, 'checked_at': float('-inf')}
+# Concurrent requests for the same (match_id, model version) share one lookup
+lookups = SingleFlight()
+
+# Models come from the registry's CURRENT version (legacy root files until one is published).
+# A watcher thread swaps in a fully loaded new version when the pointer moves; requests
+# keep using the snapshot they started with, so nothing is dropped mid-swap.
+BACKEND = os.getenv("INFERENCE_BACKEND", "xgboost")
+RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL_S", 5))
+Serving = namedtuple("Serving", ["models", "version", "registry_version"])
+
+def load_serving():
+    registry_version = model_registry.current_version()
+    models = MarketModels(model_registry.version_dir(registry_version) or ROOT_DIR, backend=BACKEND)
+    return Serving(models, registry_version or models.version, registry_version)
+
+def announce(serving):
+    models = serving.models
+    if models.boosters:
+        print(f"✅ BRAIN ONLINE: {', '.join(models.boosters)} (version {serving.version}, {models.backend} backend)")
+    for market, error in models.errors.items():
+        print(f"⚠️ {market} OFFLINE: {error}")
+    if '1x2' not in models.boosters:
+        print("   -> Did you train the model? Run 'python3 scripts/train_model_v5.py' first.")
+
+serving = load_serving()
+announce(serving)
 
-if os.path.exists(MODEL_PATH):
+def watch_registry(stop):
+    """Polls the CURRENT pointer and hot-swaps models. A broken version is skipped, not served."""
+    global serving
+    rejected = None
+    while not stop.wait(RELOAD_INTERVAL):
+        version = model_registry.current_version()
+        if version in (serving.registry_version, rejected):
+            continue
+        try:
+            candidate = load_serving()
+        except Exception as e:
+            print(f"❌ Could not load model version {version}: {e}")
+            rejected = version
+            continue
+        if '1x2' not in candidate.models.boosters:
+            print(f"❌ Model version {version} is unusable ({candidate.models.status()}). Keeping {serving.version}.")
+            rejected = version
+            continue
+        previous, serving = serving, candidate
+        print(f"🔄 Model swapped: {previous.version} -> {candidate.version}")
+        announce(candidate)
+
+# Live odds (best/mean prices and fair probabilities across bookmakers), loaded at startup once
+# ODDS_API_KEY is set and refetched lazily by reads (the same odds_integration.OddsCache the dashboard uses).
+odds_cache = None
+
+async def start_odds_cache():
+    global odds_cache
     try:
-        model.load_model(MODEL_PATH)
-        print(f"✅ BRAIN ONLINE: Model loaded from {MODEL_PATH}")
+        async with get_engine().connect() as conn:
+            resolver = await conn.run_sync(TeamResolver.from_db)
+        loop = asyncio.get_running_loop()
+        odds_cache = await loop.run_in_executor(None, odds_integration.shared_cache, ODDS_API_KEY, resolver)
     except Exception as e:
-        print(f"❌ MODEL CORRUPT: {e}")
-else:
-    print(f"⚠️ MODEL MISSING: Looked in {MODEL_PATH}")
-    print("   -> Did you train the model? Run 'python3 scripts/train_model_v5.py' first.")
+        print(f"⚠️ Live odds OFFLINE: {odds_integration.redact(e, ODDS_API_KEY)}")
+
+@asynccontextmanager
+async def lifespan(app):
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_registry, args=(stop,), daemon=True)
+    watcher.start()
+    # The first odds fetch runs alongside startup (the reference keeps the task alive)
+    odds_start = asyncio.ensure_future(start_odds_cache()) if ODDS_API_KEY else None
+    yield
+    stop.set()
+    if odds_start:
+        odds_start.cancel()
+    inference_pool.shutdown(wait=False)
+    if engine is not None:
+        await engine.dispose()
+
+app = FastAPI(title="Football Oracle Brain", lifespan=lifespan)
 
 class PredictionRequest(BaseModel):
     match_id: str
 
-@app.get("/")
-def health():
-    return {"status": "active", "model_loaded": os.path.exists(MODEL_PATH)}
+class BatchPredictionRequest(BaseModel):
+    match_ids: Optional[List[str]] = None
+    upcoming: bool = False  # Score every fixture from today on instead of match_ids
 
-@app.post("/predict")
-def predict_match(req: PredictionRequest):
-    engine = create_engine(DB_CONNECTION)
-    
-    query = f"SELECT * FROM model_features_v5 WHERE match_id = '{req.match_id}'"
+async def sync_feature_version():
+    """Clears the caches when model_features_v5 was rebuilt or updated since the last check."""
+    now = time.monotonic()
+    if now - feature_version['checked_at'] < VERSION_CHECK_INTERVAL:
+        return
+    feature_version['checked_at'] = now  # Set before awaiting, so one request per interval checks
     try:
-        df = pd.read_sql(query, engine)
+        async with get_engine().connect() as conn:
+            stamp = (await conn.execute(text(
+                "SELECT updated_at FROM feature_store_meta WHERE table_name = 'model_features_v5'"
+            ))).scalar()
+    except Exception as e:
+        print(f"⚠️ Could not read feature version: {e}")
+        return
+    stamp = (stamp.isoformat() if hasattr(stamp, 'isoformat') else str(stamp)) if stamp else None
+    if stamp != feature_version['stamp']:
+        if feature_version['stamp'] is not None:
+            print(f"🔄 Features changed ({feature_version['stamp']} -> {stamp}). Clearing caches.")
+        feature_cache.clear()
+        prediction_cache.clear()
+        upcoming_cache.clear()
+        feature_version['stamp'] = stamp
+
+async def query(sql, params=None):
+    """Runs a read on the async pool. A list-valued `ids` param expands to `IN :ids`."""
+    statement = text(sql)
+    if params and 'ids' in params:
+        statement = statement.bindparams(bindparam('ids', expanding=True))
+    db = get_engine()
+    try:
+        async with db.connect() as conn:
+            result = await conn.execute(statement, params or {})
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
-    
-    if df.empty:
-        raise HTTPException(status_code=404, detail="Features not found. Run feature engineering.")
 
-    features = [
-        'elo_diff', 'home_rest', 'away_rest',
-        'home_ppda_5', 'away_ppda_5',
-        'home_deep_5', 'away_deep_5',
-        'home_xg_5', 'away_xg_5'
+async def upcoming_match_ids():
+    ids = upcoming_cache.get('ids')
+    if ids is None:
+        ids = (await query("""
+            SELECT m.match_id
+            FROM matches m
+            WHERE m.date >= CURRENT_DATE
+              AND (EXISTS (SELECT 1 FROM model_features_v5 f WHERE f.match_id = m.match_id)
+                   OR EXISTS (SELECT 1 FROM predictions p WHERE p.match_id = m.match_id))
+            ORDER BY m.date ASC
+        """))['match_id'].tolist()
+        upcoming_cache.set('ids', ids)
+    return ids
+
+async def load_features(match_ids):
+    """Feature rows for many matches: cached rows first, one query for the rest."""
+    rows = {}
+    todo = []
+    for match_id in match_ids:
+        values = feature_cache.get(match_id)
+        if values is None:
+            todo.append(match_id)
+        else:
+            rows[match_id] = values
+    if todo:
+        df = await query(f"SELECT match_id, {', '.join(FEATURES)} FROM model_features_v5 WHERE match_id IN :ids", {'ids': todo})
+        for match_id, values in zip(df['match_id'], df[FEATURES].itertuples(index=False, name=None)):
+            feature_cache.set(match_id, values)
+            rows[match_id] = values
+        for match_id in todo:
+            if match_id not in rows:
+                feature_cache.set(match_id, ())  # Remember misses until the next feature version
+    found = [m for m in match_ids if rows.get(m)]
+    return pd.DataFrame([rows[m] for m in found], columns=FEATURES).assign(match_id=found)
+
+async def load_fixture_features(match_ids):
+    """Features for unplayed fixtures, built from the stored team state (no model_features_v5 row yet)."""
+    if fixture_features is None:
+        return pd.DataFrame()
+    fixtures = await query("""
+        SELECT match_id, date, league, home_team_id, away_team_id
+        FROM matches
+        WHERE home_goals IS NULL AND match_id IN :ids
+    """, {'ids': match_ids})
+    if fixtures.empty:
+        return fixtures
+    fixtures['date'] = pd.to_datetime(fixtures['date'])
+    db = get_engine()
+    try:
+        async with db.connect() as conn:
+            df = await conn.run_sync(lambda sync_conn: fixture_features(sync_conn, fixtures))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database Error: {str(e)}")
+    return df[['match_id'] + FEATURES]
+
+async def load_stored_predictions(match_ids, version):
+    """Fixture predictions precomputed by scripts/predict_fixtures.py for this model and feature version."""
+    df = await query(f"""
+        SELECT match_id, {', '.join(STORED_OUTPUTS)}
+        FROM predictions
+        WHERE model_version = :version AND features_version = :stamp AND match_id IN :ids
+    """, {'version': version, 'stamp': feature_version['stamp'], 'ids': match_ids})
+    return [
+        {"match_id": row['match_id'], **{name: float(row[name]) for name in STORED_OUTPUTS if pd.notna(row[name])}}
+        for row in df.to_dict('records')
     ]
-    
-    # Ensure correct column order and data types
+
+def score(df, models):
+    """One pass over the assembled feature matrix for every market. Returns (predictions, timings in ms)."""
+    if not models.boosters:
+        raise HTTPException(status_code=503, detail="No models loaded.")
+    start = time.perf_counter()
     try:
-        df_input = df[features].astype(float)
-        probs = model.predict_proba(df_input)[0]
-        return {
-            "match_id": req.match_id,
-            "home_win": float(probs[2]),
-            "draw": float(probs[1]),
-            "away_win": float(probs[0])
-        }
+        X = prepare_features(df).to_numpy()
+        prepared = time.perf_counter()
+        probs = models.predict(X)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Prediction Error: {str(e)}")
+    done = time.perf_counter()
+
+    names = list(probs)
+    predictions = [
+        {"match_id": match_id, **{name: float(p) for name, p in zip(names, row)}}
+        for match_id, row in zip(df['match_id'], zip(*probs.values()))
+    ]
+    return predictions, {'prep': 1000 * (prepared - start), 'inference': 1000 * (done - prepared)}
+
+async def fetch_predictions(match_ids, current, timings):
+    """
+    Stored fixture predictions for this model version, then one load-and-score pass for the rest
+    (fixtures not stored for this version get their features built live).
+    """
+    start = time.perf_counter()
+    results = {p['match_id']: p for p in await load_stored_predictions(match_ids, current.version)}
+    todo = [m for m in match_ids if m not in results]
+    df = await load_features(todo) if todo else pd.DataFrame()
+    built = set(df['match_id']) if not df.empty else set()
+    unbuilt = [m for m in todo if m not in built]
+    if unbuilt:
+        df = pd.concat([df, await load_fixture_features(unbuilt)], ignore_index=True)
+    timings['db'] = 1000 * (time.perf_counter() - start)
+    if not df.empty:
+        loop = asyncio.get_running_loop()
+        predictions, score_timings = await loop.run_in_executor(inference_pool, score, df, current.models)
+        timings.update(score_timings)
+        results.update((p['match_id'], p) for p in predictions)
+    for p in results.values():
+        prediction_cache.set((p['match_id'], current.version), p)
+    return results
+
+async def predict_many(match_ids, current):
+    """
+    Cached predictions where possible. Misses are fetched once per (match_id, version) even
+    when many requests ask for the same match at the same time.
+    """
+    timings = {'db': 0.0, 'prep': 0.0, 'inference': 0.0}
+    results = {}
+    todo = []
+    cached_count = 0
+    for match_id in match_ids:
+        cached = prediction_cache.get((match_id, current.version))
+        if cached is None:
+            todo.append((match_id, current.version))
+        else:
+            results[match_id] = cached
+            cached_count += 1
+
+    if todo:
+        async def fetch(keys):
+            found = await fetch_predictions([m for m, _ in keys], current, timings)
+            return {(m, current.version): p for m, p in found.items()}
+        for (match_id, _), p in (await lookups.run(todo, fetch)).items():
+            if p is not None:
+                results[match_id] = p
+
+    predictions = [results[m] for m in match_ids if m in results]
+    missing = [m for m in match_ids if m not in results]
+    return predictions, missing, timings, cached_count
+
+@app.get("/")
+def health():
+    current = serving
+    return {
+        "status": "active",
+        "model_loaded": '1x2' in current.models.boosters,
+        "model_version": current.version,
+        "markets": current.models.status()
+    }
+
+@app.post("/predict")
+async def predict_match(req: PredictionRequest):
+    await sync_feature_version()
+    current = serving
+    predictions = (await predict_many([req.match_id], current))[0]
+    if not predictions:
+        raise HTTPException(status_code=404, detail="Features not found. Run feature engineering.")
+    return {**predictions[0], "model_version": current.version}
+
+@app.post("/predict/batch")
+async def predict_batch(req: BatchPredictionRequest):
+    """Scores many matches (or all upcoming fixtures) with one query and one model call."""
+    start = time.perf_counter()
+    if not req.upcoming:
+        if not req.match_ids:
+            raise HTTPException(status_code=422, detail="Send match_ids or set upcoming=true.")
+        if len(req.match_ids) > MAX_BATCH:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} match_ids per request.")
+
+    await sync_feature_version()
+    current = serving
+    match_ids = await upcoming_match_ids() if req.upcoming else list(dict.fromkeys(req.match_ids))
+    listed = time.perf_counter()
+    predictions, missing, timings, cached = await predict_many(match_ids, current)
+
+    timings['db'] += 1000 * (listed - start)
+    timings['total'] = 1000 * (time.perf_counter() - start)
+    return {
+        "model_version": current.version,
+        "predictions": predictions,
+        "missing": missing,
+        "cached": cached,
+        "latency_ms": {k: round(v, 2) for k, v in timings.items()}
+    }
+
+@app.get("/odds")
+def lookup_odds(home: str, away: str):
+    """Live odds by team names (any spelling), for the dashboard: this process owns the Odds API quota."""
+    if odds_cache is None:
+        raise HTTPException(status_code=503, detail="Live odds unavailable. Set ODDS_API_KEY.")
+    return {
+        "odds": odds_cache.lookup(home, away),
+        "age_s": odds_cache.age(),
+        "requests_left": odds_cache.quota.get('remaining'),
+    }
+
+@app.get("/odds/{match_id}")
+async def match_odds(match_id: str):
+    """Best and mean prices, best bookmaker and overround-free probabilities for a fixture."""
+    if odds_cache is None:
+        raise HTTPException(status_code=503, detail="Live odds unavailable. Set ODDS_API_KEY.")
+    df = await query("SELECT home_team_id, away_team_id FROM matches WHERE match_id = :match_id", {'match_id': match_id})
+    if df.empty:
+        raise HTTPException(status_code=404, detail="Match not found.")
+    match = df.to_dict('records')[0]
+    odds = odds_cache.get_by_team_ids(match['home_team_id'], match['away_team_id'])
+    if odds is None:
+        raise HTTPException(status_code=404, detail="No live odds for this match.")
+    return {"match_id": match_id, **odds, "age_s": round(odds_cache.age(), 1)}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "feature_version": feature_version['stamp'],
+        "model_version": serving.version,
+        "features": feature_cache.stats(),
+        "predictions": prediction_cache.stats(),
+        "coalescing": lookups.stats(),
+        "db_pool": engine.pool.status() if engine is not None else None,
+        "odds": odds_cache.stats() if odds_cache else None,
+    }
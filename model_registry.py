@@ -0,0 +1,117 @@
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from markets import MARKETS
+from utils import logger
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# models/<version>/ holds every booster plus manifest.json; models/CURRENT names the served version
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(ROOT_DIR, "models"))
+POINTER = "CURRENT"
+MANIFEST = "manifest.json"
+FEATURE_IMPORTANCE = "feature_importance.json"
+
+def current_version():
+    """Version named by the CURRENT pointer, or None when nothing was published yet."""
+    try:
+        with open(os.path.join(REGISTRY_DIR, POINTER)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def version_dir(version=None):
+    version = version or current_version()
+    return os.path.join(REGISTRY_DIR, version) if version else None
+
+def list_versions():
+    """Published versions, oldest first."""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(v for v in os.listdir(REGISTRY_DIR) if os.path.isfile(os.path.join(REGISTRY_DIR, v, MANIFEST)))
+
+def load_manifest(version=None):
+    with open(os.path.join(version_dir(version), MANIFEST)) as f:
+        return json.load(f)
+
+def model_path(file_name):
+    """Path of a model artifact in the current version, or the legacy file at the repo root."""
+    directory = version_dir()
+    if directory:
+        path = os.path.join(directory, os.path.basename(file_name))
+        if os.path.exists(path):
+            return path
+    return file_name if os.path.isabs(file_name) else os.path.join(ROOT_DIR, file_name)
+
+def set_current(version):
+    """Atomically points CURRENT at `version` (write a temp file, then rename over the pointer)."""
+    if version not in list_versions():
+        raise ValueError(f"Unknown model version: {version}")
+    fd, tmp = tempfile.mkstemp(dir=REGISTRY_DIR, prefix=".pointer-")
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(REGISTRY_DIR, POINTER))
+    logger.info(f"📌 Serving model version {version}")
+
+def publish(models, metrics=None, feature_importance=None, activate=True):
+    """
+    Publishes a new version. `models` maps market -> trained XGBClassifier; markets not given
+    are carried over from the current version (or the legacy root files), so each training
+    script can publish its own.
+    The version is assembled in a hidden temp directory and renamed into place, so readers
+    never see a half-written model. Returns the new version name.
+    """
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    parent = current_version()
+    version = datetime.utcnow().strftime("v%Y%m%d-%H%M%S")
+    while os.path.exists(os.path.join(REGISTRY_DIR, version)):
+        version += "a"
+    staging = tempfile.mkdtemp(dir=REGISTRY_DIR, prefix=".staging-")
+
+    try:
+        manifest = {'version': version, 'parent': parent, 'created_at': datetime.utcnow().isoformat(), 'markets': {}}
+        # Carry over untouched markets from the current version (first publish: the legacy root files)
+        if parent:
+            source, previous = version_dir(parent), load_manifest(parent)['markets']
+        else:
+            source, previous = ROOT_DIR, {
+                market: {'file': file_name, 'features': features, 'metrics': {}, 'trained_at': None}
+                for market, (file_name, features, _) in MARKETS.items()
+            }
+        for market, entry in previous.items():
+            if market not in models and os.path.exists(os.path.join(source, entry['file'])):
+                shutil.copy2(os.path.join(source, entry['file']), staging)
+                manifest['markets'][market] = entry
+        if feature_importance is None and os.path.exists(os.path.join(source, FEATURE_IMPORTANCE)):
+            shutil.copy2(os.path.join(source, FEATURE_IMPORTANCE), staging)
+
+        for market, model in models.items():
+            file_name, features, _ = MARKETS[market]
+            model.save_model(os.path.join(staging, file_name))
+            manifest['markets'][market] = {
+                'file': file_name,
+                'features': features,
+                'metrics': (metrics or {}).get(market, {}),
+                'trained_at': manifest['created_at'],
+            }
+        if feature_importance is not None:
+            with open(os.path.join(staging, FEATURE_IMPORTANCE), "w") as f:
+                json.dump(feature_importance, f)
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.chmod(staging, 0o755)
+        os.rename(staging, os.path.join(REGISTRY_DIR, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    logger.info(f"📦 Published model version {version} ({', '.join(models)})")
+    if activate:
+        set_current(version)
+    return version
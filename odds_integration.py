@@ -1,102 +1,359 @@
-import requests
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-import streamlit as st
-import config
+from utils import logger, fetch_url
 
-ODDS_API_KEY = config.ODDS_API_KEY
-SPORT = 'soccer_epl' # We can make this dynamic later
+ODDS_URL = 'https://api.the-odds-api.com/v4/sports/{sport_key}/odds'
 REGIONS = 'uk'
-MARKETS = 'h2h'
+# Every market costs one request of quota per region and sport, so only 1X2 is fetched by default.
+# totals and btts are parsed whenever they are returned: opt in with ODDS_MARKETS=h2h,totals(,btts)
+# (btts only on plans that serve it here).
+MARKETS = os.getenv("ODDS_MARKETS", 'h2h')
 
-def fetch_live_odds(api_key, sport_key='soccer_epl'):
+# Dashboard league -> The Odds API sport key
+SPORT_KEYS = {
+    'EPL': 'soccer_epl',
+    'La_Liga': 'soccer_spain_la_liga',
+    'Bundesliga': 'soccer_germany_bundesliga',
+}
+
+# Usage headers sent with every response (requests left this month, used, cost of the last call)
+QUOTA_HEADERS = {'x-requests-remaining': 'remaining', 'x-requests-used': 'used', 'x-requests-last': 'last'}
+
+ODDS_CACHE_TTL = int(os.getenv("ODDS_CACHE_TTL_S", 600))
+# Below this many requests left this month only 1X2 is fetched and refreshes are LOW_QUOTA_SLOWDOWN times rarer;
+# once a refresh no longer fits in the quota it is only retried every QUOTA_EXHAUSTED_RETRY seconds
+QUOTA_RESERVE = int(os.getenv("ODDS_QUOTA_RESERVE", 100))
+LOW_QUOTA_SLOWDOWN = 6
+QUOTA_EXHAUSTED_RETRY = 6 * 3600
+
+# (market, point, outcome) -> column prefix in the per-fixture odds row
+OUTCOME_LABELS = {
+    ('h2h', None, 'home'): 'home', ('h2h', None, 'draw'): 'draw', ('h2h', None, 'away'): 'away',
+    ('totals', 2.5, 'over'): 'over_2_5', ('totals', 2.5, 'under'): 'under_2_5',
+    ('btts', None, 'yes'): 'btts', ('btts', None, 'no'): 'btts_no',
+}
+PRICE_COLUMNS = ['event_id', 'commence_time', 'home_team', 'away_team', 'bookmaker', 'market', 'point', 'outcome', 'price']
+
+def flatten_events(data):
     """
-    Fetches live odds from The Odds API.
+    One pass over an /odds response into a columnar table with a row per
+    (event, bookmaker, market, outcome). Outcomes are normalized to
+    home/draw/away, over/under (with `point`) and yes/no.
     """
-    if not api_key:
-        return None
+    cols = {c: [] for c in PRICE_COLUMNS}
+    for event in data:
+        home_team, away_team = event['home_team'], event['away_team']
+        for bookie in event.get('bookmakers', []):
+            for market in bookie.get('markets', []):
+                for o in market.get('outcomes', []):
+                    name = o['name']
+                    cols['event_id'].append(event.get('id', f"{home_team}|{away_team}|{event['commence_time']}"))
+                    cols['commence_time'].append(event['commence_time'])
+                    cols['home_team'].append(home_team)
+                    cols['away_team'].append(away_team)
+                    cols['bookmaker'].append(bookie['title'])
+                    cols['market'].append(market['key'])
+                    cols['point'].append(o.get('point'))
+                    cols['outcome'].append('home' if name == home_team else 'away' if name == away_team else name.lower())
+                    cols['price'].append(o['price'])
+    table = pd.DataFrame(cols)
+    table['point'] = table['point'].astype(float)
+    table['price'] = table['price'].astype(float)
+    return table
+
+def summarize_prices(table):
+    """
+    Per (event, market, point, outcome): best price and its bookmaker, mean price, number of
+    bookmakers and the overround-removed implied probability. Each bookmaker's book is
+    normalized to sum to 1 (books missing an outcome are left out), the fair probabilities
+    are averaged across bookmakers and renormalized per market.
+    """
+    book = [table['event_id'], table['market'], table['point'], table['bookmaker']]
+    inverse = 1 / table['price']
+    by_book = inverse.groupby(book, dropna=False)
+    outcomes = by_book.transform('size')
+    market = [table['event_id'], table['market'], table['point']]
+    complete = outcomes == outcomes.groupby(market, dropna=False).transform('max')
+    fair = (inverse / by_book.transform('sum')).where(complete)
+
+    grouped = table.assign(fair=fair).groupby(['event_id', 'market', 'point', 'outcome'], dropna=False, sort=False)
+    summary = grouped.agg(best=('price', 'max'), mean=('price', 'mean'), prob=('fair', 'mean'),
+                          bookmakers=('price', 'size'))
+    summary['best_bookmaker'] = table['bookmaker'].to_numpy()[grouped['price'].idxmax().to_numpy()]
+    summary = summary.reset_index()
+    market = [summary['event_id'], summary['market'], summary['point']]
+    summary['prob'] = summary['prob'] / summary['prob'].groupby(market, dropna=False).transform('sum')
+    # Below 1: backing every outcome at the best prices is an arbitrage
+    summary['best_overround'] = (1 / summary['best']).groupby(market, dropna=False).transform('sum')
+    return summary
+
+def fixture_odds(table, summary):
+    """One row per event: best/mean prices, best bookmaker and fair probability for every labelled outcome."""
+    if summary.empty:
+        return []
+    labels = [OUTCOME_LABELS.get((market, None if np.isnan(point) else point, outcome))
+              for market, point, outcome in zip(summary['market'], summary['point'], summary['outcome'])]
+    labelled = summary.assign(label=labels).dropna(subset=['label'])
+    wide = labelled.set_index(['event_id', 'label'])[['best', 'mean', 'prob', 'best_bookmaker']].unstack('label')
+    wide.columns = [f"{label}_{'odd' if field == 'best' else 'bookmaker' if field == 'best_bookmaker' else field}"
+                    for field, label in wide.columns]
+    events = table.groupby('event_id', sort=False).agg(
+        home_team=('home_team', 'first'), away_team=('away_team', 'first'),
+        commence_time=('commence_time', 'first'), bookmakers=('bookmaker', 'nunique'))
+    events = events.join(wide)
+    if 'home_odd' in events:  # Same contract as before: fixtures without a full 1X2 price are skipped
+        events = events.dropna(subset=['home_odd', 'draw_odd', 'away_odd'])
+    else:
+        return []
+    return [{k: v for k, v in row.items() if not (isinstance(v, float) and np.isnan(v))}
+            for row in events.reset_index().to_dict('records')]
+
+def parse_events(data):
+    """Flattens an /odds response to one row per event with prices aggregated across all bookmakers."""
+    table = flatten_events(data)
+    if table.empty:
+        return []
+    return fixture_odds(table, summarize_prices(table))
+
+def redact(error, api_key):
+    """Error text without the API key (request errors quote the full URL)."""
+    return str(error).replace(api_key, '***') if api_key else str(error)
 
-    url = f'https://api.the-odds-api.com/v4/sports/{sport_key}/odds'
+def fetch_sport(api_key, sport_key, markets=MARKETS):
+    """
+    One /odds call for a sport through utils.fetch_url (the host's rate limit, concurrency
+    cap and retry counting apply). Returns (parsed rows, quota dict from the response headers).
+    """
     params = {
         'api_key': api_key,
         'regions': REGIONS,
-        'markets': MARKETS,
+        'markets': markets,
         'oddsFormat': 'decimal'
     }
+    response = fetch_url(ODDS_URL.format(sport_key=sport_key), params=params)
+    quota = {name: response.headers[header] for header, name in QUOTA_HEADERS.items() if header in response.headers}
+    return parse_events(response.json()), quota
 
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        odds_data = []
-        for event in data:
-            home_team = event['home_team']
-            away_team = event['away_team']
-            commence_time = event['commence_time']
-            
-            # Get best odds (using first bookmaker for simplicity, e.g., Betfair or William Hill)
-            # In a real app, we'd compare bookies.
-            bookmakers = event.get('bookmakers', [])
-            if not bookmakers:
-                continue
-                
-            # Try to find a major bookie
-            bookie = bookmakers[0]
-            for b in bookmakers:
-                if b['key'] in ['williamhill', 'betfair', 'bet365']:
-                    bookie = b
-                    break
-            
-            markets = bookie.get('markets', [])
-            if not markets:
-                continue
-                
-            outcomes = markets[0]['outcomes']
-            
-            home_odd = next((x['price'] for x in outcomes if x['name'] == home_team), None)
-            away_odd = next((x['price'] for x in outcomes if x['name'] == away_team), None)
-            draw_odd = next((x['price'] for x in outcomes if x['name'] == 'Draw'), None)
-            
-            if home_odd and away_odd and draw_odd:
-                odds_data.append({
-                    'home_team': home_team,
-                    'away_team': away_team,
-                    'home_odd': home_odd,
-                    'away_odd': away_odd,
-                    'draw_odd': draw_odd,
-                    'bookmaker': bookie['title'],
-                    'commence_time': commence_time
-                })
-                
-        return pd.DataFrame(odds_data)
+def fetch_live_odds(api_key, sport_key='soccer_epl'):
+    """
+    Fetches live odds from The Odds API.
+    """
+    if not api_key:
+        return None
 
+    try:
+        rows, _ = fetch_sport(api_key, sport_key)
+        return pd.DataFrame(rows)
     except Exception as e:
-        st.error(f"Error fetching odds: {e}")
+        logger.error(f"❌ Error fetching odds for {sport_key}: {redact(e, api_key)}")
         return None
 
-def map_teams(local_home, local_away, odds_df):
+def map_teams(local_home, local_away, odds_df, resolver=None):
     """
-    Attempts to map dashboard team names to API team names.
-    Very basic fuzzy matching (substring).
+    Finds the live odds row for a fixture.
+    With a resolver, both the dashboard names and the API names are resolved to team_ids with
+    the shared TeamResolver, so every subsystem agrees on who is who. Without one, names match
+    when one contains the other (e.g. "Man Utd" in "Manchester United").
     """
     if odds_df is None or odds_df.empty:
         return None
-        
+
     if not local_home or not local_away:
         return None
 
-    for index, row in odds_df.iterrows():
-        api_home = row['home_team']
-        api_away = row['away_team']
-        
-        if not api_home or not api_away:
-            continue
-        
-        # Check if one string contains the other (e.g. "Man Utd" in "Manchester United")
-        home_match = (local_home in api_home) or (api_home in local_home)
-        away_match = (local_away in api_away) or (api_away in local_away)
-        
-        if home_match and away_match:
-            return row
-            
+    if resolver is None:
+        for _, row in odds_df.iterrows():
+            api_home, api_away = row['home_team'], row['away_team']
+            if not api_home or not api_away:
+                continue
+            if ((local_home in api_home or api_home in local_home)
+                    and (local_away in api_away or api_away in local_away)):
+                return row
+        return None
+
+    home_id = resolver.resolve(local_home)
+    away_id = resolver.resolve(local_away)
+    if home_id is None or away_id is None:
+        return None
+
+    # Each distinct API spelling is resolved once (memoized inside the resolver)
+    api_names = pd.unique(odds_df[['home_team', 'away_team']].values.ravel())
+    api_ids = {name: resolver.resolve(name) for name in api_names}
+
+    mask = (odds_df['home_team'].map(api_ids) == home_id) & (odds_df['away_team'].map(api_ids) == away_id)
+    if mask.any():
+        return odds_df[mask].iloc[0]
+
     return None
+
+class OddsCache:
+    """
+    Live odds for every configured sport, keyed by resolved (home_id, away_id).
+    All sport keys are fetched concurrently. Refreshes are lazy: a read after the
+    refresh interval serves the current odds and starts one background refetch, so an
+    idle process spends no quota. The interval stretches while the monthly quota runs
+    low. A sport whose fetch fails keeps its previous odds until the next successful refresh.
+    """
+    def __init__(self, api_key, resolver, sport_keys=None, ttl=ODDS_CACHE_TTL):
+        self.api_key = api_key
+        self.resolver = resolver
+        self.sport_keys = list(sport_keys or SPORT_KEYS.values())
+        self.ttl = ttl
+        self.by_sport = {}     # sport_key -> {(home_id, away_id): row}
+        self.odds = {}         # (home_id, away_id) -> row, merged across sports
+        self.quota = {}        # Latest usage headers from the API
+        self.errors = {}       # sport_key -> last error message
+        self.fetched_at = None # time.time() of the last refresh that returned data
+        self.attempted_at = None # time.time() of the last refresh, failed ones included
+        self.unresolved = 0
+        self.lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+    def _index(self, rows):
+        index = {}
+        for row in rows:
+            key = (self.resolver.resolve(row['home_team']), self.resolver.resolve(row['away_team']))
+            if None in key:
+                self.unresolved += 1
+                continue
+            index.setdefault(key, row)
+        return index
+
+    def refresh(self):
+        """Fetches every sport key concurrently and swaps the new odds in. Returns the number of fixtures."""
+        start = time.perf_counter()
+        self.attempted_at = time.time()
+        with ThreadPoolExecutor(max_workers=len(self.sport_keys)) as pool:
+            futures = {sport: pool.submit(fetch_sport, self.api_key, sport, self.markets())
+                       for sport in self.sport_keys}
+
+        fresh, quota, errors = {}, {}, {}
+        for sport, future in futures.items():
+            try:
+                rows, headers = future.result()
+                fresh[sport] = self._index(rows)
+                quota = headers or quota
+            except Exception as e:
+                errors[sport] = redact(e, self.api_key)
+                logger.warning(f"⚠️ Odds refresh failed for {sport}: {errors[sport]}")
+
+        with self.lock:
+            self.by_sport.update(fresh)
+            merged = {}
+            for sport in self.sport_keys:
+                merged.update(self.by_sport.get(sport, {}))
+            self.odds = merged
+            self.quota = quota or self.quota
+            self.errors = errors
+            if fresh:
+                self.fetched_at = time.time()
+        logger.info(f"🎲 Odds cache: {len(merged)} fixtures from {len(fresh)}/{len(self.sport_keys)} sports "
+                    f"in {1000 * (time.perf_counter() - start):.0f}ms (quota left: {self.quota.get('remaining', '?')})")
+        return len(merged)
+
+    def remaining(self):
+        """Requests left this month per the last response, or None before the first."""
+        try:
+            return float(self.quota['remaining'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def markets(self):
+        """Markets to fetch: MARKETS, cut to 1X2 while the monthly quota runs low."""
+        remaining = self.remaining()
+        return 'h2h' if remaining is not None and remaining < QUOTA_RESERVE else MARKETS
+
+    def refresh_cost(self):
+        """Quota spent by one refresh: one request per market (and region) for each sport."""
+        return len(self.sport_keys) * len(self.markets().split(',')) * len(REGIONS.split(','))
+
+    def interval(self):
+        """Seconds between refreshes: the TTL, stretched while the monthly quota runs low."""
+        remaining = self.remaining()
+        if remaining is None:
+            return self.ttl
+        if remaining < self.refresh_cost():
+            return max(self.ttl, QUOTA_EXHAUSTED_RETRY)
+        if remaining < QUOTA_RESERVE:
+            return self.ttl * LOW_QUOTA_SLOWDOWN
+        return self.ttl
+
+    def _due(self):
+        return self.attempted_at is None or time.time() - self.attempted_at >= self.interval()
+
+    def _refresh_in_background(self):
+        if self._refreshing or not self._due():
+            return
+        with self._refresh_lock:
+            if self._refreshing or not self._due():
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Odds refresh crashed: {redact(e, self.api_key)}")
+            finally:
+                self._refreshing = False
+        threading.Thread(target=run, name="odds-refresh", daemon=True).start()
+
+    def start(self):
+        """Loads the odds on first use (later reads refresh them lazily). Returns self."""
+        with self._refresh_lock:
+            if self.attempted_at is None:
+                self.refresh()
+        return self
+
+    def get(self, home_id, away_id):
+        """Odds row for a fixture by team_ids, or None. Stale odds are served while a refresh runs."""
+        self._refresh_in_background()
+        return self.odds.get((home_id, away_id))
+
+    def get_by_team_ids(self, home_team_id, away_team_id):
+        """Odds row for a fixture by any stored team_ids (e.g. from the matches table), or None."""
+        return self.get(self.resolver.canonical(home_team_id), self.resolver.canonical(away_team_id))
+
+    def lookup(self, home_name, away_name):
+        """Odds row for a fixture by any team spelling, or None."""
+        return self.get(self.resolver.resolve(home_name), self.resolver.resolve(away_name))
+
+    def age(self):
+        """Seconds since the last refresh that returned data, or None before the first."""
+        return None if self.fetched_at is None else time.time() - self.fetched_at
+
+    def stats(self):
+        with self.lock:
+            return {
+                'fixtures': len(self.odds),
+                'sports': {sport: len(odds) for sport, odds in self.by_sport.items()},
+                'age_s': self.age(),
+                'ttl_s': self.ttl,
+                'interval_s': self.interval(),
+                'markets': self.markets(),
+                'refresh_cost': self.refresh_cost(),
+                'quota': dict(self.quota),
+                'errors': dict(self.errors),
+                'unresolved': self.unresolved,
+            }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def shared_cache(api_key, resolver, **kwargs):
+    """
+    The process-wide OddsCache for an API key, loaded on first use. Shared so that clearing
+    a caller's own caches (e.g. Streamlit's) never refetches odds that are still fresh.
+    """
+    with _caches_lock:
+        cache = _caches.get(api_key)
+        if cache is None:
+            cache = _caches[api_key] = OddsCache(api_key, resolver, **kwargs)
+        else:
+            cache.resolver = resolver
+    return cache.start()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+def group_starts(keys):
+    """For rows sorted by group, the index of the first row of each row's group."""
+    keys = np.asarray(keys)
+    n = len(keys)
+    new_group = np.ones(n, dtype=bool)
+    if n > 1:
+        new_group[1:] = keys[1:] != keys[:-1]
+    return np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+
+def rolling_features(df, group, cols, windows=(5,), spans=(), shift=False, min_periods=1,
+                     name="{col}_{w}", ewm_name="{col}_ewm{w}"):
+    """
+    Windowed means of `cols` within each group, for rows already sorted by group then date.
+
+    Every rolling window comes from one per-group cumulative sum per column: a window mean
+    is two lookups into the running sums (and running non-NaN counts), so extra windows
+    cost a gather, not another pass. EWMA columns (pandas span semantics) use one grouped ewm
+    pass per span. With shift=True each row only sees earlier rows of its group
+    (pre-match features). Same NaN handling as Series.rolling(w, min_periods).mean().
+    Returns a DataFrame aligned with df.
+    """
+    starts = group_starts(df[group].to_numpy())
+    idx = np.arange(len(df))
+    values = df[cols].to_numpy(dtype=float)
+
+    # Running sums / counts restart at every group, so rounding error is bounded by the group's
+    # length, not the table's. prefix(k) = sum of the group's rows before k: sum(a..b-1) = prefix(b) - prefix(a)
+    valid = ~np.isnan(values)
+    by_group = pd.DataFrame(np.where(valid, values, 0.0)).groupby(starts, sort=False)
+    csum = by_group.cumsum().to_numpy()
+    ccount = pd.DataFrame(valid.astype(float)).groupby(starts, sort=False).cumsum().to_numpy()
+
+    def prefix(running, k):
+        return np.where((k > starts)[:, None], running[np.maximum(k - 1, 0)], 0.0)
+
+    end = idx if shift else idx + 1
+    out = {}
+    for w in windows:
+        begin = np.maximum(end - w, starts)
+        total = prefix(csum, end) - prefix(csum, begin)
+        count = prefix(ccount, end) - prefix(ccount, begin)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count >= max(min_periods, 1), total / count, np.nan)
+        for j, col in enumerate(cols):
+            out[name.format(col=col, w=w)] = mean[:, j]
+
+    if spans:
+        grouped = pd.DataFrame(values, columns=cols).groupby(starts, sort=False)
+        first_row = idx == starts
+        for span in spans:
+            ewm = grouped.ewm(span=span, min_periods=min_periods).mean().reset_index(level=0, drop=True).sort_index().to_numpy()
+            if shift:
+                ewm = np.vstack([np.full((1, len(cols)), np.nan), ewm[:-1]])
+                ewm[first_row] = np.nan
+            for j, col in enumerate(cols):
+                out[ewm_name.format(col=col, w=span)] = ewm[:, j]
+
+    return pd.DataFrame(out, index=df.index)
@@ -0,0 +1,78 @@
+import argparse
+import time
+import sys
+import os
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tree_predictor import TreeEnsemble
+
+MODELS = ["football_v5.json", "football_v5_over_2_5.json", "football_v5_btts.json"]
+
+def latencies(fn, rows, repeat):
+    """Per-call latency in ms for each row (cycled `repeat` times)."""
+    times = []
+    for i in range(repeat):
+        row = rows[i % len(rows)]
+        start = time.perf_counter()
+        fn(row)
+        times.append(1000 * (time.perf_counter() - start))
+    return np.array(times)
+
+def bench_model(path, batch_size, repeat, seed):
+    booster = xgb.Booster()
+    booster.load_model(path)
+    clf = xgb.XGBClassifier()
+    clf.load_model(path)
+    names = booster.feature_names
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 50, size=(batch_size, booster.num_features())).astype(np.float32)
+    X[rng.random(X.shape) < 0.02] = np.nan
+    single_rows = [X[i:i + 1] for i in range(min(len(X), 1000))]
+    single_frames = [pd.DataFrame(r, columns=names) for r in single_rows]
+
+    numpy_trees = TreeEnsemble.from_json(path)
+    compiled_trees = TreeEnsemble.from_json(path, use_jit=True)
+    compiled_trees.predict(X[:2])  # Compile outside the timings
+
+    expected = booster.inplace_predict(X)
+    for label, model in [("numpy", numpy_trees), ("compiled", compiled_trees)]:
+        if not np.array_equal(model.predict(X), expected):
+            print(f"❌ {label} backend differs from XGBoost on {path}")
+            sys.exit(1)
+
+    backends = [
+        ("predict_proba", lambda r: clf.predict_proba(r), single_frames, pd.DataFrame(X, columns=names)),
+        ("inplace_predict", booster.inplace_predict, single_rows, X),
+        ("numpy walker", numpy_trees.predict, single_rows, X),
+        ("compiled walker" if compiled_trees.jit else "compiled (no numba)", compiled_trees.predict, single_rows, X),
+    ]
+    print(f"\n🌲 {os.path.basename(path)}: {len(numpy_trees.roots)} trees, depth {numpy_trees.max_depth} (bit-exact ✅)")
+    print(f"   {'backend':<22}{'1-row p50':>12}{'1-row p99':>12}{f'{batch_size}-row':>14}")
+    for label, fn, rows, batch in backends:
+        single = latencies(lambda r: fn(rows[r]), range(len(rows)), repeat)
+        start = time.perf_counter()
+        fn(batch)
+        batch_ms = 1000 * (time.perf_counter() - start)
+        print(f"   {label:<22}{np.percentile(single, 50):>10.3f}ms{np.percentile(single, 99):>10.3f}ms{batch_ms:>12.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tree-ensemble inference backends (latency p50/p99).")
+    parser.add_argument("models", nargs="*", help="Booster JSON files (default: the V5 models)")
+    parser.add_argument("--batch", type=int, default=10000, help="Rows in the batch test")
+    parser.add_argument("--repeat", type=int, default=2000, help="Single-row calls per backend")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    paths = args.models or [os.path.join(root, m) for m in MODELS if os.path.exists(os.path.join(root, m))]
+    if not paths:
+        print("❌ No models found. Train them first or pass booster JSON files.")
+        sys.exit(1)
+    for path in paths:
+        bench_model(path, args.batch, args.repeat, args.seed)
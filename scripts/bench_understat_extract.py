@@ -0,0 +1,74 @@
+import argparse
+import glob
+import json
+import time
+import sys
+import os
+from bs4 import BeautifulSoup
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import http_cache
+from understat import extract_datasets
+
+VARIABLES = ['datesData', 'teamsData', 'playersData']
+
+def extract_bs4(content):
+    """The previous extraction path: full html.parser DOM, one <script> walk per variable."""
+    datasets = {}
+    for name in VARIABLES:
+        soup = BeautifulSoup(content, 'html.parser')
+        for script in soup.find_all('script'):
+            if script.string and name in script.string:
+                json_string = script.string.split("('")[1].split("')")[0]
+                datasets[name] = json.loads(json_string.encode('utf8').decode('unicode_escape'))
+                break
+    return datasets
+
+def cached_understat_pages():
+    """Bodies of every Understat page in the HTTP cache."""
+    pages = []
+    for entry_file in glob.glob(os.path.join(http_cache.CACHE_DIR, "entries", "*", "*.json")):
+        with open(entry_file) as f:
+            entry = json.load(f)
+        if "understat.com" in entry['url']:
+            pages.append(os.path.join(http_cache.CACHE_DIR, "bodies", entry['body_hash'][:2], entry['body_hash']))
+    return pages
+
+def bench(fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in pages:
+            fn(content)
+    return 1000 * (time.perf_counter() - start) / (repeat * len(pages))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Understat dataset extraction (regex vs BeautifulSoup).")
+    parser.add_argument("pages", nargs="*", help="Saved Understat HTML pages (default: Understat pages in the HTTP cache)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = args.pages or cached_understat_pages()
+    if not paths:
+        print("❌ No saved pages. Run a scraper once to fill the HTTP cache, or pass page files.")
+        sys.exit(1)
+
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    print(f"📄 {len(pages)} pages, {sum(len(p) for p in pages) / 1e6:.1f} MB")
+
+    # Parity: both paths must decode exactly the same datasets
+    for path, content in zip(paths, pages):
+        fast = extract_datasets(content, VARIABLES)
+        if fast != extract_bs4(content):
+            print(f"❌ Mismatch on {path}")
+            sys.exit(1)
+    print("✅ Both extractors return identical datasets")
+
+    bs4_ms = bench(extract_bs4, pages, args.repeat)
+    fast_ms = bench(extract_datasets, pages, args.repeat)
+    print(f"🐢 BeautifulSoup: {bs4_ms:.2f} ms/page")
+    print(f"🚀 Regex:         {fast_ms:.2f} ms/page ({bs4_ms / fast_ms:.1f}x faster)")
@@ -1,10 +1,12 @@
 import requests
 import pandas as pd
 import json
-from bs4 import BeautifulSoup
+import hashlib
+import argparse
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta
 import time
+import zlib
 import sys
 import os
 
@@ -12,7 +14,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
-from utils import fetch_url, logger
+from utils import fetch_url, bulk_upsert, log_host_stats, logger
+from understat import fetch_league_datasets
+from team_resolver import TeamResolver
 
 # --- CONFIGURATION ---
 DB_CONNECTION = config.DB_CONNECTION
@@ -34,11 +38,50 @@ FD_LEAGUES = {
 }
 
 SEASON = 2025
+SEASON_START = "2025-08-11"
+SEASON_END = "2026-05-20"
+
+# API-Football statuses of fixtures that are still to be played
+SCHEDULED_STATUSES = ['NS', 'TBD']
+
+# Incremental runs re-scan this many days before each watermark: Understat often posts xG a day
+# or more after the result, and a match first stored without xG is picked up again here
+XG_LOOKBACK_DAYS = int(os.getenv("XG_LOOKBACK_DAYS", 3))
 
 # --- 1. DATABASE CONNECTION ---
 def get_db_engine():
     return create_engine(DB_CONNECTION)
 
+# --- 1b. SYNC WATERMARKS ---
+def get_watermarks(engine, league_name):
+    """Returns {source: last_match_date} for a league (empty if never synced)."""
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT source, last_match_date FROM sync_state WHERE league = :league
+            """), {'league': league_name}).fetchall()
+        return {source: str(last_date) for source, last_date in rows if last_date}
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read sync_state ({e}). Running a full sync.")
+        return {}
+
+def resume_date(last_date, lookback_days=XG_LOOKBACK_DAYS):
+    """Start of the fetch window for a watermark (YYYY-MM-DD), moved back by the xG lookback."""
+    return str((datetime.strptime(last_date[:10], '%Y-%m-%d') - timedelta(days=lookback_days)).date())
+
+def latest_result_date(source, data):
+    """Latest finished match date (YYYY-MM-DD) in a source's raw payload."""
+    if source == 'understat':
+        dates = [m['datetime'][:10] for m in data if m['isResult']]
+    else:
+        dates = [f['fixture']['date'][:10] for f in data if f['fixture']['status']['short'] in ['FT', 'AET', 'PEN']]
+    return max(dates) if dates else None
+
+def content_hash(match_row, stats_row):
+    """Stable hash of everything we write for a match, used to skip unchanged rows."""
+    payload = json.dumps([match_row, stats_row], sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
 # --- 2a. RAPID API FETCHER ---
 def fetch_api_fixtures(league_id, date_from, date_to):
     # ... (Existing code)
@@ -58,7 +101,7 @@ def fetch_api_fixtures(league_id, date_from, date_to):
         return []
 
 # --- 2b. FOOTBALL-DATA.ORG FETCHER ---
-def fetch_football_data_org(league_name):
+def fetch_football_data_org(league_name, date_from=None, date_to=None):
     if not FD_API_KEY:
         logger.warning("⚠️ No FOOTBALL_DATA_ORG_KEY found. Skipping.")
         return []
@@ -69,6 +112,8 @@ def fetch_football_data_org(league_name):
     url = f"https://api.football-data.org/v4/competitions/{fd_id}/matches"
     headers = {"X-Auth-Token": FD_API_KEY}
     querystring = {"season": str(SEASON)}
+    if date_from and date_to:
+        querystring.update({"dateFrom": date_from, "dateTo": date_to})
     
     logger.info(f"📡 Fetching matches from Football-Data.org ({league_name})...")
     try:
@@ -84,10 +129,13 @@ def fetch_football_data_org(league_name):
         # ADAPTER: Convert to RapidAPI format
         adapted = []
         for m in matches:
-            if m['status'] != 'FINISHED': continue
-            
-            # Map Status
-            status_short = 'FT'
+            # Map Status (finished and scheduled fixtures only)
+            if m['status'] == 'FINISHED':
+                status_short = 'FT'
+            elif m['status'] in ('SCHEDULED', 'TIMED'):
+                status_short = 'NS'
+            else:
+                continue
             
             # Map Date
             date = m['utcDate']
@@ -129,18 +177,11 @@ def scrape_understat_xg(league="EPL", season="2025"):
     logger.info(f"🕵️  Scraping xG data from {base_url}...")
     
     try:
-        response = fetch_url(base_url)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        decoded_data = fetch_league_datasets(league, season).get('datesData')
         
-        scripts = soup.find_all('script')
-        strings = [script.string for script in scripts if script.string and 'datesData' in script.string]
-        
-        if not strings:
+        if not decoded_data:
             logger.warning("⚠️  Could not find data on Understat.")
             return []
-
-        json_data = strings[0].split("('")[1].split("')")[0]
-        decoded_data = json.loads(json_data.encode('utf8').decode('unicode_escape'))
         
         logger.info(f"✅ Scraped xG data for {len(decoded_data)} matches.")
         return decoded_data
@@ -149,7 +190,59 @@ def scrape_understat_xg(league="EPL", season="2025"):
         return []
 
 # --- 4. DATA STORAGE ENGINE ---
-def process_and_store(api_data, scraped_data, league_name):
+def write_league_rows(conn, teams, matches, stats, update_team_league=True):
+    """
+    Writes a league's teams, matches and stats with one multi-row upsert per table.
+    Returns the total number of rows written.
+    """
+    written = bulk_upsert(conn, 'teams', list(teams.values()), ['team_id'],
+                          ['league'] if update_team_league else None)
+    written += bulk_upsert(conn, 'matches', list(matches.values()), ['match_id'],
+                           ['date', 'home_goals', 'away_goals', 'status', 'league', 'content_hash'])
+    written += bulk_upsert(conn, 'match_stats', list(stats.values()), ['match_id'],
+                           ['home_xg', 'away_xg'])
+    return written
+
+# Unplayed rows of a league season outside this batch (their pairing is checked in Python)
+UNPLAYED_ROWS_QUERY = """
+SELECT match_id, home_team_id, away_team_id FROM matches
+WHERE league = :league AND season = :season AND home_goals IS NULL AND NOT (match_id = ANY(:ids))
+"""
+
+def retire_moved_fixtures(conn, league_name, matches):
+    """
+    Deletes the old rows of rescheduled fixtures. Match ids carry the kick-off date, so a new
+    date arrives as a new row; a pairing is played once per season, so an unplayed row of a
+    pairing in this batch under another id is stale. Its odds snapshots move to the new id and
+    its predictions are dropped (predict_fixtures.py scores the new row). Returns the number deleted.
+    """
+    current = {(r['home_team_id'], r['away_team_id']): mid for mid, r in matches.items()}
+    rows = conn.execute(text(UNPLAYED_ROWS_QUERY),
+                        {'league': league_name, 'season': str(SEASON), 'ids': list(matches)}).fetchall()
+    moved = [{'old': mid, 'new': current[(h, a)]} for mid, h, a in rows if (h, a) in current]
+    if not moved:
+        return 0
+
+    for table_name, stmt in [
+        ('odds_snapshots', "UPDATE odds_snapshots SET match_id = :new WHERE match_id = :old"),
+        ('predictions', "DELETE FROM predictions WHERE match_id = :old"),
+    ]:
+        try:
+            with conn.begin_nested():
+                conn.execute(text(stmt), moved)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not update {table_name} for rescheduled fixtures ({e}).")
+    old_ids = [m['old'] for m in moved]
+    conn.execute(text("DELETE FROM match_stats WHERE match_id = ANY(:ids)"), {'ids': old_ids})
+    conn.execute(text("DELETE FROM matches WHERE match_id = ANY(:ids)"), {'ids': old_ids})
+    logger.info(f"📅 {league_name}: {len(moved)} rescheduled fixtures moved to their new date.")
+    return len(moved)
+
+def process_and_store(api_data, scraped_data, league_name, api_source='rapidapi', full=False):
+    """
+    Upserts a league's finished and scheduled matches and advances the sync watermarks of the sources used.
+    Unless full=True, matches whose content hash is unchanged are skipped.
+    """
     engine = get_db_engine()
     
     # 1. Prepare Data Source
@@ -158,187 +251,182 @@ def process_and_store(api_data, scraped_data, league_name):
     if not api_data and scraped_data:
         logger.warning(f"⚠️ Using Understat as FALLBACK for {league_name} matches.")
         use_fallback = True
-        # Convert scraped_data to a format similar to api_data for iteration, 
-        # OR just iterate scraped_data directly.
-        # Let's iterate scraped_data directly in the fallback block.
     
-    scraped_map = {}
-    for match in scraped_data:
-        key = f"{match['h']['title']} - {match['a']['title']}"
-        scraped_map[key] = match
+    # Rows are collected in memory (keyed by primary key) and written in one transaction
+    teams, matches, stats = {}, {}, {}
 
     with engine.connect() as conn:
         # --- FALLBACK MODE (Understat Only) ---
         if use_fallback:
+            # One resolver over every known team and alias instead of a SELECT per fixture
+            resolver = TeamResolver.from_db(conn)
+
+            def get_or_create_team(name, league):
+                team_id = resolver.resolve(name)
+                if team_id: return team_id
+                
+                # Deterministic hash of the name (offset to avoid collision with API IDs)
+                new_id = (zlib.crc32(name.encode()) % 100000) + 500000
+                teams[new_id] = {'team_id': new_id, 'name': name, 'league': league}
+                resolver.add_team(new_id, name)
+                return new_id
+
             for match in scraped_data:
-                if not match['isResult']: continue # Skip unplayed
+                played = match['isResult'] # Unplayed fixtures are stored too (goals NULL) so they can be predicted
                 
                 match_date = match['datetime'].split(' ')[0]
-                h_name = match['h']['title']
-                a_name = match['a']['title']
-                h_goals = int(match['goals']['h'])
-                a_goals = int(match['goals']['a'])
-                h_xg = float(match['xG']['h'])
-                a_xg = float(match['xG']['a'])
-                
-                # Generate/Find Team IDs
-                # We use a simple hash or offset for fallback IDs to avoid collision with API IDs (usually < 10000)
-                # But ideally we check if name exists.
-                
-                def get_or_create_team(name, league):
-                    # Check DB
-                    res = conn.execute(text("SELECT team_id FROM teams WHERE name = :name"), {"name": name}).fetchone()
-                    if res: return res[0]
-                    
-                    # Create new ID (Understat ID + 500000 is risky if we don't have it here)
-                    # Let's use a hash of the name to be deterministic? Or just a random high number?
-                    # Let's use a deterministic hash modulo 100000 + 500000
-                    import zlib
-                    new_id = (zlib.crc32(name.encode()) % 100000) + 500000
-                    
-                    conn.execute(text("""
-                        INSERT INTO teams (team_id, name, league) VALUES (:id, :name, :league)
-                        ON CONFLICT (team_id) DO NOTHING
-                    """), {'id': new_id, 'name': name, 'league': league})
-                    return new_id
-
-                h_id = get_or_create_team(h_name, league_name)
-                a_id = get_or_create_team(a_name, league_name)
+                h_id = get_or_create_team(match['h']['title'], league_name)
+                a_id = get_or_create_team(match['a']['title'], league_name)
                 
                 match_uid = f"{match_date}-{h_id}-{a_id}"
                 
-                # Insert Match
-                conn.execute(text("""
-                    INSERT INTO matches (match_id, date, season, home_team_id, away_team_id, home_goals, away_goals, status, league)
-                    VALUES (:mid, :date, :season, :hid, :aid, :hg, :ag, :status, :league)
-                    ON CONFLICT (match_id) DO UPDATE SET 
-                        home_goals = EXCLUDED.home_goals,
-                        away_goals = EXCLUDED.away_goals,
-                        status = EXCLUDED.status,
-                        league = EXCLUDED.league
-                """), {
-                    'mid': match_uid,
+                matches[match_uid] = {
+                    'match_id': match_uid,
                     'date': match_date,
                     'season': str(SEASON),
-                    'hid': h_id,
-                    'aid': a_id,
-                    'hg': h_goals,
-                    'ag': a_goals,
-                    'status': 'FT',
+                    'home_team_id': h_id,
+                    'away_team_id': a_id,
+                    'home_goals': int(match['goals']['h']) if played else None,
+                    'away_goals': int(match['goals']['a']) if played else None,
+                    'status': 'FT' if played else 'NS',
                     'league': league_name
-                })
-                
-                # Insert Stats
-                conn.execute(text("""
-                    INSERT INTO match_stats (match_id, home_xg, away_xg)
-                    VALUES (:mid, :hxg, :axg)
-                    ON CONFLICT (match_id) DO UPDATE SET
-                        home_xg = EXCLUDED.home_xg,
-                        away_xg = EXCLUDED.away_xg
-                """), {
-                    'mid': match_uid,
-                    'hxg': h_xg,
-                    'axg': a_xg
-                })
-                conn.commit()
-            return # Done with fallback
+                }
+                if played:
+                    stats[match_uid] = {
+                        'match_id': match_uid,
+                        'home_xg': float(match['xG']['h']),
+                        'away_xg': float(match['xG']['a'])
+                    }
 
         # --- NORMAL MODE (API Data) ---
-        for fixture in api_data:
-            fix = fixture['fixture']
-            teams = fixture['teams']
-            goals = fixture['goals']
+        else:
+            # Understat spellings are resolved against this batch's API teams, so xG is an O(1) lookup
+            finished = [f for f in api_data if f['fixture']['status']['short'] in ['FT', 'AET', 'PEN']]
+            scheduled = [f for f in api_data if f['fixture']['status']['short'] in SCHEDULED_STATUSES]
+            api_teams = {f['teams'][side]['id']: f['teams'][side]['name'] for f in finished + scheduled for side in ['home', 'away']}
+            resolver = TeamResolver.from_db(conn, team_ids=list(api_teams))
+            for team_id, name in api_teams.items():
+                resolver.add_team(team_id, name)
             
-            if fix['status']['short'] not in ['FT', 'AET', 'PEN']:
-                continue
+            scraped_map = {}
+            for match in scraped_data:
+                if not match['isResult']: continue
+                for h_id in resolver.resolve_all(match['h']['title']):
+                    for a_id in resolver.resolve_all(match['a']['title']):
+                        scraped_map[(h_id, a_id)] = match
 
-            match_date = fix['date'].split('T')[0]
-            
-            # Insert Teams
-            for side in ['home', 'away']:
-                t_id = teams[side]['id']
-                t_name = teams[side]['name']
-                conn.execute(text("""
-                    INSERT INTO teams (team_id, name, league) VALUES (:id, :name, :league)
-                    ON CONFLICT (team_id) DO UPDATE SET league = EXCLUDED.league
-                """), {'id': t_id, 'name': t_name, 'league': league_name})
-
-            # Match Mapping
-            home_name = teams['home']['name']
-            away_name = teams['away']['name']
-            
-            scrape_key = f"{home_name} - {away_name}"
-            xg_stats = scraped_map.get(scrape_key)
-            
-            if not xg_stats:
-                for k, v in scraped_map.items():
-                    if home_name in k and away_name in k:
-                        xg_stats = v
-                        break
-            
-            home_xg = float(xg_stats['xG']['h']) if xg_stats else None
-            away_xg = float(xg_stats['xG']['a']) if xg_stats else None
-
-            match_uid = f"{match_date}-{teams['home']['id']}-{teams['away']['id']}"
-
-            conn.execute(text("""
-                INSERT INTO matches (match_id, date, season, home_team_id, away_team_id, home_goals, away_goals, status, league)
-                VALUES (:mid, :date, :season, :hid, :aid, :hg, :ag, :status, :league)
-                ON CONFLICT (match_id) DO UPDATE SET 
-                    home_goals = EXCLUDED.home_goals,
-                    away_goals = EXCLUDED.away_goals,
-                    status = EXCLUDED.status,
-                    league = EXCLUDED.league
-            """), {
-                'mid': match_uid,
-                'date': match_date,
-                'season': str(SEASON),
-                'hid': teams['home']['id'],
-                'aid': teams['away']['id'],
-                'hg': goals['home'],
-                'ag': goals['away'],
-                'status': fix['status']['short'],
-                'league': league_name
-            })
+            # Scheduled fixtures are stored with NULL goals so predict_fixtures.py can score them
+            for fixture in finished + scheduled:
+                fix = fixture['fixture']
+                fix_teams = fixture['teams']
+                goals = fixture['goals']
+
+                match_date = fix['date'].split('T')[0]
+                
+                for side in ['home', 'away']:
+                    t_id = fix_teams[side]['id']
+                    teams[t_id] = {'team_id': t_id, 'name': fix_teams[side]['name'], 'league': league_name}
+
+                # Match Mapping
+                xg_stats = scraped_map.get((fix_teams['home']['id'], fix_teams['away']['id']))
+
+                match_uid = f"{match_date}-{fix_teams['home']['id']}-{fix_teams['away']['id']}"
+
+                matches[match_uid] = {
+                    'match_id': match_uid,
+                    'date': match_date,
+                    'season': str(SEASON),
+                    'home_team_id': fix_teams['home']['id'],
+                    'away_team_id': fix_teams['away']['id'],
+                    'home_goals': goals['home'],
+                    'away_goals': goals['away'],
+                    'status': fix['status']['short'],
+                    'league': league_name
+                }
+
+                if xg_stats and fix['status']['short'] not in SCHEDULED_STATUSES:
+                    stats[match_uid] = {
+                        'match_id': match_uid,
+                        'home_xg': float(xg_stats['xG']['h']),
+                        'away_xg': float(xg_stats['xG']['a'])
+                    }
+
+        start = time.perf_counter()
+        batch = dict(matches)
+
+        # Skip matches whose content is identical to what is already stored
+        for mid, row in matches.items():
+            row['content_hash'] = content_hash(row, stats.get(mid))
+        skipped = 0
+        if not full and matches:
+            stored = dict(conn.execute(text("""
+                SELECT match_id, content_hash FROM matches WHERE match_id = ANY(:ids)
+            """), {'ids': list(matches)}).fetchall())
+            unchanged = [mid for mid, row in matches.items() if stored.get(mid) == row['content_hash']]
+            for mid in unchanged:
+                del matches[mid]
+                stats.pop(mid, None)
+            skipped = len(unchanged)
+            used_ids = {r['home_team_id'] for r in matches.values()} | {r['away_team_id'] for r in matches.values()}
+            teams = {tid: t for tid, t in teams.items() if tid in used_ids}
 
-            if home_xg is not None:
-                conn.execute(text("""
-                    INSERT INTO match_stats (match_id, home_xg, away_xg)
-                    VALUES (:mid, :hxg, :axg)
-                    ON CONFLICT (match_id) DO UPDATE SET
-                        home_xg = EXCLUDED.home_xg,
-                        away_xg = EXCLUDED.away_xg
-                """), {
-                    'mid': match_uid,
-                    'hxg': home_xg,
-                    'axg': away_xg
-                })
-
-            conn.commit()
+        written = write_league_rows(conn, teams, matches, stats, update_team_league=not use_fallback)
+        retire_moved_fixtures(conn, league_name, batch)
+        resolver.save_aliases(conn, source='etl')
+
+        # Advance watermarks in the same transaction as the data they describe
+        marks = {'understat': latest_result_date('understat', scraped_data)}
+        if not use_fallback:
+            marks[api_source] = latest_result_date(api_source, api_data)
+        bulk_upsert(conn, 'sync_state', [
+            {'league': league_name, 'source': source, 'last_match_date': last_date, 'last_run_at': datetime.utcnow()}
+            for source, last_date in marks.items() if last_date
+        ], ['league', 'source'], ['last_match_date', 'last_run_at'])
+
+        conn.commit()
+        elapsed = time.perf_counter() - start
+
+    logger.info(f"💾 {league_name}: wrote {len(teams)} teams, {len(matches)} matches, {len(stats)} stats, "
+                f"skipped {skipped} unchanged in {elapsed:.2f}s ({written / max(elapsed, 1e-6):.0f} rows/s)")
 
 if __name__ == "__main__":
-    start_date = "2025-08-11" 
-    end_date = "2026-05-20"
+    parser = argparse.ArgumentParser(description="Fetch finished matches, scheduled fixtures and xG into the database.")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore sync watermarks and content hashes and rebuild the whole season")
+    args = parser.parse_args()
     
-    logger.info("🚀 Starting Data Pipeline...")
+    logger.info(f"🚀 Starting Data Pipeline ({'full rebuild' if args.full else 'incremental'})...")
+    engine = get_db_engine()
     
     for league_name, league_id in LEAGUES.items():
         logger.info(f"\n🌍 Processing {league_name}...")
         
+        # Each source resumes a few days before its own watermark, so late results and late xG are picked up
+        marks = {} if args.full else {source: resume_date(d) for source, d in get_watermarks(engine, league_name).items()}
+        
         # 1. Try RapidAPI
-        matches = fetch_api_fixtures(league_id, start_date, end_date)
+        api_source = 'rapidapi'
+        matches = fetch_api_fixtures(league_id, marks.get('rapidapi', SEASON_START), SEASON_END)
         
         # 2. Try Football-Data.org if RapidAPI failed
         if not matches:
             logger.warning("⚠️ RapidAPI failed/empty. Trying Football-Data.org...")
-            matches = fetch_football_data_org(league_name)
+            api_source = 'football_data'
+            fd_from = marks.get('football_data')
+            matches = fetch_football_data_org(league_name, fd_from, SEASON_END if fd_from else None)
             
         # 3. Scrape Understat (Always needed for xG)
+        # The league page always holds the whole season, so older matches are dropped locally
         scraped_matches = scrape_understat_xg(league=league_name, season=str(SEASON))
+        scraped_from = marks.get(api_source if matches else 'understat')
+        if scraped_from:
+            scraped_matches = [m for m in scraped_matches if m['datetime'][:10] >= scraped_from]
         
         # 4. Process (matches can be from RapidAPI or FD Adapter)
         # If matches is still empty, process_and_store will use Understat Fallback
         if matches or scraped_matches:
-            process_and_store(matches, scraped_matches, league_name)
+            process_and_store(matches, scraped_matches, league_name, api_source=api_source, full=args.full)
         else:
-            logger.warning(f"⚠️ No data found for {league_name} (API, FD, or Scraper).")
+            logger.info(f"💤 No new data for {league_name} (API, FD, or Scraper).")
+
+    log_host_stats()
@@ -1,36 +1,55 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
+import json
+import argparse
+from datetime import datetime
+from sqlalchemy import create_engine, text
 import sys
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
+from elo import compute_elo, INITIAL_RATING
+from rolling import rolling_features
+from utils import bulk_upsert
+import dashboard_snapshot
 
 DB_CONNECTION = config.DB_CONNECTION
+FEATURE_TABLE = 'model_features_v5'
 
-def process_features_v5():
-    engine = create_engine(DB_CONNECTION)
-    print("📥 Loading Data for V5 (Squad Metrics)...")
-    
-    # 1. Load Matches (Base)
-    query_matches = """
-    SELECT m.match_id, m.date, m.home_team_id, m.away_team_id, 
-           m.home_goals, m.away_goals, 
+ROLL_COLS = ['ppda', 'deep', 'xg', 'goals_scored', 'goals_conceded']
+ROLL_WINDOW = 5
+# Squad columns build_features adds (total_squad_goals is merged for both sides, hence _x/_y)
+SQUAD_COLS = ['home_squad_xg_chain', 'home_squad_xg_buildup', 'total_squad_goals_x',
+              'away_squad_xg_chain', 'away_squad_xg_buildup', 'total_squad_goals_y']
+# Elo K behind the elo features. The shipped football_v5*.json boosters were trained on K=20,
+# so this stays fixed (not config.ELO_K_FACTOR) until the models are retrained and republished
+FEATURE_ELO_K = 20
+
+# --- 1. LOADERS ---
+def load_matches(engine, since=None):
+    """Finished matches with stats, oldest first (only after `since` when given)."""
+    query_matches = f"""
+    SELECT m.match_id, m.date, m.home_team_id, m.away_team_id,
+           m.home_goals, m.away_goals,
            s.home_xg, s.away_xg,
            s.home_ppda, s.away_ppda,
            s.home_deep, s.away_deep
-    FROM matches m 
+    FROM matches m
     JOIN match_stats s ON m.match_id = s.match_id
+    {"WHERE m.date > :since" if since else ""}
     ORDER BY m.date ASC;
     """
-    df = pd.read_sql(query_matches, engine)
-    
-    # 2. Load Player Stats (Season Level)
+    df = pd.read_sql(text(query_matches), engine, params={'since': since} if since else {})
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def load_squad_stats(engine):
+    """Season-level squad metrics per team."""
     query_players = """
-    SELECT p.team_id, 
-           AVG(s.xg_chain) as avg_xg_chain, 
+    SELECT p.team_id,
+           AVG(s.xg_chain) as avg_xg_chain,
            AVG(s.xg_buildup) as avg_xg_buildup,
            SUM(s.goals) as total_squad_goals
     FROM player_season_stats s
@@ -38,84 +57,63 @@ def process_features_v5():
     WHERE s.season = '2025'
     GROUP BY p.team_id
     """
-    player_stats = pd.read_sql(query_players, engine)
-    
-    print(f"   -> Loaded {len(df)} matches and {len(player_stats)} team stats.")
-    
-    # 3. Merge Squad Stats
-    # Note: This applies the 2025 season stats to ALL matches. 
+    return pd.read_sql(query_players, engine)
+
+# --- 2. FEATURE BUILDING ---
+def to_long(df):
+    """One row per team per match (team, date, match_id, ppda, deep, xg, goals_scored, goals_conceded)."""
+    h_stats = df[['date', 'match_id', 'home_team_id', 'home_ppda', 'home_deep', 'home_xg', 'home_goals', 'away_goals']].rename(
+        columns={'home_team_id':'team', 'home_ppda':'ppda', 'home_deep':'deep', 'home_xg':'xg', 'home_goals': 'goals_scored', 'away_goals': 'goals_conceded'}
+    )
+    a_stats = df[['date', 'match_id', 'away_team_id', 'away_ppda', 'away_deep', 'away_xg', 'away_goals', 'home_goals']].rename(
+        columns={'away_team_id':'team', 'away_ppda':'ppda', 'away_deep':'deep', 'away_xg':'xg', 'away_goals': 'goals_scored', 'home_goals': 'goals_conceded'}
+    )
+    return pd.concat([h_stats, a_stats])
+
+def add_rolling(all_stats):
+    """Pre-match rolling means (avg_{col}_5) over each team's previous matches."""
+    all_stats = all_stats.sort_values(['team', 'date']).reset_index(drop=True)
+    rolled = rolling_features(all_stats, 'team', ROLL_COLS, windows=(ROLL_WINDOW,), shift=True, name="avg_{col}_{w}")
+    return pd.concat([all_stats, rolled], axis=1)
+
+def add_squad_stats(df, player_stats):
+    """Merges each side's squad stats into the match rows (0 for teams with no player data)."""
+    # Note: This applies the 2025 season stats to ALL matches.
     # Ideally we'd have historical player stats, but for now this adds "Current Squad Quality" context.
-    
     df = df.merge(player_stats, left_on='home_team_id', right_on='team_id', how='left').rename(columns={
         'avg_xg_chain': 'home_squad_xg_chain',
         'avg_xg_buildup': 'home_squad_xg_buildup'
     }).drop('team_id', axis=1)
-    
+
     df = df.merge(player_stats, left_on='away_team_id', right_on='team_id', how='left').rename(columns={
         'avg_xg_chain': 'away_squad_xg_chain',
         'avg_xg_buildup': 'away_squad_xg_buildup'
     }).drop('team_id', axis=1)
-    
+
     # Fill NaNs (for teams with no player data)
-    df = df.fillna({
+    return df.fillna({
         'home_squad_xg_chain': 0, 'home_squad_xg_buildup': 0,
         'away_squad_xg_chain': 0, 'away_squad_xg_buildup': 0
     })
 
-    # --- RE-APPLY V4 LOGIC (Elo, Rolling) ---
-    # (Copying logic from v4 for consistency)
-    
-    # Elo
-    current_elo = {}
-    h_elos, a_elos = [], []
-    for idx, row in df.iterrows():
-        hid, aid = row['home_team_id'], row['away_team_id']
-        hr = current_elo.get(hid, 1500)
-        ar = current_elo.get(aid, 1500)
-        h_elos.append(hr)
-        a_elos.append(ar)
-        
-        if row['home_goals'] > row['away_goals']: act = 1
-        elif row['home_goals'] == row['away_goals']: act = 0.5
-        else: act = 0
-        exp = 1 / (1 + 10**((ar - hr)/400))
-        current_elo[hid] = hr + 20 * (act - exp)
-        current_elo[aid] = ar + 20 * ((1-act) - (1-exp))
-    df['home_elo'] = h_elos
-    df['away_elo'] = a_elos
+def build_features(df, player_stats, all_stats):
+    """Merges squad stats and rolling stats into the match rows and adds targets. Expects Elo columns on df."""
+    df = add_squad_stats(df, player_stats)
     df['elo_diff'] = df['home_elo'] - df['away_elo']
 
-    # Rolling
-    # ... (Simplified for brevity, assuming V4 logic is good)
-    # Actually, let's just use the V4 features and ADD the new ones?
-    # No, cleaner to rebuild.
-    
-    # Rolling Stats
-    h_stats = df[['date', 'match_id', 'home_team_id', 'home_ppda', 'home_deep', 'home_xg', 'home_goals', 'away_goals']].rename(
-        columns={'home_team_id':'team', 'home_ppda':'ppda', 'home_deep':'deep', 'home_xg':'xg', 'home_goals': 'goals_scored', 'away_goals': 'goals_conceded'}
-    )
-    a_stats = df[['date', 'match_id', 'away_team_id', 'away_ppda', 'away_deep', 'away_xg', 'away_goals', 'home_goals']].rename(
-        columns={'away_team_id':'team', 'away_ppda':'ppda', 'away_deep':'deep', 'away_xg':'xg', 'away_goals': 'goals_scored', 'home_goals': 'goals_conceded'}
-    )
-    all_stats = pd.concat([h_stats, a_stats]).sort_values(['team', 'date'])
-    
-    for col in ['ppda', 'deep', 'xg', 'goals_scored', 'goals_conceded']:
-        all_stats[f'avg_{col}_5'] = all_stats.groupby('team')[col].transform(lambda x: x.rolling(5, min_periods=1).mean().shift(1))
-        
     cols = ['match_id', 'team', 'avg_ppda_5', 'avg_deep_5', 'avg_xg_5', 'avg_goals_scored_5', 'avg_goals_conceded_5']
-    
+
     df = df.merge(all_stats[cols], left_on=['match_id', 'home_team_id'], right_on=['match_id', 'team'], how='left').rename(columns={
         'avg_ppda_5': 'home_ppda_5', 'avg_deep_5': 'home_deep_5', 'avg_xg_5': 'home_xg_5',
         'avg_goals_scored_5': 'home_goals_scored_5', 'avg_goals_conceded_5': 'home_goals_conceded_5'
     }).drop('team', axis=1)
-    
+
     df = df.merge(all_stats[cols], left_on=['match_id', 'away_team_id'], right_on=['match_id', 'team'], how='left').rename(columns={
         'avg_ppda_5': 'away_ppda_5', 'avg_deep_5': 'away_deep_5', 'avg_xg_5': 'away_xg_5',
         'avg_goals_scored_5': 'away_goals_scored_5', 'avg_goals_conceded_5': 'away_goals_conceded_5'
     }).drop('team', axis=1)
-    
+
     # Rest Days
-    df['date'] = pd.to_datetime(df['date'])
     df['home_rest'] = 7
     df['away_rest'] = 7
 
@@ -125,16 +123,259 @@ def process_features_v5():
         elif row['home_goals'] == row['away_goals']: return 1
         else: return 0
     df['match_result'] = df.apply(get_res, axis=1)
-    
+
     # New Targets
     df['target_over_2_5'] = ((df['home_goals'] + df['away_goals']) > 2.5).astype(int)
     df['target_btts'] = ((df['home_goals'] > 0) & (df['away_goals'] > 0)).astype(int)
-    
+
     df.dropna(subset=['match_result'], inplace=True)
-    
+    return df
+
+# --- 3. TEAM STATE (for incremental runs) ---
+def team_states(elo_ratings, all_stats):
+    """State rows per team: final Elo plus the last ROLL_WINDOW raw stat rows (oldest first)."""
+    tails = all_stats.sort_values(['team', 'date']).groupby('team').tail(ROLL_WINDOW)
+    rows = []
+    for team, g in tails.groupby('team'):
+        window = g[ROLL_COLS].astype(float).replace({np.nan: None}).values.tolist()
+        rows.append({
+            'team_id': int(team),
+            'elo': float(elo_ratings[team]),
+            'recent_stats': json.dumps(window),
+            'last_date': g['date'].max().date()
+        })
+    return rows
+
+def load_team_states(engine):
+    """Returns ({team_id: elo}, history DataFrame of stored stat windows)."""
+    states = pd.read_sql("SELECT team_id, elo, recent_stats FROM feature_team_state", engine)
+    history = []
+    for team_id, recent in zip(states['team_id'], states['recent_stats']):
+        for pos, values in enumerate(json.loads(recent)):
+            # Placeholder dates keep stored rows ahead of (and in order before) any new match
+            history.append(dict(zip(ROLL_COLS, values), team=team_id, match_id=None,
+                                date=pd.Timestamp('1900-01-01') + pd.Timedelta(days=pos)))
+    history = pd.DataFrame(history, columns=['team', 'date', 'match_id'] + ROLL_COLS)
+    history[ROLL_COLS] = history[ROLL_COLS].astype(float)
+    return dict(zip(states['team_id'], states['elo'])), history
+
+def get_last_processed_date(engine):
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("""
+                SELECT last_processed_date FROM feature_store_meta WHERE table_name = :t
+            """), {'t': FEATURE_TABLE}).scalar()
+    except Exception:
+        return None
+
+def count_backfilled(engine, last_date):
+    """Matches on or before the watermark that never made it into the feature table (late arrivals)."""
+    with engine.connect() as conn:
+        return conn.execute(text(f"""
+            SELECT COUNT(*) FROM matches m
+            JOIN match_stats s ON m.match_id = s.match_id
+            WHERE m.date <= :d
+              AND NOT EXISTS (SELECT 1 FROM {FEATURE_TABLE} f WHERE f.match_id = m.match_id)
+        """), {'d': last_date}).scalar()
+
+def count_changed_inputs(engine):
+    """Stored rows whose match inputs (score, xG, PPDA, deep) changed after they were featurized."""
+    with engine.connect() as conn:
+        return conn.execute(text(f"""
+            SELECT COUNT(*) FROM {FEATURE_TABLE} f
+            JOIN matches m ON m.match_id = f.match_id
+            JOIN match_stats s ON s.match_id = f.match_id
+            WHERE (f.home_goals, f.away_goals, f.home_xg, f.away_xg, f.home_ppda, f.away_ppda, f.home_deep, f.away_deep)
+                  IS DISTINCT FROM
+                  (m.home_goals, m.away_goals, s.home_xg, s.away_xg, s.home_ppda, s.away_ppda, s.home_deep, s.away_deep)
+        """)).scalar()
+
+def refresh_squad_stats(engine):
+    """
+    Rewrites the squad columns of stored rows whose teams' squad stats changed since the rows
+    were built (the players scraper refreshes them daily). Returns the number of rows updated.
+    """
+    stored = pd.read_sql(f"SELECT match_id, home_team_id, away_team_id, {', '.join(SQUAD_COLS)} FROM {FEATURE_TABLE}", engine)
+    expected = add_squad_stats(stored[['match_id', 'home_team_id', 'away_team_id']], load_squad_stats(engine))
+    old = stored[SQUAD_COLS].astype(float).to_numpy()
+    new = expected[SQUAD_COLS].astype(float).to_numpy()
+    changed = ~np.isclose(old, new, rtol=0, atol=1e-9, equal_nan=True).all(axis=1)
+    if not changed.any():
+        return 0
+    with engine.connect() as conn:
+        bulk_upsert(conn, FEATURE_TABLE, to_records(expected.loc[changed, ['match_id'] + SQUAD_COLS]), ['match_id'], SQUAD_COLS)
+        # Bumps the features version, so the API drops predictions built from the old rows
+        conn.execute(text("UPDATE feature_store_meta SET updated_at = :now WHERE table_name = :t"),
+                     {'now': datetime.utcnow(), 't': FEATURE_TABLE})
+        conn.commit()
+    print(f"👥 Refreshed squad stats on {int(changed.sum())} rows")
+    return int(changed.sum())
+
+def write_state(conn, states, last_date):
+    bulk_upsert(conn, 'feature_team_state', states, ['team_id'], ['elo', 'recent_stats', 'last_date'])
+    bulk_upsert(conn, 'feature_store_meta', [{
+        'table_name': FEATURE_TABLE, 'last_processed_date': last_date, 'updated_at': datetime.utcnow()
+    }], ['table_name'], ['last_processed_date', 'updated_at'])
+
+def to_records(df):
+    """DataFrame -> list of dicts with plain Python values (NaN -> NULL)."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+# --- 4. PIPELINES ---
+def process_features_v5(full=False):
+    """
+    Builds model_features_v5. Incremental by default: only matches after the last processed
+    date are featurized (from the stored per-team Elo and rolling windows) and upserted, and
+    squad columns are refreshed in place. Late or edited matches (e.g. PPDA/deep filled in by
+    the tactics scraper) trigger a full rebuild, since every later row of their teams depends
+    on them. A full rebuild swaps in a freshly built table atomically, so readers never see it empty.
+    """
+    engine = create_engine(DB_CONNECTION)
+    last_date = None if full else get_last_processed_date(engine)
+    if last_date is None:
+        return rebuild_features(engine)
+    late = count_backfilled(engine, last_date)
+    changed = count_changed_inputs(engine)
+    if late or changed:
+        # Stored state already includes later matches, so older arrivals or edits need a full pass
+        print(f"⚠️ {late} matches arrived and {changed} changed on or before {last_date}. Rebuilding.")
+        return rebuild_features(engine)
+    features = update_features(engine, last_date)
+    refresh_squad_stats(engine)
+    return features
+
+def compute_all_features(engine):
+    """Featurizes every match from scratch. Returns (features, elo result, long-format stats)."""
+    df = load_matches(engine)
+    player_stats = load_squad_stats(engine)
+    print(f"   -> Loaded {len(df)} matches and {len(player_stats)} team stats.")
+
+    # Elo (shared engine, with the K the models were trained on)
+    elo = compute_elo(df['home_team_id'], df['away_team_id'], df['home_goals'], df['away_goals'], k=FEATURE_ELO_K)
+    df['home_elo'] = elo.pre_home
+    df['away_elo'] = elo.pre_away
+
+    # Rolling Stats
+    all_stats = add_rolling(to_long(df))
+    df = build_features(df, player_stats, all_stats)
+    return df, elo, all_stats
+
+def rebuild_features(engine):
+    print("📥 Loading Data for V5 (Squad Metrics)...")
+    df, elo, all_stats = compute_all_features(engine)
     print(f"📊 V5 Features Ready: {len(df)} matches.")
-    df.to_sql('model_features_v5', engine, if_exists='replace', index=False)
-    print("✨ Saved to 'model_features_v5'")
+
+    # Build next to the live table, then swap in one transaction (Postgres DDL is transactional)
+    staging = f"{FEATURE_TABLE}_staging"
+    df.to_sql(staging, engine, if_exists='replace', index=False)
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE UNIQUE INDEX ON {staging} (match_id)"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {FEATURE_TABLE}"))
+        conn.execute(text(f"ALTER TABLE {staging} RENAME TO {FEATURE_TABLE}"))
+        if not df.empty:
+            write_state(conn, team_states(elo.ratings, all_stats), df['date'].max().date())
+        conn.commit()
+    print(f"✨ Saved to '{FEATURE_TABLE}' (full rebuild)")
+    return df
+
+def update_features(engine, last_date):
+    print(f"📥 Loading matches after {last_date}...")
+    new = load_matches(engine, since=last_date)
+    if new.empty:
+        print("💤 No new matches. Features are up to date.")
+        return new
+
+    player_stats = load_squad_stats(engine)
+    start_elo, history = load_team_states(engine)
+    print(f"   -> {len(new)} new matches, state for {len(start_elo)} teams.")
+
+    # Elo resumes from each team's stored rating
+    elo = compute_elo(new['home_team_id'], new['away_team_id'], new['home_goals'], new['away_goals'],
+                      k=FEATURE_ELO_K, start_ratings=start_elo)
+    new['home_elo'] = elo.pre_home
+    new['away_elo'] = elo.pre_away
+
+    # Rolling windows run over the stored last-5 rows followed by the new matches
+    teams = set(new['home_team_id']) | set(new['away_team_id'])
+    history = history[history['team'].isin(teams)]
+    all_stats = add_rolling(pd.concat([history, to_long(new)]))
+    features = build_features(new, player_stats, all_stats[all_stats['match_id'].notna()])
+
+    ratings = {t: r for t, r in elo.ratings.items() if t in teams}
+    with engine.connect() as conn:
+        bulk_upsert(conn, FEATURE_TABLE, to_records(features), ['match_id'],
+                    [c for c in features.columns if c != 'match_id'])
+        write_state(conn, team_states(ratings, all_stats), new['date'].max().date())
+        conn.commit()
+    print(f"✨ Upserted {len(features)} rows into '{FEATURE_TABLE}'")
+    return features
+
+def check_parity(engine):
+    """Compares the stored (incrementally built) table with a full in-memory rebuild."""
+    expected = compute_all_features(engine)[0].set_index('match_id').sort_index()
+    stored = pd.read_sql(f"SELECT * FROM {FEATURE_TABLE}", engine).set_index('match_id').sort_index()
+    if not expected.index.equals(stored.index):
+        print(f"❌ Row mismatch: {len(stored)} stored vs {len(expected)} expected")
+        return False
+    numeric = expected.select_dtypes('number').columns
+    diff = (expected[numeric] - stored[numeric].astype(float)).abs().max()
+    bad = diff[diff > 1e-9]
+    if not bad.empty:
+        print(f"❌ Columns differ: {bad.to_dict()}")
+        return False
+    print(f"✅ Parity OK: {len(stored)} rows match a full rebuild")
+    return True
+
+# --- 5. SCHEDULED FIXTURES ---
+def load_fixtures(engine):
+    """Fixtures without a result, from today on."""
+    query = """
+    SELECT match_id, date, league, home_team_id, away_team_id
+    FROM matches
+    WHERE home_goals IS NULL AND date >= CURRENT_DATE
+    ORDER BY date ASC
+    """
+    df = pd.read_sql(query, engine)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def fixture_features(engine, fixtures=None):
+    """
+    Pre-match features for scheduled fixtures, built from the stored team state (current Elo
+    and last-5 windows) with the same columns as model_features_v5 (targets excluded).
+    """
+    fixtures = load_fixtures(engine) if fixtures is None else fixtures.copy()
+    if fixtures.empty:
+        return fixtures
+    elo_ratings, history = load_team_states(engine)
+
+    fixtures['home_elo'] = fixtures['home_team_id'].map(elo_ratings).fillna(INITIAL_RATING).astype(float)
+    fixtures['away_elo'] = fixtures['away_team_id'].map(elo_ratings).fillna(INITIAL_RATING).astype(float)
+    fixtures['home_goals'] = np.nan
+    fixtures['away_goals'] = np.nan
+
+    # Next-match rolling means are plain means of each team's stored window
+    form = history.groupby('team')[ROLL_COLS].mean()
+    form.columns = [f'avg_{col}_{ROLL_WINDOW}' for col in ROLL_COLS]
+    sides = pd.concat([
+        fixtures[['match_id', 'home_team_id']].rename(columns={'home_team_id': 'team'}),
+        fixtures[['match_id', 'away_team_id']].rename(columns={'away_team_id': 'team'})
+    ])
+    all_stats = sides.merge(form, left_on='team', right_index=True, how='left')
+
+    features = build_features(fixtures, load_squad_stats(engine), all_stats)
+    return features.drop(columns=['home_goals', 'away_goals', 'match_result', 'target_over_2_5', 'target_btts'])
 
 if __name__ == "__main__":
-    process_features_v5()
+    parser = argparse.ArgumentParser(description="Build the V5 model feature table.")
+    parser.add_argument("--full", action="store_true", help="Rebuild every match instead of only new ones")
+    parser.add_argument("--check", action="store_true", help="Compare the stored table with a full rebuild (no writes)")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check_parity(create_engine(DB_CONNECTION)) else 1)
+    process_features_v5(full=args.full)
+
+    # Dashboard snapshots (match history, Elo, form) are refreshed from the same data
+    engine = create_engine(DB_CONNECTION)
+    for league, version in dashboard_snapshot.publish_all(engine, config.ELO_K_FACTOR).items():
+        print(f"📸 {league} dashboard snapshot: {version}")
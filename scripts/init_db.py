@@ -15,7 +15,13 @@ def init_db():
         "sql/schema_v2.sql",
         "sql/schema_v3.sql",
         "sql/schema_v4.sql",
-        "sql/schema_v5.sql"
+        "sql/schema_v5.sql",
+        "sql/schema_v6.sql",
+        "sql/schema_v7.sql",
+        "sql/schema_v8.sql",
+        "sql/schema_v9.sql",
+        "sql/schema_v10.sql",
+        "sql/schema_v11.sql"
     ]
     
     with engine.connect() as conn:
@@ -32,6 +38,7 @@ def init_db():
                     conn.commit()
             except Exception as e:
                 print(f"❌ Error applying {schema_file}: {e}")
+                conn.rollback() # Keep the connection usable for the remaining schemas
                 # Don't exit, might be partial failure or already exists
                 
     print("✅ Database Initialization Complete!")
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import json
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import sys
+import os
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from sqlalchemy import create_engine
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from markets import ALL_FEATURES
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HOT_IDS = 10  # Requests for "hot" matches go to the first HOT_IDS ids (exercises coalescing)
+
+def build_standin(path, n_matches, seed):
+    """SQLite stand-in with the tables the API reads, filled with random feature rows."""
+    rng = np.random.default_rng(seed)
+    ids = [f"LT-{i}" for i in range(n_matches)]
+    features = pd.DataFrame(rng.normal(0, 1, size=(n_matches, len(ALL_FEATURES))), columns=ALL_FEATURES)
+    features['elo_diff'] *= 150
+    features.insert(0, 'match_id', ids)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        features.to_sql('model_features_v5', conn, index=False, if_exists='replace')
+        pd.DataFrame({'match_id': ids, 'date': date.today().isoformat()}).to_sql('matches', conn, index=False, if_exists='replace')
+        pd.DataFrame([{'table_name': 'model_features_v5', 'updated_at': datetime.utcnow().isoformat()}]).to_sql(
+            'feature_store_meta', conn, index=False, if_exists='replace')
+        pd.DataFrame(columns=['match_id', 'model_version', 'home_win', 'draw', 'away_win', 'over_2_5', 'btts',
+                              'features_version']).to_sql('predictions', conn, index=False, if_exists='replace')
+        conn.exec_driver_sql("CREATE UNIQUE INDEX idx_lt_features ON model_features_v5 (match_id)")
+    return f"sqlite:///{path}", ids
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def existing_ids(db_url, limit):
+    engine = create_engine(db_url)
+    return pd.read_sql(f"SELECT match_id FROM model_features_v5 LIMIT {int(limit)}", engine)['match_id'].tolist()
+
+async def http(reader, writer, method, path, body=None):
+    """Minimal HTTP/1.1 keep-alive request. Returns (status, parsed JSON body)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+    status = int(head.split(" ", 2)[1])
+    length = next(int(line.split(":", 1)[1]) for line in head.split("\r\n") if line.lower().startswith("content-length"))
+    return status, json.loads(await reader.readexactly(length))
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        return (await http(reader, writer, "GET", path))[1]
+    finally:
+        writer.close()
+
+async def wait_ready(port, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API exited with code {server.returncode}")
+        try:
+            return await get(port, "/")
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API did not start in time")
+
+async def client(port, ids, hot_share, deadline, rng, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.monotonic() < deadline:
+            pool = ids[:HOT_IDS] if rng.random() < hot_share else ids
+            start = time.perf_counter()
+            try:
+                status, _ = await http(reader, writer, "POST", "/predict", {'match_id': pool[rng.integers(len(pool))]})
+            except (OSError, asyncio.IncompleteReadError):
+                errors.append('connection')
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                continue
+            latencies.append(1000 * (time.perf_counter() - start))
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def run_level(port, clients, duration, ids, hot_share, seed):
+    latencies, errors = [], []
+    before = (await get(port, "/cache/stats"))['coalescing']
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client(port, ids, hot_share, deadline, np.random.default_rng(seed + i), latencies, errors)
+        for i in range(clients)
+    ])
+    elapsed = time.perf_counter() - start
+    after = (await get(port, "/cache/stats"))['coalescing']
+    lat = np.array(latencies) if latencies else np.array([np.nan])
+    return {
+        'clients': clients, 'requests': len(latencies), 'errors': len(errors), 'rps': len(latencies) / elapsed,
+        'p50': np.percentile(lat, 50), 'p95': np.percentile(lat, 95), 'p99': np.percentile(lat, 99), 'max': lat.max(),
+        'coalesced': after['coalesced'] - before['coalesced'],
+    }
+
+async def main(args):
+    tmp = None
+    if args.db:
+        db_url, ids = args.db, existing_ids(args.db, args.matches)
+        print(f"🗄️ Using {len(ids)} matches from {db_url.split('@')[-1]}")
+    else:
+        tmp = tempfile.mkdtemp(prefix="oracle-load-")
+        db_url, ids = build_standin(os.path.join(tmp, "standin.db"), args.matches, args.seed)
+        print(f"🗄️ SQLite stand-in with {len(ids)} matches at {db_url}")
+    if not ids:
+        print("❌ No feature rows to request. Run feature engineering first.")
+        sys.exit(1)
+
+    port = args.port or free_port()
+    env = dict(os.environ, API_DB_URL=db_url, PYTHONUNBUFFERED="1")
+    if not args.cache:
+        env['API_CACHE_SIZE'] = "0"  # Every request takes the DB + inference path
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.join(ROOT_DIR, "ml_api"),
+         "--port", str(port), "--log-level", "warning", "--backlog", "4096"],
+        env=env
+    )
+    try:
+        health = await wait_ready(port, server)
+        print(f"🧠 API up (model {health['model_version']}, caches {'on' if args.cache else 'off'}, "
+              f"{args.hot:.0%} of requests on {HOT_IDS} hot matches)")
+        print(f"\n{'clients':>8}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'coalesced':>11}")
+        for clients in args.clients:
+            r = await run_level(port, clients, args.duration, ids, args.hot, args.seed)
+            print(f"{r['clients']:>8}{r['requests']:>10}{r['errors']:>8}{r['rps']:>9.0f}"
+                  f"{r['p50']:>7.1f}ms{r['p95']:>7.1f}ms{r['p99']:>7.1f}ms{r['max']:>7.1f}ms{r['coalesced']:>11}")
+        stats = await get(port, "/cache/stats")
+        print(f"\n🏊 DB pool: {stats['db_pool']}")
+    finally:
+        server.terminate()
+        server.wait()
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /predict: throughput and tail latency per concurrency level.")
+    parser.add_argument("--db", help="Database with model_features_v5 (default: a generated SQLite stand-in)")
+    parser.add_argument("--clients", type=lambda s: [int(c) for c in s.split(",")], default=[10, 100, 500],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per level")
+    parser.add_argument("--matches", type=int, default=5000, help="Distinct match_ids to request")
+    parser.add_argument("--hot", type=float, default=0.5, help="Share of requests for the hot matches")
+    parser.add_argument("--cache", action="store_true", help="Keep the API's result caches on")
+    parser.add_argument("--port", type=int, help="API port (default: any free port)")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,41 @@
+import argparse
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import model_registry
+
+def list_models():
+    current = model_registry.current_version()
+    versions = model_registry.list_versions()
+    if not versions:
+        print(f"📭 No published versions in {model_registry.REGISTRY_DIR} (serving the legacy root files).")
+        return
+    for version in versions:
+        manifest = model_registry.load_manifest(version)
+        markets = ", ".join(
+            f"{market} ({entry['metrics']['accuracy']:.1%})" if 'accuracy' in entry['metrics'] else market
+            for market, entry in manifest['markets'].items()
+        )
+        marker = "👉" if version == current else "  "
+        print(f"{marker} {version}  {manifest['created_at'][:19]}  {markets}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the model registry or switch the served version.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Show published versions (current one marked)")
+    use = sub.add_parser("use", help="Point CURRENT at a version (rollback / promote)")
+    use.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        list_models()
+    else:
+        try:
+            model_registry.set_current(args.version)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Now serving {args.version}. Running APIs pick it up within a few seconds.")
@@ -0,0 +1,72 @@
+import argparse
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, text
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import model_registry
+from markets import MarketModels, prepare_features
+from utils import bulk_upsert
+from feature_engineering_v5 import fixture_features, to_records
+
+DB_CONNECTION = config.DB_CONNECTION
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+OUTPUTS = ['home_win', 'draw', 'away_win', 'over_2_5', 'btts']
+
+def feature_version(engine):
+    """Same stamp the API compares against (feature_store_meta.updated_at)."""
+    with engine.connect() as conn:
+        stamp = conn.execute(text(
+            "SELECT updated_at FROM feature_store_meta WHERE table_name = 'model_features_v5'"
+        )).scalar()
+    return stamp.isoformat() if stamp else None
+
+def predict_fixtures(backend="xgboost"):
+    """
+    Scores every scheduled fixture for every market in one pass and stores the rows in
+    `predictions`, keyed by (match_id, model_version). Run it after the feature job so
+    readers (API, web app, dashboard) get fixture predictions with a single indexed lookup.
+    """
+    engine = create_engine(DB_CONNECTION)
+    registry_version = model_registry.current_version()
+    models = MarketModels(model_registry.version_dir(registry_version) or ROOT_DIR, backend=backend)
+    version = registry_version or models.version
+    if '1x2' not in models.boosters:
+        print(f"❌ No usable 1X2 model ({models.status()}). Train or publish one first.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    fixtures = fixture_features(engine)
+    if fixtures.empty:
+        print("📭 No scheduled fixtures to score.")
+        return 0
+    built = time.perf_counter()
+    probs = models.predict(prepare_features(fixtures).to_numpy())
+    scored = time.perf_counter()
+
+    out = fixtures[['match_id', 'league', 'date']].copy()
+    out['date'] = out['date'].dt.date
+    for name in OUTPUTS:
+        out[name] = probs.get(name)
+    out['model_version'] = version
+    out['features_version'] = feature_version(engine)
+    out['created_at'] = datetime.utcnow()
+
+    with engine.begin() as conn:
+        bulk_upsert(conn, 'predictions', to_records(out), ['match_id', 'model_version'],
+                    ['league', 'date'] + OUTPUTS + ['features_version', 'created_at'])
+
+    print(f"✅ Stored {len(out)} fixture predictions (model {version}): "
+          f"features {1000 * (built - start):.0f}ms, scoring {1000 * (scored - built):.1f}ms.")
+    return len(out)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute predictions for all scheduled fixtures.")
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "xgboost"), choices=MarketModels.BACKENDS)
+    args = parser.parse_args()
+    predict_fixtures(args.backend)
@@ -0,0 +1,129 @@
+import argparse
+import time
+import pandas as pd
+from sqlalchemy import create_engine, text
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import backtest
+import model_registry
+from markets import MarketModels, ALL_FEATURES, prepare_features
+
+DB_CONNECTION = config.DB_CONNECTION
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Finished matches with a closing line (match_stats.*_odds, filled by scripts/snapshot_odds.py)
+MATCHES_QUERY = """
+SELECT m.match_id, m.date, m.league, m.home_goals, m.away_goals,
+       s.home_odds AS home_closing, s.draw_odds AS draw_closing, s.away_odds AS away_closing
+FROM matches m
+JOIN match_stats s ON s.match_id = m.match_id
+WHERE m.home_goals IS NOT NULL AND s.home_odds IS NOT NULL AND (:league IS NULL OR m.league = :league)
+ORDER BY m.date ASC
+"""
+
+# Earliest pre-match snapshot per match: the price we could have bet at
+OPENING_QUERY = """
+SELECT DISTINCT ON (match_id) match_id, captured_at AS opening_at,
+       home_odd AS home_odds, draw_odd AS draw_odds, away_odd AS away_odds
+FROM odds_snapshots
+WHERE captured_at <= commence_time
+ORDER BY match_id, captured_at ASC
+"""
+
+# Latest pre-match snapshot per match: the no-vig consensus closing line CLV is measured against
+CLOSING_QUERY = """
+SELECT DISTINCT ON (match_id) match_id, captured_at AS closing_at,
+       home_prob AS home_closing_prob, draw_prob AS draw_closing_prob, away_prob AS away_closing_prob
+FROM odds_snapshots
+WHERE captured_at <= commence_time
+ORDER BY match_id, captured_at DESC
+"""
+
+# Latest stored prediction made no later than match day (out of sample by construction)
+PREDICTIONS_QUERY = """
+SELECT DISTINCT ON (p.match_id) p.match_id, p.home_win, p.draw, p.away_win
+FROM predictions p
+JOIN matches m ON m.match_id = p.match_id
+WHERE CAST(p.created_at AS DATE) <= m.date AND m.home_goals IS NOT NULL
+ORDER BY p.match_id, p.created_at DESC
+"""
+
+def rescored_probabilities(engine, match_ids, backend):
+    """1X2 probabilities from the current models. In-sample for every season they were trained on."""
+    registry_version = model_registry.current_version()
+    models = MarketModels(model_registry.version_dir(registry_version) or ROOT_DIR, backend=backend)
+    features = pd.read_sql(text(f"SELECT match_id, {', '.join(ALL_FEATURES)} FROM model_features_v5"), engine)
+    features = features[features['match_id'].isin(set(match_ids))]
+    probs = models.predict(prepare_features(features).to_numpy())
+    return pd.DataFrame({'match_id': features['match_id'].to_numpy(),
+                         **{name: probs[name] for name in backtest.PROB_COLS}})
+
+def load_bets(engine, league=None, odds='opening', rescore=False, backend="xgboost"):
+    """
+    Joins results, odds and model probabilities into the frame backtest.prepare_bets expects.
+    CLV is only measured for bets placed at an earlier snapshot than the closing one.
+    """
+    df = pd.read_sql(text(MATCHES_QUERY), engine, params={'league': league})
+    df = df.merge(pd.read_sql(text(CLOSING_QUERY), engine), on='match_id', how='left')
+    if odds == 'opening':
+        df = df.merge(pd.read_sql(text(OPENING_QUERY), engine), on='match_id', how='left')
+        # Matches without a snapshot (e.g. imported closing odds) are bet at the close
+        for side in ['home', 'draw', 'away']:
+            df[f'{side}_odds'] = df[f'{side}_odds'].fillna(df[f'{side}_closing'])
+        before_close = df['opening_at'] < df['closing_at']
+    else:
+        for side in ['home', 'draw', 'away']:
+            df[f'{side}_odds'] = df[f'{side}_closing']
+        before_close = pd.Series(False, index=df.index)
+    df[backtest.CLOSING_COLS] = df[backtest.CLOSING_COLS].where(before_close, axis=0)
+    probs = rescored_probabilities(engine, df['match_id'], backend) if rescore else pd.read_sql(text(PREDICTIONS_QUERY), engine)
+    return df.merge(probs, on='match_id', how='inner')
+
+def run_backtest(league=None, odds='opening', rescore=False, backend="xgboost", min_bets=30, sort='roi', top=15, out=None):
+    engine = create_engine(DB_CONNECTION)
+    df = load_bets(engine, league, odds, rescore, backend)
+    bets = backtest.prepare_bets(df)
+    if not len(bets.result):
+        print("📭 No finished matches with odds and predictions. Run scripts/snapshot_odds.py "
+              "(and scripts/predict_fixtures.py) for a while, or pass --rescore.")
+        return None
+    if rescore:
+        print("⚠️ Rescored with the current models: seasons they were trained on are in-sample.")
+
+    grid = backtest.strategy_grid()
+    start = time.perf_counter()
+    results = backtest.run(bets, grid)
+    elapsed = time.perf_counter() - start
+    print(f"🧪 {len(grid)} strategies x {len(bets.result)} matches ({bets.dates[0]:%Y-%m-%d} to {bets.dates[-1]:%Y-%m-%d}) "
+          f"in {elapsed:.2f}s")
+
+    ranked = results[results['bets'] >= min_bets].sort_values(sort, ascending=(sort == 'max_drawdown'))
+    if ranked.empty:
+        print(f"📭 No strategy placed {min_bets}+ bets.")
+    else:
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(ranked.head(top).round(4).to_string(index=False))
+    if out:
+        results.to_csv(out, index=False)
+        print(f"💾 All results written to {out}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest staking strategies against historical odds.")
+    parser.add_argument("--league", help="Only this league (default: all)")
+    parser.add_argument("--odds", choices=['opening', 'closing'], default='opening',
+                        help="Bet at the first stored snapshot (default) or at the closing line")
+    parser.add_argument("--rescore", action="store_true",
+                        help="Score history with the current models instead of stored pre-match predictions")
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "xgboost"), choices=MarketModels.BACKENDS)
+    parser.add_argument("--min-bets", type=int, default=30, help="Hide strategies with fewer bets")
+    parser.add_argument("--sort", default='roi', choices=['roi', 'profit', 'final_bankroll', 'clv', 'max_drawdown'])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", help="CSV path for every strategy's results")
+    args = parser.parse_args()
+    run_backtest(args.league, args.odds, args.rescore, args.backend, args.min_bets, args.sort, args.top, args.out)
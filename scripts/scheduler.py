@@ -19,13 +19,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_script(script_name):
-    """Runs a python script and logs the output."""
+def run_script(script_name, *args):
+    """Runs a python script (with optional arguments) and logs the output."""
     logger.info(f"🚀 Starting {script_name}...")
     try:
         # Resolve script path
         script_dir = os.path.dirname(os.path.abspath(__file__))
-        script_path = os.path.join(script_dir, script_name)
+        script_path = os.path.join(script_dir, '..', script_name)
         
         # Use the venv python if available, else system python
         # Check relative to script_dir (which is scripts/) -> ../venv
@@ -33,7 +33,7 @@ def run_script(script_name):
         python_executable = venv_python if os.path.exists(venv_python) else "python3"
             
         result = subprocess.run(
-            [python_executable, script_path],
+            [python_executable, script_path, *args],
             capture_output=True,
             text=True,
             check=True
@@ -54,16 +54,26 @@ def job_daily_update():
     run_script("scripts/scraper_pipeline.py")
     # 3. Scrape Players
     run_script("scripts/scraper_players.py")
+    # 4. Refresh features, then precompute fixture predictions
+    run_script("scripts/feature_engineering_v5.py")
+    run_script("scripts/predict_fixtures.py")
     logger.info("💤 Update Job Finished. Sleeping...")
 
 # Schedule the job
 # Run every day at 02:00 AM
 schedule.every().day.at("02:00").do(run_script, "scripts/scraper_players.py") # Update players
 schedule.every().day.at("02:30").do(job_daily_update) # Full pipeline
+# Odds snapshots (6 API requests each): an early price to bet at and a late one for the closing line
+schedule.every().day.at("11:00").do(run_script, "scripts/snapshot_odds.py")
+schedule.every().day.at("18:00").do(run_script, "scripts/snapshot_odds.py")
+# Weekly check that the incrementally built feature table still matches a full rebuild
+schedule.every().sunday.at("05:00").do(run_script, "scripts/feature_engineering_v5.py", "--check")
 
 logger.info("⏳ Scheduler Started. Waiting for jobs...")
 logger.info("   - Daily Player Sync at 02:00")
 logger.info("   - Full Data Pipeline at 02:30")
+logger.info("   - Odds Snapshots at 11:00 and 18:00")
+logger.info("   - Feature Parity Check on Sundays at 05:00")
 
 while True:
     schedule.run_pending()
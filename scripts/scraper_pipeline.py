@@ -1,6 +1,8 @@
-import json
 import time
-from bs4 import BeautifulSoup
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, text
 import sys
 import os
@@ -9,158 +11,187 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
-from utils import fetch_url, logger
+from utils import fetch_url, bulk_insert, log_host_stats, logger
+from understat import extract_datasets, fetch_league_datasets
+from team_resolver import TeamResolver
 
 DB_CONNECTION = config.DB_CONNECTION
 SEASONS = ["2018", "2019", "2020", "2021", "2022", "2023", "2024", "2025"]
 LEAGUES = ["EPL", "La_Liga", "Bundesliga"]
 
-NAME_MAP = {
-    "Arsenal": "Arsenal",
-    "Aston_Villa": "Aston Villa",
-    "Bournemouth": "Bournemouth",
-    "Brentford": "Brentford",
-    "Brighton": "Brighton",
-    "Burnley": "Burnley",
-    "Chelsea": "Chelsea",
-    "Crystal_Palace": "Crystal Palace",
-    "Everton": "Everton",
-    "Fulham": "Fulham",
-    "Ipswich": "Ipswich",
-    "Leeds": "Leeds",
-    "Leicester": "Leicester",
-    "Liverpool": "Liverpool",
-    "Luton": "Luton Town",
-    "Manchester_City": "Manchester City",
-    "Manchester_United": "Manchester United",
-    "Newcastle_United": "Newcastle",
-    "Norwich": "Norwich",
-    "Nottingham_Forest": "Nottingham Forest",
-    "Sheffield_United": "Sheffield United",
-    "Southampton": "Southampton",
-    "Tottenham": "Tottenham", 
-    "Watford": "Watford",
-    "West_Bromwich_Albion": "West Brom",
-    "West_Ham": "West Ham",
-    "Wolverhampton_Wanderers": "Wolves",
-    # La Liga
-    "Real_Madrid": "Real Madrid",
-    "Barcelona": "Barcelona",
-    "Atletico_Madrid": "Atletico Madrid",
-    "Sevilla": "Sevilla",
-    # Bundesliga
-    "Bayern_Munich": "Bayern Munich",
-    "Borussia_Dortmund": "Dortmund",
-    "Bayer_Leverkusen": "Bayer Leverkusen", 
-    "RB_Leipzig": "RB Leipzig",
-}
-
 def get_db_engine():
     return create_engine(DB_CONNECTION)
 
 def get_understat_slugs(league, season):
-    url = f"https://understat.com/league/{league}/{season}"
     try:
-        response = fetch_url(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string and 'teamsData' in script.string:
-                json_string = script.string.split("('")[1].split("')")[0]
-                data = json.loads(json_string.encode('utf8').decode('unicode_escape'))
-                return [t['title'].replace(' ', '_') for t in data.values()]
+        data = fetch_league_datasets(league, season).get('teamsData', {})
+        return [t['title'].replace(' ', '_') for t in data.values()]
     except Exception as e:
         logger.error(f"❌ Error fetching team list: {e}")
     return []
 
-def scrape_team_tactics(team_slug, season):
+def fetch_team_page(team_slug, season):
     url = f"https://understat.com/team/{team_slug}/{season}"
-    logger.info(f"   🕵️‍♀️ Parsing {team_slug} ({season})...")
+    return fetch_url(url).content
+
+def parse_team_tactics(content):
     try:
-        response = fetch_url(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string and 'datesData' in script.string:
-                json_string = script.string.split("('")[1].split("')")[0]
-                return json.loads(json_string.encode('utf8').decode('unicode_escape'))
-    except:
+        return extract_datasets(content, ['datesData']).get('datesData', [])
+    except Exception:
         return []
-    return []
 
-def update_database_tactics():
+def write_team_tactics(engine, team_ids, matches):
+    """
+    Applies one team-season of PPDA/deep values: the rows are bulk-loaded into a temp
+    staging table, then applied with a single UPDATE joined on the resolved team_ids.
+    Returns (matched, unmatched) counts of staged rows.
+    """
+    rows = []
+    for m in matches:
+        try:
+            if m.get('ppda') and m['ppda'].get('def', 0) != 0:
+                ppda = m['ppda']['att'] / m['ppda']['def']
+            else:
+                ppda = None
+            rows.append({
+                'idx': len(rows),
+                'match_date': m['datetime'].split(' ')[0],
+                'side': m['side'],
+                'ppda': ppda,
+                'deep': m.get('deep', 0)
+            })
+        except Exception:
+            continue
+
+    if not rows or not team_ids:
+        return 0, len(rows)
+
+    with engine.connect() as conn:
+        conn.execute(text("""
+            CREATE TEMP TABLE IF NOT EXISTS tactics_stage (
+                idx INT, match_date DATE, side CHAR(1), ppda FLOAT, deep INT
+            ) ON COMMIT DELETE ROWS
+        """))
+        bulk_insert(conn, 'tactics_stage', rows)
+        
+        result = conn.execute(text("""
+            UPDATE match_stats SET
+                home_ppda = CASE WHEN t.side = 'h' THEN t.ppda ELSE match_stats.home_ppda END,
+                home_deep = CASE WHEN t.side = 'h' THEN t.deep ELSE match_stats.home_deep END,
+                away_ppda = CASE WHEN t.side = 'a' THEN t.ppda ELSE match_stats.away_ppda END,
+                away_deep = CASE WHEN t.side = 'a' THEN t.deep ELSE match_stats.away_deep END
+            FROM tactics_stage t
+            JOIN matches m ON m.date = t.match_date
+                AND ((t.side = 'h' AND m.home_team_id = ANY(:team_ids))
+                  OR (t.side = 'a' AND m.away_team_id = ANY(:team_ids)))
+            WHERE match_stats.match_id = m.match_id
+            RETURNING t.idx
+        """), {'team_ids': list(team_ids)})
+        matched = len({r[0] for r in result})
+        conn.commit()
+
+    return matched, len(rows) - matched
+
+def update_database_tactics(workers=4):
+    """
+    Scrapes every team-season page and writes PPDA/deep stats as a three-stage pipeline:
+    a pool of `workers` fetch threads, one parser thread and one DB writer thread,
+    connected by bounded queues so network, parsing and writes overlap.
+    """
     engine = get_db_engine()
     
+    # A club can be stored under several ids (API and fallback sources); the resolver returns all of them
     with engine.connect() as conn:
-        db_teams = [r[0] for r in conn.execute(text("SELECT name FROM teams")).fetchall()]
-
-    for league in LEAGUES:
-        for season in SEASONS:
-            logger.info(f"\n📅 League {league} - Season {season}...")
-            slugs = get_understat_slugs(league, season)
-            
-            for slug in slugs:
-                db_name = NAME_MAP.get(slug)
-                
-                if not db_name:
-                    clean_slug = slug.replace('_', ' ')
-                    if clean_slug in db_teams:
-                        db_name = clean_slug
-                    else:
-                        for t in db_teams:
-                            if clean_slug in t or t in clean_slug:
-                                db_name = t
-                                break
-                
-                if not db_name:
-                    logger.warning(f"   ⚠️ Could not map '{slug}' to Database. Skipping.")
-                    continue
-
-                matches = scrape_team_tactics(slug, season)
-                updates = 0
-                
-                with engine.connect() as conn:
-                    for m in matches:
-                        try:
-                            if m.get('ppda') and m['ppda'].get('def', 0) != 0:
-                                ppda = m['ppda']['att'] / m['ppda']['def']
-                            else:
-                                ppda = None
-                            deep = m.get('deep', 0)
-                            date = m['datetime'].split(' ')[0]
-                            
-                            if m['side'] == 'h':
-                                sql = """
-                                UPDATE match_stats SET home_ppda = :ppda, home_deep = :deep
-                                FROM matches, teams
-                                WHERE match_stats.match_id = matches.match_id
-                                AND matches.home_team_id = teams.team_id
-                                AND matches.date = :date
-                                AND teams.name = :db_name
-                                """
-                            else:
-                                sql = """
-                                UPDATE match_stats SET away_ppda = :ppda, away_deep = :deep
-                                FROM matches, teams
-                                WHERE match_stats.match_id = matches.match_id
-                                AND matches.away_team_id = teams.team_id
-                                AND matches.date = :date
-                                AND teams.name = :db_name
-                                """
-                            
-                            result = conn.execute(text(sql), {
-                                'ppda': ppda, 'deep': deep, 'date': date, 'db_name': db_name
-                            })
-                            if result.rowcount > 0:
-                                updates += 1
-                                
-                        except Exception:
-                            continue
-                    conn.commit()
-                logger.info(f"      ✅ Updated {updates} matches for {db_name}")
-                time.sleep(0.5)
+        resolver = TeamResolver.from_db(conn)
+
+    timings = {'fetch': 0.0, 'parse': 0.0, 'write': 0.0}
+    counts = {'fetch': 0, 'parse': 0, 'write': 0}
+    timing_lock = threading.Lock()
+    wall_start = time.perf_counter()
+
+    def timed(stage, started):
+        with timing_lock:
+            timings[stage] += time.perf_counter() - started
+            counts[stage] += 1
+
+    # 1. Team lists for every league-season
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        league_seasons = [(league, season) for league in LEAGUES for season in SEASONS]
+        slug_lists = list(pool.map(lambda ls: get_understat_slugs(*ls), league_seasons))
+
+    jobs = []
+    for (league, season), slugs in zip(league_seasons, slug_lists):
+        logger.info(f"📅 League {league} - Season {season}: {len(slugs)} teams")
+        for slug in slugs:
+            team_ids = resolver.resolve_all(slug.replace('_', ' '))
+            if not team_ids:
+                logger.warning(f"   ⚠️ Could not map '{slug}' to Database. Skipping.")
+                continue
+            jobs.append((slug, season, resolver.name_of(team_ids[0]), team_ids))
+
+    with engine.connect() as conn:
+        resolver.save_aliases(conn, source='tactics')
+        conn.commit()
+
+    parse_q = queue.Queue(maxsize=workers * 4)
+    write_q = queue.Queue(maxsize=workers * 4)
+
+    # 2. Stage workers
+    def fetch(job):
+        slug, season, db_name, team_ids = job
+        started = time.perf_counter()
+        try:
+            content = fetch_team_page(slug, season)
+        except Exception as e:
+            logger.error(f"❌ Error fetching {slug} ({season}): {e}")
+            return
+        timed('fetch', started)
+        parse_q.put((job, content))
+
+    def parser():
+        while (item := parse_q.get()) is not None:
+            (slug, season, db_name, team_ids), content = item
+            started = time.perf_counter()
+            matches = parse_team_tactics(content)
+            timed('parse', started)
+            write_q.put((season, db_name, team_ids, matches))
+        write_q.put(None)
+
+    def writer():
+        while (item := write_q.get()) is not None:
+            season, db_name, team_ids, matches = item
+            started = time.perf_counter()
+            try:
+                matched, unmatched = write_team_tactics(engine, team_ids, matches)
+            except Exception as e:
+                logger.error(f"❌ Error writing {db_name} ({season}): {e}")
+                continue
+            timed('write', started)
+            logger.info(f"      ✅ Updated {matched} matches for {db_name} ({season}), {unmatched} unmatched")
+
+    parse_thread = threading.Thread(target=parser, daemon=True)
+    write_thread = threading.Thread(target=writer, daemon=True)
+    parse_thread.start()
+    write_thread.start()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fetch, jobs))
+    parse_q.put(None)
+    parse_thread.join()
+    write_thread.join()
+
+    wall = time.perf_counter() - wall_start
+    for stage in ['fetch', 'parse', 'write']:
+        avg_ms = 1000 * timings[stage] / counts[stage] if counts[stage] else 0.0
+        logger.info(f"⏱️  {stage}: {counts[stage]} pages, {timings[stage]:.1f}s busy (avg {avg_ms:.0f} ms)")
+    logger.info(f"⏱️  wall: {wall:.1f}s with {workers} fetch workers")
 
+    log_host_stats()
     logger.info("\n🎉 Tactical Data Sync Complete!")
 
 if __name__ == "__main__":
-    update_database_tactics()
+    parser = argparse.ArgumentParser(description="Scrape Understat PPDA/deep stats for every team-season.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent page fetches (also capped per host by utils.HOST_CONCURRENCY)")
+    args = parser.parse_args()
+    update_database_tactics(workers=max(1, args.workers))
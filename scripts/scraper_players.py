@@ -1,6 +1,3 @@
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
 from sqlalchemy import create_engine, text
 import sys
 import os
@@ -9,7 +6,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import config
-from utils import fetch_url, logger
+from utils import log_host_stats, logger
+from understat import fetch_league_datasets
+from team_resolver import TeamResolver
 
 DB_CONNECTION = config.DB_CONNECTION
 LEAGUES = ["EPL", "La_Liga", "Bundesliga"]
@@ -19,18 +18,10 @@ def get_db_engine():
 
 def scrape_players(league="EPL", season="2025"):
     logger.info(f"🕵️‍♀️ Scraping Players for {league} {season}...")
-    url = f"https://understat.com/league/{league}/{season}"
     try:
-        response = fetch_url(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if script.string and 'playersData' in script.string:
-                json_string = script.string.split("('")[1].split("')")[0]
-                import json
-                data = json.loads(json_string.encode('utf8').decode('unicode_escape'))
-                return data
+        data = fetch_league_datasets(league, season).get('playersData')
+        if data:
+            return data
     except Exception as e:
         logger.error(f"❌ Error scraping players: {e}")
     return []
@@ -47,12 +38,10 @@ def sync_players_db():
 
         logger.info(f"📥 Found {len(players_data)} players in {league}. Syncing to DB...")
         
-        # Pre-fetch teams to map names to IDs
+        # Shared resolver: exact/alias lookups, memoized fuzzy fallback
         try:
-            teams_df = pd.read_sql("SELECT team_id, name FROM teams", engine)
-            # Create a mapping dictionary: Name -> ID
-            # Normalize names (e.g. lower case) for better matching if needed
-            team_map = dict(zip(teams_df['name'], teams_df['team_id']))
+            with engine.connect() as conn:
+                resolver = TeamResolver.from_db(conn)
         except Exception as e:
             logger.error(f"❌ Error fetching teams: {e}")
             return
@@ -63,25 +52,7 @@ def sync_players_db():
                     with conn.begin_nested():
                         # 1. Map Team Name to Team ID
                         team_name = p['team_title']
-                        team_id = team_map.get(team_name)
-                        
-                        # Fallback mapping if exact match fails
-                        if not team_id:
-                            # Try simple replacements
-                            if team_name == "Manchester United": team_id = team_map.get("Manchester United FC") or team_map.get("Man United")
-                            elif team_name == "Newcastle United": team_id = team_map.get("Newcastle United FC")
-                            elif team_name == "Wolverhampton Wanderers": team_id = team_map.get("Wolverhampton Wanderers FC")
-                            elif team_name == "West Ham": team_id = team_map.get("West Ham United FC")
-                            elif team_name == "Tottenham": team_id = team_map.get("Tottenham Hotspur FC")
-                            elif team_name == "Brighton": team_id = team_map.get("Brighton & Hove Albion FC")
-                            
-                            # Fuzzy Match
-                            if not team_id:
-                                import difflib
-                                matches = difflib.get_close_matches(team_name, team_map.keys(), n=1, cutoff=0.6)
-                                if matches:
-                                    team_id = team_map.get(matches[0])
-                                    logger.info(f"🔗 Fuzzy mapped '{team_name}' -> '{matches[0]}'")
+                        team_id = resolver.resolve(team_name)
                         
                         if not team_id:
                             logger.warning(f"⚠️ Could not map team '{team_name}' for player '{p['player_name']}'. Skipping.")
@@ -133,8 +104,10 @@ def sync_players_db():
                     logger.error(f"❌ Error inserting player {p['player_name']}: {e}")
                     continue
             
+            resolver.save_aliases(conn, source='players')
             conn.commit()
     
+    log_host_stats()
     logger.info("✅ Player Data Sync Complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import argparse
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import season_sim
+import dashboard_snapshot
+
+DB_CONNECTION = config.DB_CONNECTION
+
+def simulate_league(league, n_sims, seed, workers, season=None):
+    """Projects the rest of a league's season and prints title, top-4 and relegation odds."""
+    engine = create_engine(DB_CONNECTION)
+    season = season or int(season_sim.season_of([pd.Timestamp.today()])[0])
+    fixtures = season_sim.load_remaining(engine, league, season)
+    if fixtures.empty:
+        print(f"📭 No remaining {league} fixtures in {season}/{str(season + 1)[-2:]}. Run scripts/etl_pipeline.py first.")
+        return None
+    played = dashboard_snapshot.load_matches(engine, league)
+
+    start = time.perf_counter()
+    projection = season_sim.project_season(played, fixtures, n_sims, seed, workers)
+    if projection is None:
+        print(f"📭 Every {league} fixture in {season}/{str(season + 1)[-2:]} has been played.")
+        return None
+    summary = projection[0]
+    elapsed = time.perf_counter() - start
+    print(f"🎲 {league} {season}/{str(season + 1)[-2:]}: {n_sims:,} seasons x {int(summary['Left'].sum()) // 2} fixtures "
+          f"in {elapsed:.2f}s")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summary.round(3).to_string())
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo projection of the rest of the season.")
+    parser.add_argument("--league", default="EPL")
+    parser.add_argument("--season", type=int, help="Season start year (default: the current season)")
+    parser.add_argument("--sims", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Processes (default: SIM_WORKERS or the core count)")
+    args = parser.parse_args()
+    simulate_league(args.league, args.sims, args.seed, args.workers, args.season)
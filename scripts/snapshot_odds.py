@@ -0,0 +1,83 @@
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import create_engine, text
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import odds_integration
+from team_resolver import TeamResolver
+from utils import bulk_upsert
+from feature_engineering_v5 import load_fixtures
+
+DB_CONNECTION = config.DB_CONNECTION
+SNAPSHOT_COLUMNS = [
+    'bookmakers', 'home_odd', 'draw_odd', 'away_odd', 'home_mean', 'draw_mean', 'away_mean',
+    'home_prob', 'draw_prob', 'away_prob', 'over_2_5_odd', 'under_2_5_odd', 'over_2_5_prob',
+    'btts_odd', 'btts_no_odd', 'btts_prob',
+]
+
+# Played matches get the last pre-kick-off snapshot (the closing line) as their match_stats odds
+CLOSING_ODDS_QUERY = """
+UPDATE match_stats SET home_odds = c.home_odd, draw_odds = c.draw_odd, away_odds = c.away_odd
+FROM (
+    SELECT DISTINCT ON (o.match_id) o.match_id,
+           LEAST(o.home_odd, 999.99) AS home_odd, LEAST(o.draw_odd, 999.99) AS draw_odd,
+           LEAST(o.away_odd, 999.99) AS away_odd
+    FROM odds_snapshots o
+    JOIN matches m ON m.match_id = o.match_id
+    WHERE m.home_goals IS NOT NULL AND o.captured_at <= o.commence_time
+    ORDER BY o.match_id, o.captured_at DESC
+) c
+WHERE match_stats.match_id = c.match_id AND match_stats.home_odds IS NULL
+"""
+
+def match_fixtures(fixtures, cache, captured_at):
+    """Snapshot rows for the scheduled fixtures the odds cache prices (pre-match odds only)."""
+    rows = []
+    for fixture in fixtures.itertuples(index=False):
+        odds = cache.get_by_team_ids(fixture.home_team_id, fixture.away_team_id)
+        if odds is None:
+            continue
+        commence = pd.Timestamp(odds['commence_time']).tz_convert('UTC').tz_localize(None)
+        # In-play prices, or the same pairing on another date (e.g. a cup tie), are not this fixture's
+        if commence <= captured_at or abs((commence.normalize() - fixture.date).days) > 1:
+            continue
+        rows.append({'match_id': fixture.match_id, 'captured_at': captured_at,
+                     'commence_time': commence.to_pydatetime(), **{c: odds.get(c) for c in SNAPSHOT_COLUMNS}})
+    return rows
+
+def snapshot_odds(api_key):
+    """
+    Stores the current aggregated odds of every scheduled fixture in odds_snapshots and copies
+    the closing line of finished matches into match_stats. Run it a few times a day: the
+    snapshots give the backtest its bet prices and the closing line for CLV.
+    """
+    if not api_key:
+        print("❌ ODDS_API_KEY is not set.")
+        sys.exit(1)
+
+    engine = create_engine(DB_CONNECTION)
+    with engine.connect() as conn:
+        resolver = TeamResolver.from_db(conn)
+    cache = odds_integration.OddsCache(api_key, resolver)
+    cache.refresh()
+
+    captured_at = datetime.utcnow().replace(microsecond=0)
+    fixtures = load_fixtures(engine)
+    rows = match_fixtures(fixtures, cache, captured_at)
+
+    with engine.begin() as conn:
+        bulk_upsert(conn, 'odds_snapshots', rows, ['match_id', 'captured_at'], ['commence_time'] + SNAPSHOT_COLUMNS)
+        resolver.save_aliases(conn, source='odds')
+        closed = conn.execute(text(CLOSING_ODDS_QUERY)).rowcount
+
+    print(f"✅ Stored odds for {len(rows)}/{len(fixtures)} scheduled fixtures; closing odds set for {closed} matches. "
+          f"API requests left: {cache.quota.get('remaining', '?')}")
+    return len(rows)
+
+if __name__ == "__main__":
+    snapshot_odds(config.ODDS_API_KEY)
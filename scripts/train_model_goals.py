@@ -8,6 +8,8 @@ from sklearn.metrics import accuracy_score, classification_report
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
+from markets import GOALS_FEATURES, prepare_features
+import model_registry
 
 DB_CONNECTION = config.DB_CONNECTION
 
@@ -25,25 +27,9 @@ def train_goals_models():
         print("❌ Error: Table is empty!")
         sys.exit(1)
 
-    # Clean
-    cols = [
-        'home_ppda_5', 'away_ppda_5', 'home_deep_5', 'away_deep_5', 'home_xg_5', 'away_xg_5',
-        'home_goals_scored_5', 'home_goals_conceded_5', 'away_goals_scored_5', 'away_goals_conceded_5',
-        'home_squad_xg_chain', 'home_squad_xg_buildup', 'away_squad_xg_chain', 'away_squad_xg_buildup'
-    ]
-    for col in cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    features = [
-        'elo_diff', 
-        'home_ppda_5', 'away_ppda_5',
-        'home_deep_5', 'away_deep_5',
-        'home_xg_5', 'away_xg_5',
-        'home_goals_scored_5', 'home_goals_conceded_5',
-        'away_goals_scored_5', 'away_goals_conceded_5',
-        'home_squad_xg_chain', 'home_squad_xg_buildup',
-        'away_squad_xg_chain', 'away_squad_xg_buildup'
-    ]
+    # Clean (same schema and cleaning as serving)
+    features = GOALS_FEATURES
+    df[features] = prepare_features(df, features)
     
     split = int(len(df) * 0.85)
     X_train = df[features].iloc[:split]
@@ -64,9 +50,6 @@ def train_goals_models():
     acc_ou = accuracy_score(y_test_ou, preds_ou)
     print(f"✅ Over 2.5 Accuracy: {acc_ou:.2%}")
     print(classification_report(y_test_ou, preds_ou, target_names=['Under', 'Over']))
-    
-    model_ou.save_model("football_v5_over_2_5.json")
-    print("💾 Saved football_v5_over_2_5.json")
 
     # --- TRAIN BTTS ---
     print("\n🤝 Training BTTS Model...")
@@ -83,9 +66,16 @@ def train_goals_models():
     acc_btts = accuracy_score(y_test_btts, preds_btts)
     print(f"✅ BTTS Accuracy: {acc_btts:.2%}")
     print(classification_report(y_test_btts, preds_btts, target_names=['No', 'Yes']))
-    
-    model_btts.save_model("football_v5_btts.json")
-    print("💾 Saved football_v5_btts.json")
+
+    # Publish both goals models together as one registry version
+    version = model_registry.publish(
+        {'over_2_5': model_ou, 'btts': model_btts},
+        metrics={
+            'over_2_5': {'accuracy': float(acc_ou), 'train_rows': len(X_train), 'test_rows': len(X_test)},
+            'btts': {'accuracy': float(acc_btts), 'train_rows': len(X_train), 'test_rows': len(X_test)},
+        }
+    )
+    print(f"💾 Saved goals models as version {version} in {model_registry.REGISTRY_DIR}")
 
 if __name__ == "__main__":
     train_goals_models()
@@ -8,6 +8,8 @@ from sklearn.metrics import accuracy_score, classification_report
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
+from markets import MATCH_FEATURES, prepare_features
+import model_registry
 
 DB_CONNECTION = config.DB_CONNECTION
 
@@ -25,22 +27,9 @@ def train_v5():
         print("❌ Error: Table is empty!")
         sys.exit(1)
 
-    # Clean
-    cols = [
-        'home_ppda_5', 'away_ppda_5', 'home_deep_5', 'away_deep_5', 'home_xg_5', 'away_xg_5',
-        'home_squad_xg_chain', 'home_squad_xg_buildup', 'away_squad_xg_chain', 'away_squad_xg_buildup'
-    ]
-    for col in cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    features = [
-        'elo_diff', 
-        'home_ppda_5', 'away_ppda_5',
-        'home_deep_5', 'away_deep_5',
-        'home_xg_5', 'away_xg_5',
-        'home_squad_xg_chain', 'home_squad_xg_buildup', # NEW
-        'away_squad_xg_chain', 'away_squad_xg_buildup'  # NEW
-    ]
+    # Clean (same schema and cleaning as serving)
+    features = MATCH_FEATURES
+    df[features] = prepare_features(df, features)
     
     target = 'match_result'
     
@@ -76,12 +65,13 @@ def train_v5():
     fi = pd.DataFrame({'Feature': features, 'Importance': model.feature_importances_}).sort_values('Importance', ascending=False)
     print(fi)
     
-    # Save Feature Importance
-    fi.to_json(config.FEATURE_IMPORTANCE_FILE, orient='records')
-    print(f"💾 Feature importance saved to {config.FEATURE_IMPORTANCE_FILE}")
-    
-    model.save_model(config.MODEL_FILE)
-    print(f"💾 Model saved to {config.MODEL_FILE}")
+    # Publish model + feature importance as a new registry version (served once CURRENT flips)
+    version = model_registry.publish(
+        {'1x2': model},
+        metrics={'1x2': {'accuracy': float(acc), 'train_rows': len(X_train), 'test_rows': len(X_test)}},
+        feature_importance=fi.to_dict('records')
+    )
+    print(f"💾 Model saved as version {version} in {model_registry.REGISTRY_DIR}")
 
 if __name__ == "__main__":
     train_v5()
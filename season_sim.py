@@ -0,0 +1,206 @@
+import os
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import text
+
+MAX_GOALS = 10          # Scorelines are capped here (P(X > 10) is ~1e-5 even at 3 xG)
+CHUNK = 10000           # Seasons per task: one seeded stream each, so results don't depend on the worker count
+FORM_WINDOW = 38        # Recent matches per team behind its attack/defence ratings
+PRIOR_MATCHES = 5       # Ratings are shrunk toward the prior as if this many matches had been seen
+NEW_TEAM_RATING = (0.85, 1.15)  # (attack, defence) prior for teams with no history (mostly promoted sides)
+TOP, RELEGATED = 4, 3
+
+REMAINING_QUERY = """
+SELECT m.match_id, m.date, t_home.name AS home_name, t_away.name AS away_name
+FROM matches m
+JOIN teams t_home ON m.home_team_id = t_home.team_id
+JOIN teams t_away ON m.away_team_id = t_away.team_id
+WHERE m.league = :league AND m.home_goals IS NULL AND m.date >= :since
+ORDER BY m.date ASC
+"""
+
+def season_of(dates):
+    """Season start year (a season runs July to June)."""
+    dates = pd.to_datetime(pd.Series(dates))
+    return np.where(dates.dt.month >= 7, dates.dt.year, dates.dt.year - 1)
+
+def load_remaining(engine, league, season):
+    """Unplayed fixture rows of a season (see pending_fixtures before simulating them)."""
+    since = pd.Timestamp(year=int(season), month=7, day=1).date()
+    df = pd.read_sql(text(REMAINING_QUERY), engine, params={'league': league, 'since': since})
+    return df[season_of(df['date']) == season].reset_index(drop=True)
+
+def pending_fixtures(fixtures, season_played):
+    """
+    One row per pairing still to play: the latest-dated row of each (home, away), since older
+    ones are stale rows of rescheduled fixtures, minus pairings already played this season.
+    """
+    fixtures = fixtures.sort_values('date', kind='stable').drop_duplicates(['home_name', 'away_name'], keep='last')
+    played = pd.MultiIndex.from_frame(season_played[['home_name', 'away_name']])
+    todo = ~pd.MultiIndex.from_frame(fixtures[['home_name', 'away_name']]).isin(played)
+    return fixtures[todo].reset_index(drop=True)
+
+def team_strengths(played, window=FORM_WINDOW, prior=PRIOR_MATCHES):
+    """
+    Attack/defence ratings (1.0 = league average) from each team's last `window` matches of xG
+    for and against (goals where xG is missing), plus the league's average home/away xG over
+    the same stretch. Returns (ratings DataFrame indexed by team, home average, away average).
+    """
+    played = played.sort_values('date', kind='stable')
+    home_xg = played['home_xg'].fillna(played['home_goals']).to_numpy(dtype=float)
+    away_xg = played['away_xg'].fillna(played['away_goals']).to_numpy(dtype=float)
+    long = pd.DataFrame({
+        'team': np.column_stack([played['home_name'], played['away_name']]).ravel(),
+        'xg_for': np.column_stack([home_xg, away_xg]).ravel(),
+        'xg_against': np.column_stack([away_xg, home_xg]).ravel(),
+    })
+    last = long.groupby('team').tail(window)
+
+    recent = max(1, long['team'].nunique() * window // 2)  # About `window` matches per team
+    home_avg, away_avg = np.nanmean(home_xg[-recent:]), np.nanmean(away_xg[-recent:])
+    per_game = (home_avg + away_avg) / 2
+    grouped = last.groupby('team')
+    n = grouped.size()
+    attack = (grouped['xg_for'].sum() / per_game + prior) / (n + prior)
+    defence = (grouped['xg_against'].sum() / per_game + prior) / (n + prior)
+    return pd.DataFrame({'attack': attack, 'defence': defence}), home_avg, away_avg
+
+def expected_goals(fixtures, played):
+    """Poisson means (home, away) per fixture: league venue average x attack x opponent defence."""
+    ratings, home_avg, away_avg = team_strengths(played)
+    def rating(names, col, default):
+        return names.map(ratings[col]).fillna(default).to_numpy(dtype=float)
+    att_h = rating(fixtures['home_name'], 'attack', NEW_TEAM_RATING[0])
+    att_a = rating(fixtures['away_name'], 'attack', NEW_TEAM_RATING[0])
+    def_h = rating(fixtures['home_name'], 'defence', NEW_TEAM_RATING[1])
+    def_a = rating(fixtures['away_name'], 'defence', NEW_TEAM_RATING[1])
+    return home_avg * att_h * def_a, away_avg * att_a * def_h
+
+def standings(season_played, teams):
+    """Points, goal difference and goals for per team (teams order) from a season's results."""
+    idx = {team: i for i, team in enumerate(teams)}
+    h = season_played['home_name'].map(idx).to_numpy()
+    a = season_played['away_name'].map(idx).to_numpy()
+    hg = season_played['home_goals'].to_numpy(dtype=int)
+    ag = season_played['away_goals'].to_numpy(dtype=int)
+    T = len(teams)
+    pts = np.bincount(h, 3 * (hg > ag) + (hg == ag), T) + np.bincount(a, 3 * (ag > hg) + (hg == ag), T)
+    gf = np.bincount(h, hg, T) + np.bincount(a, ag, T)
+    ga = np.bincount(h, ag, T) + np.bincount(a, hg, T)
+    return pts.astype(int), (gf - ga).astype(int), gf.astype(int)
+
+def poisson_cdf(lam, max_goals=MAX_GOALS):
+    """(max_goals, m) table of P(X <= k) for k < max_goals; draws of u past the last row become max_goals."""
+    k = np.arange(max_goals)[:, None]
+    log_pmf = k * np.log(lam)[None, :] - lam[None, :] - np.cumsum(np.r_[0, np.log(np.arange(1, max_goals))])[:, None]
+    return np.cumsum(np.exp(log_pmf), axis=0).astype(np.float32)
+
+def _draw(rng, cdf, n):
+    """n x m Poisson goals by inverse CDF: one uniform and max_goals comparisons per score."""
+    u = rng.random((n, cdf.shape[1]), dtype=np.float32)
+    goals = np.zeros((n, cdf.shape[1]), dtype=np.float32)
+    for row in cdf:
+        goals += u > row
+    return goals
+
+def _simulate_chunk(seed, n, cdf_home, cdf_away, home, away, base_pts, base_gd, base_gf, max_pts):
+    """Simulates n seasons. Returns (position counts T x T, final points counts T x (max_pts + 1))."""
+    rng = np.random.default_rng(seed)
+    T = len(base_pts)
+    gh = _draw(rng, cdf_home, n)
+    ga = _draw(rng, cdf_away, n)
+
+    # Fixture -> team incidence, so per-team totals over all seasons are two matrix products
+    H = np.zeros((len(home), T), dtype=np.float32)
+    A = np.zeros((len(away), T), dtype=np.float32)
+    H[np.arange(len(home)), home] = 1
+    A[np.arange(len(away)), away] = 1
+    home_pts = 3 * (gh > ga) + (gh == ga).astype(np.float32)
+    away_pts = 3 * (ga > gh) + (gh == ga).astype(np.float32)
+    pts = base_pts + (home_pts @ H + away_pts @ A).astype(np.int64)
+    gd = base_gd + ((gh - ga) @ H + (ga - gh) @ A).astype(np.int64)
+    gf = base_gf + (gh @ H + ga @ A).astype(np.int64)
+
+    # Points, then goal difference, then goals scored; anything still level is a coin toss
+    key = pts * 1e7 + (gd + 1000) * 1e3 + gf + rng.random((n, T))
+    order = np.argsort(-key, axis=1)
+    position = np.empty_like(order)
+    np.put_along_axis(position, order, np.arange(T)[None, :], axis=1)
+
+    teams = np.arange(T)[None, :]
+    pos_counts = np.bincount((teams * T + position).ravel(), minlength=T * T).reshape(T, T)
+    pts_counts = np.bincount((teams * (max_pts + 1) + pts).ravel(), minlength=T * (max_pts + 1)).reshape(T, max_pts + 1)
+    return pos_counts, pts_counts
+
+def simulate(teams, table, fixtures, lam_home, lam_away, n_sims=100000, seed=0, workers=None, chunk=CHUNK):
+    """
+    Monte Carlo of the rest of a season. `table` is (points, goal difference, goals for) per team,
+    `fixtures` the remaining matches (home_name, away_name) with Poisson means lam_home/lam_away.
+    Seasons are simulated in chunks with independent seeded streams (SeedSequence.spawn) spread
+    over `workers` processes (default: SIM_WORKERS or the core count); the same seed gives the same
+    result whatever the worker count. Returns (summary per team, position probabilities, points
+    distribution), the last two as DataFrames indexed by team.
+    """
+    teams = list(teams)
+    idx = {team: i for i, team in enumerate(teams)}
+    home = fixtures['home_name'].map(idx).to_numpy()
+    away = fixtures['away_name'].map(idx).to_numpy()
+    base_pts, base_gd, base_gf = (np.asarray(x, dtype=np.int64) for x in table)
+    T = len(teams)
+    games_left = np.bincount(home, minlength=T) + np.bincount(away, minlength=T)
+    max_pts = int((base_pts + 3 * games_left).max()) if T else 0
+
+    cdf_home = poisson_cdf(np.maximum(np.asarray(lam_home, dtype=float), 1e-6))
+    cdf_away = poisson_cdf(np.maximum(np.asarray(lam_away, dtype=float), 1e-6))
+    sizes = [min(chunk, n_sims - start) for start in range(0, n_sims, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(s, n, cdf_home, cdf_away, home, away, base_pts, base_gd, base_gf, max_pts) for s, n in zip(seeds, sizes)]
+
+    workers = workers or int(os.getenv("SIM_WORKERS", os.cpu_count() or 1))
+    if workers > 1 and len(args) > 1:
+        # Spawned, not forked: callers like the dashboard are multithreaded servers holding locks
+        with ProcessPoolExecutor(max_workers=min(workers, len(args)), mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*args)))
+    else:
+        results = [_simulate_chunk(*a) for a in args]
+
+    pos_counts = sum(r[0] for r in results)
+    pts_counts = sum(r[1] for r in results)
+    positions = pd.DataFrame(pos_counts / n_sims, index=teams, columns=range(1, T + 1))
+    points = pd.DataFrame(pts_counts / n_sims, index=teams)
+
+    cdf = points.cumsum(axis=1).to_numpy()
+    def quantile(q):
+        return (cdf < q).sum(axis=1)
+    summary = pd.DataFrame({
+        'Pts': base_pts,
+        'Left': games_left,
+        'xPts': points.to_numpy() @ np.arange(max_pts + 1),
+        'Pts 5%': quantile(0.05),
+        'Pts 50%': quantile(0.5),
+        'Pts 95%': quantile(0.95),
+        'Title': positions[1].to_numpy(),
+        f'Top {TOP}': positions.iloc[:, :TOP].sum(axis=1).to_numpy(),
+        'Relegation': positions.iloc[:, -RELEGATED:].sum(axis=1).to_numpy() if T > RELEGATED else 0.0,
+    }, index=teams).sort_values(['xPts', 'Pts'], ascending=False)
+    return summary, positions, points
+
+def project_season(played, fixtures, n_sims=100000, seed=0, workers=None):
+    """
+    Simulates the remaining `fixtures` of the latest season in `played` (load_data's match
+    frame). Returns simulate()'s (summary, positions, points), or None without fixtures.
+    """
+    if fixtures.empty:
+        return None
+    played = played.dropna(subset=['home_goals', 'away_goals'])
+    season = season_of(fixtures['date']).max()
+    season_played = played[season_of(played['date']) == season] if len(played) else played
+    fixtures = pending_fixtures(fixtures, season_played)
+    if fixtures.empty:
+        return None
+    teams = pd.unique(np.concatenate([season_played['home_name'], season_played['away_name'],
+                                      fixtures['home_name'], fixtures['away_name']]))
+    lam_home, lam_away = expected_goals(fixtures, played)
+    return simulate(teams, standings(season_played, teams), fixtures, lam_home, lam_away, n_sims, seed, workers)
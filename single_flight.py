@@ -0,0 +1,59 @@
+import asyncio
+
+class SingleFlight:
+    """
+    Request coalescing for asyncio code: while a key is being fetched, concurrent callers
+    asking for it wait for that fetch instead of starting their own. Nothing is cached
+    once the fetch completes (that is TTLCache's job).
+    """
+    def __init__(self):
+        self.inflight = {}   # key -> Future resolved by the caller that fetches it
+        self.fetched = 0     # keys fetched
+        self.coalesced = 0   # keys answered by another caller's fetch
+
+    async def run(self, keys, fetch):
+        """
+        Returns {key: value} for `keys`. Keys nobody is fetching yet go to one
+        `await fetch(keys)` call, which returns {key: value} (absent keys -> None).
+        The fetch is shielded, so a cancelled caller does not fail the others waiting on it.
+        """
+        loop = asyncio.get_running_loop()
+        owned, waiting = [], {}
+        for key in dict.fromkeys(keys):
+            if key in self.inflight:
+                waiting[key] = self.inflight[key]
+            else:
+                self.inflight[key] = loop.create_future()
+                owned.append(key)
+        self.fetched += len(owned)
+        self.coalesced += len(waiting)
+
+        results = {}
+        if owned:
+            task = asyncio.ensure_future(fetch(owned))
+            task.add_done_callback(lambda t: self._settle(owned, t))
+            found = await asyncio.shield(task)
+            results.update((key, found.get(key)) for key in owned)
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+        return results
+
+    def _settle(self, keys, task):
+        for key in keys:
+            future = self.inflight.pop(key)
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+                future.exception()  # Nobody may be waiting; don't log it as unretrieved
+            else:
+                future.set_result(task.result().get(key))
+
+    def stats(self):
+        total = self.fetched + self.coalesced
+        return {
+            'inflight': len(self.inflight),
+            'fetched': self.fetched,
+            'coalesced': self.coalesced,
+            'coalesced_rate': round(self.coalesced / total, 4) if total else None,
+        }
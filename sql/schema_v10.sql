@@ -0,0 +1,18 @@
+-- Precomputed predictions for scheduled fixtures (scripts/predict_fixtures.py)
+
+CREATE TABLE IF NOT EXISTS predictions (
+    match_id VARCHAR(50) REFERENCES matches (match_id),
+    model_version VARCHAR(200) NOT NULL, -- Registry version (or legacy file stamp) that scored it
+    league VARCHAR(50),
+    date DATE,
+    home_win FLOAT,
+    draw FLOAT,
+    away_win FLOAT,
+    over_2_5 FLOAT,
+    btts FLOAT,
+    features_version VARCHAR(40), -- feature_store_meta.updated_at of the team state used
+    created_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (match_id, model_version)
+);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_league_date ON predictions (league, date);
@@ -0,0 +1,15 @@
+-- Live odds per match over time (scripts/snapshot_odds.py), aggregated across bookmakers.
+-- The last snapshot before kick-off is the closing line, copied into match_stats.*_odds.
+
+CREATE TABLE IF NOT EXISTS odds_snapshots (
+    match_id VARCHAR(50) REFERENCES matches (match_id),
+    captured_at TIMESTAMP NOT NULL,
+    commence_time TIMESTAMP,
+    bookmakers INT,
+    home_odd FLOAT, draw_odd FLOAT, away_odd FLOAT,       -- Best price across bookmakers
+    home_mean FLOAT, draw_mean FLOAT, away_mean FLOAT,
+    home_prob FLOAT, draw_prob FLOAT, away_prob FLOAT,    -- Overround-free implied probabilities
+    over_2_5_odd FLOAT, under_2_5_odd FLOAT, over_2_5_prob FLOAT,
+    btts_odd FLOAT, btts_no_odd FLOAT, btts_prob FLOAT,
+    PRIMARY KEY (match_id, captured_at)
+);
@@ -0,0 +1,12 @@
+-- Incremental ETL: one sync watermark per league and data source
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    league VARCHAR(50) NOT NULL,
+    source VARCHAR(30) NOT NULL, -- 'rapidapi', 'football_data', 'understat'
+    last_match_date DATE, -- Latest finished match stored from this source
+    last_run_at TIMESTAMP,
+    PRIMARY KEY (league, source)
+);
+
+-- Hash of the stored match + stats row, used to skip unchanged fixtures
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
@@ -0,0 +1,5 @@
+-- Indexes for the set-based tactical update (team + date lookups per side)
+
+CREATE INDEX IF NOT EXISTS idx_matches_home_date ON matches (home_team_id, date);
+
+CREATE INDEX IF NOT EXISTS idx_matches_away_date ON matches (away_team_id, date);
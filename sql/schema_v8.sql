@@ -0,0 +1,8 @@
+-- Team name aliases learned by the shared resolver (team_resolver.py)
+
+CREATE TABLE IF NOT EXISTS team_aliases (
+    alias VARCHAR(100) PRIMARY KEY, -- Normalized spelling, e.g. 'man utd'
+    team_id INT REFERENCES teams (team_id),
+    source VARCHAR(30), -- Subsystem that learned it ('etl', 'tactics', 'players', 'odds')
+    created_at TIMESTAMP DEFAULT NOW()
+);
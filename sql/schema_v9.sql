@@ -0,0 +1,14 @@
+-- Incremental feature store: per-team state carried between feature runs
+
+CREATE TABLE IF NOT EXISTS feature_team_state (
+    team_id INT PRIMARY KEY,
+    elo FLOAT NOT NULL, -- Rating after the team's last processed match
+    recent_stats TEXT, -- JSON list of the last 5 [ppda, deep, xg, goals_scored, goals_conceded] rows, oldest first
+    last_date DATE
+);
+
+CREATE TABLE IF NOT EXISTS feature_store_meta (
+    table_name VARCHAR(50) PRIMARY KEY,
+    last_processed_date DATE,
+    updated_at TIMESTAMP
+);
@@ -0,0 +1,167 @@
+import re
+import difflib
+import threading
+import unicodedata
+from sqlalchemy import text
+from utils import bulk_upsert, logger
+
+# Tokens that never distinguish two clubs
+STOP_TOKENS = {"fc", "afc", "cf", "sc", "ac", "the", "de", "club"}
+
+# Known spellings of the same club across RapidAPI, Football-Data.org, Understat and The Odds API
+ALIAS_GROUPS = [
+    {"Manchester United", "Man United", "Man Utd"},
+    {"Manchester City", "Man City"},
+    {"Newcastle United", "Newcastle"},
+    {"Tottenham", "Tottenham Hotspur", "Spurs"},
+    {"Wolverhampton Wanderers", "Wolves"},
+    {"West Bromwich Albion", "West Brom"},
+    {"West Ham", "West Ham United"},
+    {"Brighton", "Brighton and Hove Albion", "Brighton & Hove Albion"},
+    {"Nottingham Forest", "Nott'm Forest", "Nottm Forest"},
+    {"Sheffield United", "Sheffield Utd"},
+    {"Luton", "Luton Town"},
+    {"Leeds", "Leeds United"},
+    {"Leicester", "Leicester City"},
+    {"Ipswich", "Ipswich Town"},
+    {"Norwich", "Norwich City"},
+    {"Atletico Madrid", "Club Atletico de Madrid", "Atletico"},
+    {"Athletic Club", "Athletic Bilbao"},
+    {"Bayern Munich", "Bayern Munchen", "FC Bayern Munchen"},
+    {"Borussia Dortmund", "Dortmund"},
+    {"Borussia M.Gladbach", "Borussia Monchengladbach", "Gladbach"},
+    {"Bayer Leverkusen", "Bayer 04 Leverkusen", "Leverkusen"},
+]
+
+def normalize(name):
+    """Lowercase, accent-free, punctuation-free key with filler tokens removed."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    tokens = re.sub(r"[^a-z0-9]+", " ", name.lower().replace("&", " and ")).split()
+    return " ".join(t for t in tokens if t not in STOP_TOKENS)
+
+class TeamResolver:
+    """
+    Maps any team spelling to team_ids with O(1) lookups on normalized names and aliases.
+    Fuzzy fallbacks (token containment, then difflib) are memoized and remembered as
+    aliases; save_aliases() persists them to the team_aliases table.
+    """
+    def __init__(self, fuzzy_cutoff=0.85):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.index = {}        # normalized key -> [team_id, ...]
+        self.names = {}        # team_id -> display name
+        self.tokens = {}       # token -> {normalized key, ...}
+        self.memo = {}         # normalized query -> [team_id, ...] (or [] for misses)
+        self.learned = {}      # normalized alias -> team_id, waiting to be saved
+        self.groups = {}       # normalized alias -> group number in ALIAS_GROUPS
+        self.lock = threading.Lock()
+        for i, group in enumerate(ALIAS_GROUPS):
+            for alias in group:
+                self.groups[normalize(alias)] = i
+
+    @classmethod
+    def from_db(cls, conn, team_ids=None, **kwargs):
+        """
+        Builds a resolver from the teams table plus every persisted alias
+        (optionally restricted to some team_ids).
+        """
+        resolver = cls(**kwargs)
+        where = "WHERE team_id = ANY(:ids)" if team_ids is not None else ""
+        params = {'ids': list(team_ids)} if team_ids is not None else {}
+        for team_id, name in conn.execute(text(f"SELECT team_id, name FROM teams {where}"), params).fetchall():
+            resolver.add_team(team_id, name)
+        try:
+            with conn.begin_nested():
+                aliases = conn.execute(text(f"SELECT alias, team_id FROM team_aliases {where}"), params).fetchall()
+        except Exception as e:
+            logger.warning(f"⚠️ team_aliases unavailable ({e}). Using built-in aliases only.")
+            aliases = []
+        for alias, team_id in aliases:
+            resolver._add_key(alias, team_id)
+        return resolver
+
+    def _add_key(self, key, team_id):
+        ids = self.index.setdefault(key, [])
+        if team_id not in ids:
+            ids.append(team_id)
+            ids.sort()
+        for token in key.split():
+            self.tokens.setdefault(token, set()).add(key)
+
+    def add_team(self, team_id, name):
+        with self.lock:
+            self.names.setdefault(team_id, name)
+            self._add_key(normalize(name), team_id)
+            self.memo.clear() # A new team can change earlier fuzzy answers
+
+    def resolve_all(self, name):
+        """Every team_id stored under this club (API, Football-Data and fallback ids)."""
+        if not name:
+            return []
+        key = normalize(name)
+        with self.lock:
+            if key in self.index:
+                return list(self.index[key])
+            if key not in self.memo:
+                self.memo[key] = self._fuzzy(key)
+                if self.memo[key]:
+                    self.learned[key] = self.memo[key][0]
+            return list(self.memo[key])
+
+    def resolve(self, name):
+        """Canonical team_id for a name (lowest id of the club), or None."""
+        ids = self.resolve_all(name)
+        return ids[0] if ids else None
+
+    def name_of(self, team_id):
+        return self.names.get(team_id)
+
+    def canonical(self, team_id):
+        """The id resolve() returns for this team's club (lowest id), or team_id itself if unknown."""
+        name = self.names.get(team_id)
+        return (self.resolve(name) if name else None) or team_id
+
+    def _fuzzy(self, key):
+        # 1. Known alias group
+        if key in self.groups:
+            group = self.groups[key]
+            for alias, g in self.groups.items():
+                if g == group and alias in self.index:
+                    return list(self.index[alias])
+
+        # 2. Token containment ("newcastle" vs "newcastle united"), only when unambiguous
+        query_tokens = set(key.split())
+        candidates = set()
+        for token in query_tokens:
+            candidates |= self.tokens.get(token, set())
+        contained = [c for c in candidates if query_tokens <= set(c.split()) or set(c.split()) <= query_tokens]
+        contained_ids = {tuple(self.index[c]) for c in contained}
+        if len(contained_ids) == 1:
+            return list(contained_ids.pop())
+
+        # 3. Close spelling among keys sharing a token (falls back to all keys)
+        pool = candidates or self.index.keys()
+        matches = difflib.get_close_matches(key, list(pool), n=1, cutoff=self.fuzzy_cutoff)
+        if matches:
+            logger.info(f"🔗 Fuzzy mapped '{key}' -> '{matches[0]}'")
+            return list(self.index[matches[0]])
+        return []
+
+    def save_aliases(self, conn, source=None):
+        """
+        Persists aliases learned since the last save. Returns the number written.
+        Runs in a savepoint, so a failure (e.g. no team_aliases table) never rolls back the
+        caller's transaction; the aliases are kept for the next save.
+        """
+        with self.lock:
+            learned, self.learned = self.learned, {}
+        rows = [{'alias': alias, 'team_id': team_id, 'source': source} for alias, team_id in learned.items()]
+        if not rows:
+            return 0
+        try:
+            with conn.begin_nested():
+                return bulk_upsert(conn, 'team_aliases', rows, ['alias'], ['team_id', 'source'])
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save team aliases ({e}). Keeping them for the next save.")
+            with self.lock:
+                self.learned = {**learned, **self.learned}
+            return 0
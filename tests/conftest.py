@@ -0,0 +1,29 @@
+import os
+import sys
+import types
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'scripts')]
+
+# Scripts read a local config.py (not in git). Tests that touch a database bring their own
+# SQLite file, so a missing config only needs the names the modules read at import.
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType('config')
+    config.DB_CONNECTION = "sqlite://"
+    config.ODDS_API_KEY = None
+    config.ELO_K_FACTOR = 20
+    sys.modules['config'] = config
+
+def load_api(db_url):
+    """A fresh import of ml_api/main.py with API_DB_URL set to db_url."""
+    import importlib.util
+    os.environ["API_DB_URL"] = db_url
+    try:
+        spec = importlib.util.spec_from_file_location("ml_api_main", os.path.join(ROOT_DIR, "ml_api", "main.py"))
+        main = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(main)
+    finally:
+        os.environ.pop("API_DB_URL", None)
+    return main
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from conftest import load_api
+from markets import ALL_FEATURES
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+STAMP = datetime(2026, 1, 1, 6, 0).isoformat()  # feature_store_meta.updated_at as the API reads it
+
+SCHEMA = [
+    "CREATE TABLE matches (match_id VARCHAR(50) PRIMARY KEY, date DATE, league VARCHAR(50), "
+    "home_team_id INT, away_team_id INT, home_goals INT, away_goals INT)",
+    "CREATE TABLE feature_store_meta (table_name VARCHAR(50) PRIMARY KEY, last_processed_date DATE, updated_at TIMESTAMP)",
+    "CREATE TABLE feature_team_state (team_id INT PRIMARY KEY, elo FLOAT, recent_stats TEXT, last_date DATE)",
+    "CREATE TABLE players (player_id INT PRIMARY KEY, team_id INT)",
+    "CREATE TABLE player_season_stats (player_id INT, season VARCHAR(10), xg_chain FLOAT, xg_buildup FLOAT, goals INT)",
+    "CREATE TABLE model_features_v5 (match_id VARCHAR(50) PRIMARY KEY, "
+    + ", ".join(f"{col} FLOAT" for col in ALL_FEATURES) + ")",
+    "CREATE TABLE predictions (match_id VARCHAR(50), model_version VARCHAR(40), league VARCHAR(50), date DATE, "
+    "home_win FLOAT, draw FLOAT, away_win FLOAT, over_2_5 FLOAT, btts FLOAT, features_version VARCHAR(40), "
+    "created_at TIMESTAMP, PRIMARY KEY (match_id, model_version))",
+]
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """ml_api.main against a small SQLite database: one fixture, stored for model version v1 only."""
+    url = f"sqlite:///{tmp_path_factory.mktemp('api') / 'api.db'}"
+    engine = create_engine(url)
+    kickoff = date.today() + timedelta(days=3)
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO matches VALUES ('F1', :d, 'EPL', 1, 2, NULL, NULL)"), {'d': kickoff})
+        conn.execute(text("INSERT INTO feature_store_meta VALUES ('model_features_v5', :d, :stamp)"),
+                     {'d': kickoff, 'stamp': STAMP})
+        for team_id, elo, window in [(1, 1580.0, [9.5, 6, 1.8, 2, 1]), (2, 1460.0, [12.0, 3, 0.9, 1, 2])]:
+            conn.execute(text("INSERT INTO feature_team_state VALUES (:t, :elo, :recent, :d)"),
+                         {'t': team_id, 'elo': elo, 'recent': json.dumps([window] * 5), 'd': kickoff})
+        conn.execute(text("INSERT INTO predictions VALUES ('F1', 'v1', 'EPL', :d, 0.5, 0.3, 0.2, 0.6, 0.55, :stamp, :stamp)"),
+                     {'d': kickoff, 'stamp': STAMP})
+    engine.dispose()
+
+    main = load_api(url)
+    models = main.MarketModels(ROOT_DIR, backend="xgboost")
+    if '1x2' not in models.boosters:
+        pytest.skip(f"No 1X2 model at the repo root ({models.status()})")
+    main.serving = main.Serving(models, "v1", "v1")
+    return main
+
+def predict(main, match_id):
+    async def run():
+        try:
+            return await main.predict_match(main.PredictionRequest(match_id=match_id))
+        finally:
+            if main.engine is not None:
+                await main.engine.dispose()
+    return asyncio.run(run())
+
+def test_stored_prediction_is_served(api):
+    served = predict(api, 'F1')
+    assert served['model_version'] == 'v1'
+    assert served['home_win'] == pytest.approx(0.5)
+
+def test_fixture_is_still_served_after_a_version_swap(api):
+    # The new version has no stored row and the fixture has no model_features_v5 row
+    api.serving = api.Serving(api.serving.models, "v2", "v2")
+    served = predict(api, 'F1')
+    assert served['model_version'] == 'v2'
+    assert served['home_win'] + served['draw'] + served['away_win'] == pytest.approx(1, abs=1e-5)
+    assert served['home_win'] != pytest.approx(0.5)  # Scored live, not the v1 row
+
+def test_unknown_match_is_not_found(api):
+    with pytest.raises(api.HTTPException) as error:
+        predict(api, 'nope')
+    assert error.value.status_code == 404
@@ -0,0 +1,16 @@
+import asyncio
+
+import pytest
+
+from conftest import load_api
+
+def test_api_starts_without_a_database():
+    main = load_api("")
+    assert main.engine is None
+    assert main.health()["status"] == "active"
+    assert main.cache_stats()["db_pool"] is None
+
+    with pytest.raises(main.HTTPException) as error:
+        asyncio.run(main.predict_match(main.PredictionRequest(match_id='F1')))
+    assert error.value.status_code == 503
+    assert "DB_CONNECTION" in error.value.detail
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+
+def random_bets(n=600, days=120, seed=0):
+    """Matches spread over days (several per day), model probabilities near the true ones, bookmaker margins."""
+    rng = np.random.default_rng(seed)
+    true = rng.dirichlet([4, 2.5, 3], n)
+    probs = 0.8 * true + 0.2 * rng.dirichlet([4, 2.5, 3], n)
+    odds = np.round(1 / (true * rng.uniform(1.0, 1.12, (n, 3))), 2)
+    result = np.array([rng.choice(3, p=p) for p in true])
+    df = pd.DataFrame(probs, columns=backtest.PROB_COLS).assign(**dict(zip(backtest.ODDS_COLS, odds.T)))
+    df['date'] = pd.Timestamp('2024-08-01') + pd.to_timedelta(np.sort(rng.integers(0, days, n)), unit='D')
+    df['home_goals'] = np.where(result == 0, 2, np.where(result == 1, 1, 0))
+    df['away_goals'] = np.where(result == 2, 2, np.where(result == 1, 1, 0))
+    closing = 1 / odds / (1 / odds).sum(axis=1, keepdims=True)
+    for col, values in zip(backtest.CLOSING_COLS, closing.T):
+        df[col] = values
+    return backtest.prepare_bets(df)
+
+def reference(bets, staking, size, threshold, max_odds, bankroll=1.0):
+    """Day by day, match by match: stakes from the day's opening bankroll, stop once it hits zero."""
+    balance, peak, drawdown, staked, placed = bankroll, bankroll, 0.0, 0.0, 0
+    for day in np.unique(bets.day):
+        opening = balance
+        if opening <= 0:
+            continue
+        change = 0.0
+        for i in np.flatnonzero(bets.day == day):
+            evs = [p * o - 1 if o <= max_odds else -np.inf for p, o in zip(bets.probs[i], bets.odds[i])]
+            pick = int(np.argmax(evs))
+            ev, price = evs[pick], bets.odds[i, pick]
+            if not ev > threshold:
+                continue
+            fraction = size * max(ev / (price - 1), 0) if staking == 'kelly' else size
+            stake = (opening if staking == 'kelly' else bankroll) * fraction
+            staked += stake
+            placed += 1
+            change += stake * (price - 1) if bets.result[i] == pick else -stake
+        balance = max(opening + change, 0.0)
+        peak = max(peak, balance)
+        drawdown = max(drawdown, 1 - balance / peak)
+    return {'final_bankroll': balance, 'max_drawdown': drawdown, 'staked': staked, 'bets': placed}
+
+def test_strategies_match_a_per_day_loop():
+    bets = random_bets()
+    grid = backtest.strategy_grid(thresholds=(0.0, 0.05, 0.15), kelly_fractions=(0.25, 1.0),
+                                  flat_stakes=(0.02, 0.5), max_odds=(3.0, np.inf))
+    results = backtest.run(bets, grid)
+    busted = 0
+    for row in results.itertuples():
+        expected = reference(bets, row.staking, row.size, row.threshold, row.max_odds)
+        busted += expected['final_bankroll'] == 0
+        for name, value in expected.items():
+            assert getattr(row, name) == pytest.approx(value, rel=1e-9, abs=1e-12), (row, name)
+    assert busted  # The big flat stakes go broke, so the stop-at-zero path is covered
+
+def test_bankroll_paths_end_where_run_does():
+    bets = random_bets(seed=1)
+    grid = backtest.strategy_grid(thresholds=(0.05,), kelly_fractions=(0.5,), flat_stakes=(0.05,), max_odds=(np.inf,))
+    paths = backtest.bankroll_paths(bets, grid)
+    assert list(paths.index) == list(bets.dates)
+    np.testing.assert_allclose(paths.iloc[-1].to_numpy(), backtest.run(bets, grid)['final_bankroll'].to_numpy())
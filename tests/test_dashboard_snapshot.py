@@ -0,0 +1,74 @@
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import dashboard_snapshot
+
+SCHEMA = [
+    "CREATE TABLE teams (team_id INT PRIMARY KEY, name VARCHAR(100))",
+    "CREATE TABLE matches (match_id VARCHAR(50) PRIMARY KEY, date DATE, league VARCHAR(50), home_team_id INT, "
+    "away_team_id INT, home_goals INT, away_goals INT)",
+    "CREATE TABLE match_stats (match_id VARCHAR(50), home_xg FLOAT, away_xg FLOAT, home_ppda FLOAT, away_ppda FLOAT, "
+    "home_deep INT, away_deep INT)",
+]
+
+def add_matches(engine, n, start=0, seed=0):
+    rng = np.random.default_rng(seed)
+    with engine.begin() as conn:
+        for i in range(start, start + n):
+            home, away = rng.choice(np.arange(1, 9), 2, replace=False)
+            match_id = f"m{i}"
+            conn.execute(text("INSERT INTO matches VALUES (:id, :d, 'EPL', :h, :a, :hg, :ag)"),
+                         {'id': match_id, 'd': date(2025, 8, 1) + timedelta(days=i), 'h': int(home), 'a': int(away),
+                          'hg': int(rng.poisson(1.5)), 'ag': int(rng.poisson(1.1))})
+            conn.execute(text("INSERT INTO match_stats VALUES (:id, :hx, :ax, :hp, :ap, :hd, :ad)"),
+                         {'id': match_id, 'hx': float(rng.gamma(2, 0.7)), 'ax': float(rng.gamma(2, 0.6)),
+                          'hp': float(rng.normal(11, 3)), 'ap': float(rng.normal(11, 3)),
+                          'hd': int(rng.integers(2, 15)), 'ad': int(rng.integers(2, 15))})
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard_snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'snapshot.db'}")
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO teams VALUES " + ", ".join(f"({t}, 'Team {t}')" for t in range(1, 9))))
+    add_matches(engine, 60)
+    yield engine
+    engine.dispose()
+
+def test_load_returns_what_a_live_computation_gives(engine):
+    version = dashboard_snapshot.publish(engine, 'EPL', k=20)
+    assert dashboard_snapshot.read_manifest('EPL')['version'] == version
+
+    matches, elo, form, history = dashboard_snapshot.load('EPL', version)
+    live = dashboard_snapshot.load_matches(engine, 'EPL')
+    live_elo, live_form, live_history = dashboard_snapshot.compute_league(live, 20)
+    pd.testing.assert_frame_equal(matches, live)
+    assert elo == pytest.approx(live_elo, abs=1e-12)
+    assert form.keys() == live_form.keys()
+    for team, stats in live_form.items():
+        assert form[team] == pytest.approx(stats, abs=1e-12, nan_ok=True)
+    pd.testing.assert_frame_equal(history, live_history)
+
+def test_unchanged_data_keeps_the_version(engine):
+    first = dashboard_snapshot.publish(engine, 'EPL', k=20)
+    built_at = dashboard_snapshot.read_manifest('EPL')['built_at']
+    assert dashboard_snapshot.publish(engine, 'EPL', k=20) == first
+    assert dashboard_snapshot.read_manifest('EPL')['built_at'] == built_at
+
+def test_new_matches_publish_a_new_version_and_prune_old_ones(engine):
+    versions = [dashboard_snapshot.publish(engine, 'EPL', k=20)]
+    for batch in range(3):
+        add_matches(engine, 5, start=100 + 10 * batch, seed=batch + 1)
+        versions.append(dashboard_snapshot.publish(engine, 'EPL', k=20))
+    assert len(set(versions)) == len(versions)
+    kept = sorted(v for v in os.listdir(dashboard_snapshot.league_dir('EPL'))
+                  if v != dashboard_snapshot.MANIFEST and not v.startswith('.'))
+    assert kept == sorted(versions[-dashboard_snapshot.KEEP_VERSIONS:])
+    assert len(dashboard_snapshot.load('EPL', versions[-1])[0]) == 75
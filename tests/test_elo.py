@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from elo import compute_elo, INITIAL_RATING
+
+def reference_elo(home, away, home_goals, away_goals, k, start=None):
+    """The original per-match loop: expected score from the rating gap, both sides move by k x surprise."""
+    ratings = dict(start or {})
+    pre, post = [], []
+    for h, a, hg, ag in zip(home, away, home_goals, away_goals):
+        hr, ar = ratings.get(h, INITIAL_RATING), ratings.get(a, INITIAL_RATING)
+        actual = 1.0 if hg > ag else 0.5 if hg == ag else 0.0
+        expected = 1 / (1 + 10 ** ((ar - hr) / 400))
+        ratings[h] = hr + k * (actual - expected)
+        ratings[a] = ar + k * ((1 - actual) - (1 - expected))
+        pre.append((hr, ar))
+        post.append((ratings[h], ratings[a]))
+    return np.array(pre), np.array(post), ratings
+
+def random_matches(n, teams=20, seed=0):
+    rng = np.random.default_rng(seed)
+    home = rng.integers(0, teams, n)
+    away = (home + rng.integers(1, teams, n)) % teams
+    return home, away, rng.poisson(1.5, n), rng.poisson(1.1, n)
+
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_matches_loop_reference(use_jit):
+    home, away, hg, ag = random_matches(2000)
+    result = compute_elo(home, away, hg, ag, k=20, use_jit=use_jit)
+    pre, post, ratings = reference_elo(home, away, hg, ag, 20)
+    np.testing.assert_allclose(np.column_stack([result.pre_home, result.pre_away]), pre, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(np.column_stack([result.post_home, result.post_away]), post, rtol=0, atol=1e-9)
+    assert result.ratings.keys() == ratings.keys()
+    for team, rating in ratings.items():
+        assert result.ratings[team] == pytest.approx(rating, abs=1e-9)
+
+def test_resumes_from_start_ratings():
+    home, away, hg, ag = random_matches(1000, seed=1)
+    full = compute_elo(home, away, hg, ag, k=32)
+    first = compute_elo(home[:600], away[:600], hg[:600], ag[:600], k=32)
+    rest = compute_elo(home[600:], away[600:], hg[600:], ag[600:], k=32, start_ratings=first.ratings)
+    np.testing.assert_allclose(rest.pre_home, full.pre_home[600:], rtol=0, atol=1e-9)
+    for team, rating in rest.ratings.items():
+        assert full.ratings[team] == pytest.approx(rating, abs=1e-9)
+
+def test_team_names_and_ids_agree():
+    home, away, hg, ag = random_matches(300, seed=2)
+    by_id = compute_elo(home, away, hg, ag)
+    by_name = compute_elo([f"T{t}" for t in home], [f"T{t}" for t in away], hg, ag)
+    np.testing.assert_array_equal(by_id.post_home, by_name.post_home)
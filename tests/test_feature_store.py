@@ -0,0 +1,100 @@
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import feature_engineering_v5 as fe
+
+# psycopg2 binds pandas Timestamps (to_records keeps them); sqlite3 needs to be told how
+sqlite3.register_adapter(pd.Timestamp, lambda ts: ts.isoformat(" "))
+
+SCHEMA = [
+    "CREATE TABLE matches (match_id VARCHAR(50) PRIMARY KEY, date DATE, home_team_id INT, away_team_id INT, "
+    "home_goals INT, away_goals INT)",
+    "CREATE TABLE match_stats (match_id VARCHAR(50), home_xg FLOAT, away_xg FLOAT, home_ppda FLOAT, away_ppda FLOAT, "
+    "home_deep INT, away_deep INT)",
+    "CREATE TABLE players (player_id INT PRIMARY KEY, team_id INT)",
+    "CREATE TABLE player_season_stats (player_id INT, season VARCHAR(10), xg_chain FLOAT, xg_buildup FLOAT, goals INT)",
+    "CREATE TABLE feature_team_state (team_id INT PRIMARY KEY, elo FLOAT, recent_stats TEXT, last_date DATE)",
+    "CREATE TABLE feature_store_meta (table_name VARCHAR(50) PRIMARY KEY, last_processed_date DATE, updated_at TIMESTAMP)",
+]
+
+def random_season(n_days=60, teams=12, seed=0):
+    """A few matches a day between random pairs, with some missing PPDA/xG."""
+    rng = np.random.default_rng(seed)
+    matches, stats = [], []
+    for day in range(n_days):
+        pairs = rng.permutation(teams)[:2 * int(rng.integers(1, 4))].reshape(-1, 2)
+        for home, away in pairs:
+            match_id = f"{day}-{home}-{away}"
+            matches.append((match_id, date(2025, 8, 1) + timedelta(days=day), int(home) + 1, int(away) + 1,
+                            int(rng.poisson(1.5)), int(rng.poisson(1.1))))
+            xg = rng.gamma(2, 0.7, 2)
+            ppda = rng.normal(11, 3, 2)
+            if rng.random() < 0.1:
+                ppda[:] = np.nan
+            stats.append((match_id, float(xg[0]), float(xg[1]), *(None if np.isnan(p) else float(p) for p in ppda),
+                          int(rng.integers(2, 15)), int(rng.integers(2, 15))))
+    return matches, stats
+
+def insert(engine, matches, stats):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO matches VALUES (:id, :d, :h, :a, :hg, :ag)"),
+                     [dict(zip(['id', 'd', 'h', 'a', 'hg', 'ag'], m)) for m in matches])
+        conn.execute(text("INSERT INTO match_stats VALUES (:id, :hx, :ax, :hp, :ap, :hd, :ad)"),
+                     [dict(zip(['id', 'hx', 'ax', 'hp', 'ap', 'hd', 'ad'], s)) for s in stats])
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'features.db'}")
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO players VALUES (1, 1), (2, 2), (3, 3)"))
+        conn.execute(text("INSERT INTO player_season_stats VALUES (1, '2025', 0.3, 0.2, 4), (2, '2025', 0.5, 0.1, 7), "
+                          "(3, '2025', 0.2, 0.4, 2)"))
+    yield engine
+    engine.dispose()
+
+def full_build(engine):
+    """rebuild_features without the Postgres-only table swap."""
+    df, elo, all_stats = fe.compute_all_features(engine)
+    df.to_sql(fe.FEATURE_TABLE, engine, index=False)
+    with engine.connect() as conn:
+        conn.execute(text(f"CREATE UNIQUE INDEX idx_features_match ON {fe.FEATURE_TABLE} (match_id)"))
+        fe.write_state(conn, fe.team_states(elo.ratings, all_stats), df['date'].max().date())
+        conn.commit()
+
+def test_incremental_update_matches_a_full_rebuild(engine):
+    matches, stats = random_season()
+    cut = sum(1 for m in matches if m[1] < date(2025, 9, 5))
+    insert(engine, matches[:cut], stats[:cut])
+    full_build(engine)
+    last_date = fe.get_last_processed_date(engine)
+
+    insert(engine, matches[cut:], stats[cut:])
+    added = fe.update_features(engine, last_date)
+    assert len(added) == len(matches) - cut
+    assert fe.check_parity(engine)
+
+def test_fixture_features_continue_from_the_stored_state(engine):
+    matches, stats = random_season(seed=1)
+    insert(engine, matches, stats)
+    full_build(engine)
+
+    # A fixture's features equal the row a full rebuild gives the same match once it is played
+    played = fe.compute_all_features(engine)[0]
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO matches VALUES ('next', '2025-12-01', 3, 4, 2, 0)"))
+        conn.execute(text("INSERT INTO match_stats VALUES ('next', 1.0, 0.5, 10.0, 12.0, 8, 5)"))
+    expected = fe.compute_all_features(engine)[0].set_index('match_id').loc['next']
+    fixture = pd.DataFrame({'match_id': ['next'], 'date': [pd.Timestamp('2025-12-01')], 'league': ['EPL'],
+                            'home_team_id': [3], 'away_team_id': [4]})
+    features = fe.fixture_features(engine, fixture).set_index('match_id').loc['next']
+    assert len(played) == len(matches)
+    for col in ['home_elo', 'away_elo', 'elo_diff', 'home_xg_5', 'away_ppda_5', 'home_goals_conceded_5',
+                'home_squad_xg_chain', 'away_squad_xg_buildup']:
+        assert features[col] == pytest.approx(expected[col], abs=1e-9), col
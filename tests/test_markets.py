@@ -0,0 +1,16 @@
+import os
+import shutil
+
+from markets import MarketModels, MARKETS
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_version_follows_model_content_not_mtime(tmp_path):
+    for file_name, _, _ in MARKETS.values():
+        shutil.copy(os.path.join(ROOT_DIR, file_name), tmp_path / file_name)  # New mtime, same bytes
+    original = MarketModels(ROOT_DIR)
+    copied = MarketModels(str(tmp_path))
+    assert copied.version == original.version
+
+    os.utime(tmp_path / MARKETS['1x2'][0], (0, 0))
+    assert MarketModels(str(tmp_path)).version == original.version
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling import rolling_features
+
+def random_stats(n=5000, teams=40, seed=0, offset=0.0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'team': np.sort(rng.integers(0, teams, n)),
+        'x': rng.normal(offset, 1, n),
+        'y': rng.gamma(2, 1, n),
+    })
+    df.loc[rng.random(n) < 0.15, 'x'] = np.nan
+    return df
+
+def reference(df, col, window, shift, min_periods=1):
+    """pandas groupby rolling, one group at a time."""
+    values = df.groupby('team')[col].shift(1) if shift else df[col]
+    return (values.groupby(df['team']).rolling(window, min_periods=min_periods).mean()
+            .reset_index(level=0, drop=True).sort_index())
+
+@pytest.mark.parametrize("shift", [False, True])
+@pytest.mark.parametrize("min_periods", [1, 3])
+def test_windows_match_pandas_rolling(shift, min_periods):
+    df = random_stats()
+    out = rolling_features(df, 'team', ['x', 'y'], windows=(3, 5, 10), shift=shift, min_periods=min_periods)
+    for col in ['x', 'y']:
+        for w in (3, 5, 10):
+            pd.testing.assert_series_equal(out[f"{col}_{w}"], reference(df, col, w, shift, min_periods),
+                                           check_names=False, rtol=0, atol=1e-12)
+
+def test_error_does_not_grow_with_table_length():
+    # Large values over a long table: sums restart per group, so error stays at the group's scale
+    df = random_stats(n=200000, teams=500, offset=1e6)
+    out = rolling_features(df, 'team', ['x'], windows=(5,))
+    err = (out['x_5'] - reference(df, 'x', 5, shift=False)).abs().max()
+    assert err < 1e-7
+
+def test_ewm_matches_pandas():
+    df = random_stats(n=2000)
+    out = rolling_features(df, 'team', ['y'], windows=(), spans=(5,), shift=True)
+    expected = df.groupby('team')['y'].transform(lambda s: s.ewm(span=5, min_periods=1).mean().shift(1))
+    pd.testing.assert_series_equal(out['y_ewm5'], expected, check_names=False, rtol=0, atol=1e-12)
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import season_sim
+
+TEAMS = ['A', 'B', 'C', 'D']
+FIXTURES = pd.DataFrame({'home_name': ['A', 'B', 'C', 'D', 'A', 'C'], 'away_name': ['B', 'C', 'D', 'A', 'C', 'B']})
+LAM_HOME = np.array([1.8, 1.2, 0.9, 1.4, 2.2, 1.0])
+LAM_AWAY = np.array([0.8, 1.1, 1.3, 1.0, 0.6, 1.5])
+TABLE = (np.array([10, 9, 7, 3]), np.array([5, 2, -1, -6]), np.array([12, 10, 8, 5]))
+
+def poisson_pmf(lam, max_goals=season_sim.MAX_GOALS):
+    """P(X = k) for k < max_goals, with the tail folded into max_goals (the simulator's capping)."""
+    pmf = [math.exp(-lam) * lam ** k / math.factorial(k) for k in range(max_goals)]
+    return np.array(pmf + [1 - sum(pmf)])
+
+def expected_points():
+    """Exact expected final points from the per-fixture outcome probabilities."""
+    xpts = dict(zip(TEAMS, TABLE[0].astype(float)))
+    for (home, away), lh, la in zip(FIXTURES.itertuples(index=False), LAM_HOME, LAM_AWAY):
+        joint = np.outer(poisson_pmf(lh), poisson_pmf(la))
+        home_win, draw = np.tril(joint, -1).sum(), np.trace(joint)
+        xpts[home] += 3 * home_win + draw
+        xpts[away] += 3 * (1 - home_win - draw) + draw
+    return pd.Series(xpts)
+
+def test_poisson_cdf_matches_the_pmf():
+    lam = np.array([0.3, 1.4, 3.0])
+    cdf = season_sim.poisson_cdf(lam)
+    for j, value in enumerate(lam):
+        np.testing.assert_allclose(cdf[:, j], np.cumsum(poisson_pmf(value))[:-1], rtol=1e-6)
+
+def test_expected_points_match_the_exact_expectation():
+    summary, positions, points = season_sim.simulate(TEAMS, TABLE, FIXTURES, LAM_HOME, LAM_AWAY,
+                                                     n_sims=200000, seed=3, workers=1)
+    # Standard error of the mean is below 0.005 points here
+    np.testing.assert_allclose(summary['xPts'].reindex(TEAMS), expected_points()[TEAMS], atol=0.02)
+    np.testing.assert_allclose(positions.sum(axis=1), 1, atol=1e-12)
+    np.testing.assert_allclose(positions.sum(axis=0), 1, atol=1e-12)
+    np.testing.assert_allclose(points.sum(axis=1), 1, atol=1e-12)
+    assert (summary['Left'].reindex(TEAMS).to_numpy() == [3, 3, 4, 2]).all()
+
+def test_goalless_fixtures_give_a_fixed_table():
+    # Every remaining match ends 0-0: one point each, then the table ranks on points, GD and goals
+    summary, positions, _ = season_sim.simulate(TEAMS, TABLE, FIXTURES, np.zeros(6), np.zeros(6),
+                                                n_sims=2000, seed=0, workers=1)
+    assert summary['Pts 50%'].reindex(TEAMS).tolist() == [13, 12, 11, 5]
+    assert summary['Title']['A'] == 1.0
+    assert positions.loc['D', 4] == 1.0
+
+def test_same_seed_same_result_whatever_the_worker_count():
+    args = (TEAMS, TABLE, FIXTURES, LAM_HOME, LAM_AWAY)
+    one = season_sim.simulate(*args, n_sims=3000, seed=7, workers=1, chunk=1000)
+    two = season_sim.simulate(*args, n_sims=3000, seed=7, workers=2, chunk=1000)
+    for a, b in zip(one, two):
+        pd.testing.assert_frame_equal(a, b)
+
+def test_pending_fixtures_drop_stale_and_played_pairings():
+    fixtures = pd.DataFrame({
+        'match_id': ['old', 'new', 'done', 'open'],
+        'date': pd.to_datetime(['2026-01-01', '2026-02-01', '2026-03-01', '2026-03-02']),
+        'home_name': ['A', 'A', 'B', 'C'], 'away_name': ['B', 'B', 'C', 'D'],
+    })
+    played = pd.DataFrame({'home_name': ['B'], 'away_name': ['C']})
+    assert season_sim.pending_fixtures(fixtures, played)['match_id'].tolist() == ['new', 'open']
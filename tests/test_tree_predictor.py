@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from markets import MarketModels, MARKETS, ALL_FEATURES, prepare_features
+from tree_predictor import TreeEnsemble
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def random_features(n, n_features, seed=0):
+    """Feature rows on the training scale, with some NaNs (the default-direction branches)."""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1, (n, n_features)).astype(np.float32) * np.float32(5) + np.float32(5)
+    X[:, 0] = rng.normal(0, 150, n)  # elo_diff
+    X[rng.random((n, n_features)) < 0.05] = np.nan
+    return X
+
+@pytest.mark.parametrize("market", list(MARKETS))
+@pytest.mark.parametrize("use_jit", [False, True])
+def test_walkers_match_xgboost_bit_for_bit(market, use_jit):
+    file_name, features, _ = MARKETS[market]
+    path = os.path.join(ROOT_DIR, file_name)
+    booster = xgb.Booster()
+    booster.load_model(path)
+    X = random_features(500, len(features))
+    expected = booster.inplace_predict(X)
+    got = TreeEnsemble.from_json(path, use_jit=use_jit).predict(X)
+    assert got.dtype == expected.dtype
+    np.testing.assert_array_equal(got, expected)
+
+def test_backends_serve_identical_probabilities():
+    df = pd.DataFrame(random_features(40, len(ALL_FEATURES), seed=1), columns=ALL_FEATURES)
+    X = prepare_features(df).to_numpy()
+    results = {backend: MarketModels(ROOT_DIR, backend=backend).predict(X) for backend in MarketModels.BACKENDS}
+    reference = results['xgboost']
+    for backend, probs in results.items():
+        assert probs.keys() == reference.keys()
+        for name in probs:
+            np.testing.assert_array_equal(probs[name], reference[name], err_msg=f"{backend} {name}")
@@ -0,0 +1,189 @@
+import json
+import math
+import ctypes
+import ctypes.util
+import numpy as np
+
+class TreeEnsemble:
+    """
+    Array-based copy of a saved XGBoost gbtree model (booster JSON), scored without
+    XGBoost. Every tree is flattened into shared node arrays; leaves point at themselves,
+    so a NumPy walk is `max_depth` vectorized gathers over (rows x trees). With
+    use_jit=True (numba installed) a compiled per-row walker is used instead. Margins are
+    summed in float32 in tree order and transformed like XGBoost does, so probabilities
+    match Booster.inplace_predict bit for bit.
+    """
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, groups,
+                 base_margin, objective, num_class, max_depth, feature_names=None, use_jit=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.groups = groups
+        self.base_margin = base_margin
+        self.objective = objective
+        self.num_class = num_class
+        self.max_depth = max_depth
+        self.feature_names = feature_names
+        self.jit = _get_jit() if use_jit else None
+        # Tree order per output group, for the float32 running sums
+        self.group_trees = [np.flatnonzero(groups == g) for g in range(max(num_class, 1))]
+
+    @classmethod
+    def from_json(cls, path, use_jit=False):
+        with open(path) as f:
+            learner = json.load(f)['learner']
+        objective = learner['objective']['name']
+        if objective not in ('binary:logistic', 'multi:softprob', 'multi:softmax', 'reg:squarederror'):
+            raise ValueError(f"Unsupported objective: {objective}")
+        booster = learner['gradient_booster']
+        if booster['name'] != 'gbtree':
+            raise ValueError(f"Unsupported booster: {booster['name']}")
+        model = booster['model']
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in model['trees']:
+            if any(tree['split_type']):
+                raise ValueError("Categorical splits are not supported")
+            lc = np.asarray(tree['left_children'], dtype=np.int32)
+            rc = np.asarray(tree['right_children'], dtype=np.int32)
+            leaf = lc == -1
+            nodes = np.arange(len(lc), dtype=np.int32)
+            roots.append(offset)
+            feature.append(np.where(leaf, 0, tree['split_indices']).astype(np.int32))
+            threshold.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+            left.append(np.where(leaf, nodes, lc) + offset)
+            right.append(np.where(leaf, nodes, rc) + offset)
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            value.append(np.where(leaf, np.asarray(tree['split_conditions'], dtype=np.float32), np.float32(0)))
+            max_depth = max(max_depth, _depth(lc, rc))
+            offset += len(lc)
+
+        params = learner['learner_model_param']
+        num_class = int(params['num_class'])
+        base_score = np.float32(float(params['base_score'].strip('[]').split(',')[0]))
+        if objective == 'binary:logistic':
+            # ProbToMargin: -log(1/p - 1)
+            base_margin = np.float32(-np.log(np.float64(np.float32(1) / base_score - np.float32(1))))
+        else:
+            base_margin = base_score
+
+        return cls(
+            np.concatenate(feature), np.concatenate(threshold), np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32), np.concatenate(default_left),
+            np.concatenate(value).astype(np.float32), np.asarray(roots, dtype=np.int32),
+            np.asarray(model['tree_info'], dtype=np.int32), base_margin, objective, num_class,
+            max_depth, learner.get('feature_names') or None, use_jit
+        )
+
+    def leaves(self, X):
+        """Leaf value reached in every tree: (rows, trees) float32."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def predict_margin(self, X):
+        if self.jit is not None:
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            margins = np.full((len(X), len(self.group_trees)), self.base_margin, dtype=np.float32)
+            self.jit['walk'](X, self.feature, self.threshold, self.left, self.right, self.default_left,
+                             self.value, self.roots, self.groups, margins)
+            return margins
+        leaves = self.leaves(X)
+        margins = np.empty((len(leaves), len(self.group_trees)), dtype=np.float32)
+        for g, trees in enumerate(self.group_trees):
+            # Sequential float32 sum, base first, in tree order (same as XGBoost's accumulation)
+            stacked = np.concatenate([np.full((len(leaves), 1), self.base_margin, dtype=np.float32), leaves[:, trees]], axis=1)
+            margins[:, g] = np.cumsum(stacked, axis=1, dtype=np.float32)[:, -1]
+        return margins
+
+    def predict(self, X):
+        """Same output as Booster.inplace_predict: (rows, classes) for softprob, (rows,) otherwise."""
+        margins = self.predict_margin(X)
+        expf = self.jit['expf'] if self.jit is not None else _expf
+        if self.objective == 'binary:logistic':
+            return _sigmoid(margins[:, 0], expf)
+        if self.objective == 'multi:softprob':
+            return _softmax(margins, expf)
+        if self.objective == 'multi:softmax':
+            return margins.argmax(axis=1).astype(np.float32)
+        return margins[:, 0]
+
+def _depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int32)
+    for node in range(len(left)):  # Children always come after their parent
+        if left[node] != -1:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+def _walk(X, feature, threshold, left, right, default_left, value, roots, groups, margins):
+    """Per-row walk of every tree, adding leaf values to float32 margins (compiled with numba)."""
+    for i in range(X.shape[0]):
+        for t in range(roots.shape[0]):
+            node = roots[t]
+            while left[node] != node:
+                x = X[i, feature[node]]
+                if np.isnan(x):
+                    node = left[node] if default_left[node] else right[node]
+                elif x < threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            margins[i, groups[t]] += value[node]
+
+def _exp_scalar(x):
+    return math.exp(x)
+
+_libm_expf = None
+_jit = None
+
+def _expf(x):
+    """float32 exp with libm's rounding (NumPy's own float32 exp differs in the last bit)."""
+    global _libm_expf
+    if _libm_expf is None:
+        _libm_expf = False
+        path = ctypes.util.find_library('m')
+        if path:
+            expf = ctypes.CDLL(path).expf
+            expf.restype = ctypes.c_float
+            expf.argtypes = [ctypes.c_float]
+            _libm_expf = np.frompyfunc(expf, 1, 1)
+    if _libm_expf is False:
+        return np.exp(x.astype(np.float64)).astype(np.float32)  # Off by 1 ulp in rare cases
+    return _libm_expf(x).astype(np.float32)
+
+def _get_jit():
+    """numba-compiled walker and float32 exp, or None when numba is not installed."""
+    global _jit
+    if _jit is None:
+        try:
+            from numba import njit, vectorize
+        except ImportError:
+            return None
+        _jit = {
+            'walk': njit(cache=True)(_walk),
+            'expf': vectorize(['float32(float32)'], cache=True)(_exp_scalar),
+        }
+    return _jit
+
+def _sigmoid(x, expf):
+    # XGBoost: 1.0f / (expf(min(-x, 88.7f)) + 1.0f + 1e-16)
+    return np.float32(1) / (expf(np.minimum(-x, np.float32(88.7))) + np.float32(1))
+
+def _softmax(margins, expf):
+    # XGBoost: float exps of (x - max), summed in double, divided as float
+    e = expf(margins - margins.max(axis=1, keepdims=True))
+    total = np.zeros(len(e), dtype=np.float64)
+    for j in range(e.shape[1]):
+        total += e[:, j]
+    return e / total.astype(np.float32)[:, None]
@@ -0,0 +1,87 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+def deep_sizeof(obj, seen=None):
+    """Approximate memory of an object and everything it holds (bytes)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds (ttl=None: never).
+    Keeps hit/miss/eviction counters for monitoring.
+    """
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.data.get(key, _MISSING)
+            if entry is not _MISSING and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self.data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def age(self, key):
+        """Seconds since `key` was stored, or None when it is not cached."""
+        with self.lock:
+            entry = self.data.get(key)
+            return None if entry is None else time.monotonic() - entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic(), value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        # Only references are copied under the lock; measuring them happens outside it,
+        # so a stats call never blocks gets and sets for the whole traversal
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'entries': len(self.data),
+                'maxsize': self.maxsize,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+            }
+            container = sys.getsizeof(self.data)
+            items = list(self.data.items())
+        seen = set()
+        stats['memory_bytes'] = container + sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in items)
+        return stats
@@ -0,0 +1,36 @@
+import re
+import json
+import codecs
+from functools import lru_cache
+from utils import fetch_url
+
+BASE_URL = "https://understat.com"
+
+# Understat embeds its data as: var datesData = JSON.parse('\x5B\x7B\x22id...');
+_DATASET_RE = re.compile(rb"var\s+(\w+)\s*=\s*JSON\.parse\(\s*'(.*?)'\s*\)", re.DOTALL)
+
+def extract_datasets(content, names=None):
+    """
+    Finds and decodes every `var X = JSON.parse('...')` dataset in a raw Understat page
+    in one regex pass over the bytes (no DOM is built).
+    Returns {variable_name: data}, optionally limited to `names`.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf8')
+
+    datasets = {}
+    for match in _DATASET_RE.finditer(content):
+        name = match.group(1).decode()
+        if names and name not in names:
+            continue
+        datasets[name] = json.loads(codecs.decode(match.group(2), 'unicode_escape'))
+    return datasets
+
+@lru_cache(maxsize=64)
+def fetch_league_datasets(league, season):
+    """
+    All datasets on a league page (datesData, teamsData, playersData), fetched and parsed
+    once per process.
+    """
+    response = fetch_url(f"{BASE_URL}/league/{league}/{season}")
+    return extract_datasets(response.content)
@@ -1,5 +1,12 @@
 import requests
 import logging
+import threading
+import time
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+import http_cache
+from sqlalchemy import table, column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # --- LOGGING SETUP ---
@@ -13,20 +20,209 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# --- HTTP SESSIONS & RATE LIMITING ---
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` requests per second with bursts of up to `burst`.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Requests per second (and burst size) per host. Hosts not listed are not throttled.
+RATE_LIMITS = {
+    "understat.com": (2.0, 2),
+    "api-football-v1.p.rapidapi.com": (5.0, 5),
+    "api.football-data.org": (0.15, 1), # Free tier: 10 requests/minute
+    "api.the-odds-api.com": (1.0, 2),
+}
+
+# Maximum simultaneous in-flight requests per host (applies to threaded callers)
+HOST_CONCURRENCY = {
+    "understat.com": 4,
+}
+
+_sessions = {}
+_buckets = {}
+_semaphores = {}
+_host_stats = {}
+_http_lock = threading.Lock()
+
+def set_rate_limit(host, rate, burst=1):
+    """Overrides the request rate for a host (rate=None removes the limit)."""
+    with _http_lock:
+        if rate is None:
+            RATE_LIMITS.pop(host, None)
+            _buckets.pop(host, None)
+        else:
+            RATE_LIMITS[host] = (rate, burst)
+            _buckets[host] = TokenBucket(rate, burst)
+
+def _get_session(host):
+    """Returns the keep-alive session for a host, creating it (and its rate limiter) on first use."""
+    with _http_lock:
+        if host not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+            _host_stats[host] = _new_host_stats()
+            if host in RATE_LIMITS and host not in _buckets:
+                _buckets[host] = TokenBucket(*RATE_LIMITS[host])
+            _semaphores[host] = threading.BoundedSemaphore(HOST_CONCURRENCY.get(host, 16))
+        return _sessions[host], _buckets.get(host), _semaphores[host]
+
+def _new_host_stats():
+    return {'requests': 0, 'bytes': 0, 'latency_s': 0.0, 'retries': 0, 'errors': 0, 'cache_hits': 0, 'not_modified': 0}
+
+def _record(host, **deltas):
+    with _http_lock:
+        stats = _host_stats.setdefault(host, _new_host_stats())
+        for key, value in deltas.items():
+            stats[key] += value
+
+def _count_retry(retry_state):
+    url = retry_state.args[0] if retry_state.args else retry_state.kwargs.get('url')
+    _record(urlparse(url or '').netloc, retries=1)
+
+def get_host_stats():
+    """Per-host counters: requests, bytes, total/avg latency, retries, errors and cache hits/304s."""
+    with _http_lock:
+        out = {}
+        for host, stats in _host_stats.items():
+            out[host] = dict(stats, avg_latency_ms=1000 * stats['latency_s'] / stats['requests'] if stats['requests'] else 0.0)
+        return out
+
+def log_host_stats():
+    for host, s in get_host_stats().items():
+        logger.info(f"🌐 {host}: {s['requests']} requests, {s['bytes'] / 1e6:.1f} MB, "
+                    f"avg {s['avg_latency_ms']:.0f} ms, {s['retries']} retries, {s['errors']} errors, "
+                    f"{s['cache_hits']} cache hits, {s['not_modified']} not modified")
+
+def _redacted(error, params):
+    """Error text without credential query values (request errors quote the full URL)."""
+    message = str(error)
+    for name, value in (params or {}).items():
+        if name.lower() in http_cache.CREDENTIAL_PARAMS and value:
+            message = message.replace(str(value), '***')
+    return message
+
 # --- ROBUST REQUESTS ---
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type((requests.exceptions.RequestException, requests.exceptions.Timeout))
+    retry=retry_if_exception_type((requests.exceptions.RequestException, requests.exceptions.Timeout)),
+    before_sleep=_count_retry
 )
 def fetch_url(url, headers=None, params=None):
     """
     Fetches a URL with automatic retries and error handling.
+    Responses go through the on-disk cache (see http_cache.TTL_RULES): fresh entries are served
+    without a request and stale ones are revalidated with ETag/Last-Modified.
+    Requests reuse a pooled keep-alive session per host, wait on the host's rate limit
+    and never exceed the host's concurrency cap.
     """
+    host = urlparse(url).netloc
+
+    entry = None
+    use_cache = (http_cache.ENABLED or http_cache.OFFLINE) and http_cache.cacheable(url)
+    if http_cache.OFFLINE and not use_cache:
+        raise http_cache.CacheMissError(f"Offline mode: {url} has no cache rule")
+    if use_cache:
+        full_url, key = http_cache.cache_key(url, params)
+        entry = http_cache.lookup(key)
+        if entry and (http_cache.OFFLINE or http_cache.is_fresh(entry)):
+            try:
+                response = http_cache.to_response(entry)
+                _record(host, cache_hits=1)
+                return response
+            except OSError:
+                entry = None
+        if http_cache.OFFLINE:
+            raise http_cache.CacheMissError(f"Offline mode: {full_url} is not cached")
+        headers = {**(headers or {}), **http_cache.conditional_headers(entry)}
+
+    session, bucket, semaphore = _get_session(host)
+
+    with semaphore:
+        if bucket:
+            bucket.acquire()
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, params=params, timeout=10)
+        except requests.exceptions.RequestException as e:
+            _record(host, errors=1)
+            logger.error(f"❌ Network Error fetching {url}: {_redacted(e, params)}")
+            raise e
+        _record(host, requests=1, bytes=len(response.content), latency_s=time.perf_counter() - start)
+
+    if response.status_code == 304 and entry:
+        http_cache.touch(key, entry, response.headers)
+        _record(host, not_modified=1)
+        return http_cache.to_response(entry)
+
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
         response.raise_for_status()
-        return response
     except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Network Error fetching {url}: {e}")
+        _record(host, errors=1)
+        logger.error(f"❌ Network Error fetching {url}: {_redacted(e, params)}")
         raise e
+
+    if use_cache and http_cache.ENABLED:
+        http_cache.store(key, full_url, response)
+    return response
+
+# --- BULK WRITES ---
+def bulk_insert(conn, table_name, rows, chunk_size=1000):
+    """
+    Writes rows with multi-row INSERT statements (one per chunk). Returns the number of rows sent.
+    """
+    if not rows:
+        return 0
+
+    tbl = table(table_name, *[column(c) for c in rows[0].keys()])
+    for i in range(0, len(rows), chunk_size):
+        conn.execute(pg_insert(tbl).values(rows[i:i + chunk_size]))
+    return len(rows)
+
+def bulk_upsert(conn, table_name, rows, key_cols, update_cols=None, chunk_size=1000):
+    """
+    Writes rows with multi-row INSERT ... ON CONFLICT statements (one per chunk).
+    If update_cols is None, conflicting rows are left untouched (DO NOTHING).
+    Returns the number of rows sent.
+    """
+    if not rows:
+        return 0
+
+    # Postgres refuses to touch the same row twice in one statement, so keep the last copy of each key
+    unique_rows = list({tuple(r[k] for k in key_cols): r for r in rows}.values())
+    tbl = table(table_name, *[column(c) for c in unique_rows[0].keys()])
+
+    for i in range(0, len(unique_rows), chunk_size):
+        stmt = pg_insert(tbl).values(unique_rows[i:i + chunk_size])
+        if update_cols:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=key_cols,
+                set_={c: stmt.excluded[c] for c in update_cols}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=key_cols)
+        conn.execute(stmt)
+
+    return len(unique_rows)
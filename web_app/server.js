@@ -20,23 +20,58 @@ app.set('view engine', 'ejs');
 app.set('views', path.join(__dirname, 'views'));
 app.use(express.static('public'));
 
+// Model version the Brain serves (re-read every minute); null while it is offline
+const VERSION_TTL_MS = 60 * 1000;
+let serving = { version: null, checkedAt: 0 };
+
+async function servingVersion() {
+    if (Date.now() - serving.checkedAt < VERSION_TTL_MS) return serving.version;
+    try {
+        const response = await axios.get(`${BRAIN_URL}/`, { timeout: 2000 });
+        serving = { version: response.data.model_version || null, checkedAt: Date.now() };
+    } catch (err) {
+        serving = { version: null, checkedAt: Date.now() };
+    }
+    return serving.version;
+}
+
 app.get('/', async (req, res) => {
     try {
-        // Fetch matches directly from DB
+        // Fetch matches directly from DB, with the served model's precomputed prediction (if any)
+        const version = await servingVersion();
         const result = await pool.query(`
-            SELECT m.match_id, m.date, t1.name as home, t2.name as away 
+            SELECT m.match_id, m.date, t1.name as home, t2.name as away,
+                   p.home_win, p.draw, p.away_win, p.model_version
             FROM matches m
             JOIN teams t1 ON m.home_team_id = t1.team_id
             JOIN teams t2 ON m.away_team_id = t2.team_id
+            LEFT JOIN LATERAL (
+                SELECT home_win, draw, away_win, model_version
+                FROM predictions
+                WHERE predictions.match_id = m.match_id AND predictions.model_version = $1
+                ORDER BY created_at DESC LIMIT 1
+            ) p ON true
             WHERE m.date >= CURRENT_DATE
             ORDER BY m.date ASC LIMIT 10
-        `);
+        `, [version]);
         res.render('index', { matches: result.rows });
     } catch (err) {
         res.status(500).send("Database Error");
     }
 });
 
+// Batch Bridge: one round-trip to Python for the whole schedule
+app.get('/api/predict/batch', async (req, res) => {
+    const ids = (req.query.ids || '').split(',').filter(Boolean);
+    const body = ids.length ? { match_ids: ids } : { upcoming: true };
+    try {
+        const response = await axios.post(`${BRAIN_URL}/predict/batch`, body);
+        res.json(response.data);
+    } catch (err) {
+        res.status(500).json({ error: "Brain Offline" });
+    }
+});
+
 // The Hybrid Bridge
 app.get('/api/predict/:id', async (req, res) => {
     try {